@@ -1,4 +1,6 @@
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
@@ -6,14 +8,22 @@ from googleapiclient.errors import HttpError
 API_KEY = ""
 # ↑↑↑ ВСТАВЬТЕ ВАШ API KEY ↑↑↑
 
+# Сервис создается один раз на поток (httplib2 не потокобезопасен), а не в каждой функции
+_local = threading.local()
+
+
+def get_service():
+    if not hasattr(_local, "service"):
+        _local.service = build("sheets", "v4", developerKey=API_KEY, cache_discovery=False)
+    return _local.service
+
 
 def force_api_access(spreadsheet_id, range_name="Лист1"):
     """
     Принудительный доступ через Google Sheets API
     """
     try:
-        # Создаем сервис
-        service = build("sheets", "v4", developerKey=API_KEY)
+        service = get_service()
 
         print(f" Пробуем подключиться к таблице: {spreadsheet_id}")
 
@@ -63,7 +73,7 @@ def check_spreadsheet_info(spreadsheet_id):
     Проверка информации о таблице через API
     """
     try:
-        service = build("sheets", "v4", developerKey=API_KEY)
+        service = get_service()
         sheet = service.spreadsheets()
 
         # Получаем метаданные таблицы
@@ -102,8 +112,8 @@ def main():
 
     # Загружаем данные через API
     print("\n Загрузка данных через API...")
-    df1 = force_api_access(NEW_SPREADSHEET_ID_1)
-    df2 = force_api_access(NEW_SPREADSHEET_ID_2)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        df1, df2 = executor.map(force_api_access, [NEW_SPREADSHEET_ID_1, NEW_SPREADSHEET_ID_2])
 
     if df1 is not None and df2 is not None:
         print("\n ВСЕ РАБОТАЕТ ЧЕРЕЗ API!")
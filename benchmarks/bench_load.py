@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Сравнение скорости способов загрузки в PostgreSQL: COPY, execute_values, построчно
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.extract import get_database_credentials
+from etl.load import LOAD_METHODS, write_dataframe
+from etl.transform import prepare_for_database
+
+
+def read_frame(path: str, rows: int) -> pd.DataFrame:
+
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+
+    # Размножаем датасет до нужного количества строк
+    repeats = -(-rows // len(df))
+    frame = pd.concat([df] * repeats, ignore_index=True).head(rows)
+    if 'id_' in frame.columns:
+        frame['id_'] = range(1, len(frame) + 1)
+    return frame
+
+
+def run_method(conn, df: pd.DataFrame, table_name: str, method: str) -> float:
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(prepare_for_database(df, table_name))
+    conn.commit()
+
+    start_time = time.perf_counter()
+    write_dataframe(cursor, df, table_name, method)
+    conn.commit()
+    elapsed = time.perf_counter() - start_time
+
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    conn.commit()
+    cursor.close()
+    return elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки DataFrame в PostgreSQL')
+    parser.add_argument('--input', default='new_data.parquet', help='Файл с преобразованными данными')
+    parser.add_argument('--rows', type=int, default=10000, help='Количество строк для загрузки')
+    parser.add_argument('--table-name', default='bench_load', help='Временная таблица для замеров')
+    parser.add_argument('--methods', nargs='+', choices=LOAD_METHODS, default=list(LOAD_METHODS))
+    args = parser.parse_args()
+
+    df = read_frame(args.input, args.rows)
+    print(f"Строк для загрузки: {len(df)}, колонок: {len(df.columns)}")
+
+    conn = psycopg2.connect(**get_database_credentials())
+    try:
+        results = {}
+        for method in args.methods:
+            elapsed = run_method(conn, df, args.table_name, method)
+            results[method] = elapsed
+            print(f"  {method:>5}: {elapsed:8.2f} с, {len(df) / elapsed:12,.0f} строк/с")
+    finally:
+        conn.close()
+
+    if 'rows' in results:
+        print("\nУскорение относительно построчной вставки:")
+        for method, elapsed in results.items():
+            print(f"  {method:>5}: x{results['rows'] / elapsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Ускорение параллельного transform относительно последовательного в зависимости
+# от числа процессов: один и тот же очищенный DataFrame на синтетических данных,
+# transform_data в одном процессе против transform_parallel на 1..N процессах
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.categories import encode_low_cardinality
+from etl.extract import clean_raw_data
+from etl.parallel import default_workers, transform_parallel
+from etl.synthetic import make_sheets
+from etl.transform import transform_data
+
+
+DEFAULT_ROWS = 1_000_000
+
+
+def default_worker_counts() -> list:
+
+    # 1, 2, 4, ... до числа ядер включительно
+    counts, workers = [], 1
+    while workers < default_workers():
+        counts.append(workers)
+        workers *= 2
+    return counts + [default_workers()]
+
+
+def prepare_frame(rows: int, dtype_backend: str) -> pd.DataFrame:
+
+    first, second = make_sheets(rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        merged = pd.merge(first, second.rename(columns={"SMDBid": "SMDB_id"}), on="SMDB_id")
+        return encode_low_cardinality(clean_raw_data(merged, dtype_backend))
+
+
+def best_time(function, repeats: int) -> float:
+
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Бенчмарк параллельного transform: ускорение в зависимости от числа процессов')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Размер основного листа')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Числа процессов (по умолчанию: 1, 2, 4, ... до числа ядер)')
+    parser.add_argument('--backend', choices=['numpy_nullable', 'pyarrow'], default='numpy_nullable',
+                        help='Бэкенд типов pandas')
+    parser.add_argument('--repeats', type=int, default=3, help='Повторов на точку, берется лучшее время')
+    parser.add_argument('--output', default=None, help='JSON с результатами')
+    args = parser.parse_args()
+
+    df = prepare_frame(args.rows, args.backend)
+    print(f"Строк на входе transform: {len(df):,}, ядер: {os.cpu_count()}")
+
+    serial = best_time(lambda: transform_data(df), args.repeats)
+    print(f"\n{'процессов':>10} {'время, с':>10} {'ускорение':>10} {'эффективность':>14}")
+    print(f"{'serial':>10} {serial:10.2f} {1.0:10.2f} {1.0:14.2f}")
+
+    results = {'rows': len(df), 'cpu_count': os.cpu_count(), 'serial_seconds': serial, 'parallel': []}
+    for workers in args.workers or default_worker_counts():
+        seconds = best_time(lambda: transform_parallel(df, workers), args.repeats)
+        speedup = serial / seconds
+        print(f"{workers:>10} {seconds:10.2f} {speedup:10.2f} {speedup / workers:14.2f}")
+        results['parallel'].append({'workers': workers, 'seconds': seconds, 'speedup': speedup})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Микробенчмарк разбора Concentration / SMDB_id / Duration after transfection:
+# старые цепочки .str.split().str[0].str.extract() против etl/parsers.py
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.parsers import parse_concentration, parse_duration, parse_smdb_id
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+
+    rng = np.random.default_rng(seed)
+
+    concentrations = np.array([f"{value:g} nM" for value in np.round(rng.uniform(0.01, 200, 5000), 2)] + ["NA", "5nM", "10 pM"])
+    durations = np.array(["24 h", "48 h", "72 hours", "96", "6h"])
+
+    return pd.DataFrame({
+        "SMDB_id": pd.array([f"SM{i}" for i in range(1, rows + 1)], dtype="string"),
+        "Concentration": pd.array(rng.choice(concentrations, rows), dtype="string"),
+        "Duration after transfection": pd.array(rng.choice(durations, rows), dtype="string"),
+    })
+
+
+def legacy_parse(df: pd.DataFrame) -> pd.DataFrame:
+
+    result = pd.DataFrame(index=df.index)
+    result["Concentration new"] = (
+        df["Concentration"].str.split(" ").str[0].str.extract(r"^(\d+\.?\d*)$", expand=False)
+    )
+    result["id_"] = df["SMDB_id"].str.split("SM").str[1].str.extract(r"^(\d+\.?\d*)$", expand=False)
+    # В transform_data раньше было просто .str[0] + astype(int), что падало на значениях вроде "6h";
+    # для сравнения добавляем extract, чтобы такие строки отбрасывались как в etl/parsers.py
+    result["Duration after transfection new"] = (
+        df["Duration after transfection"].str.split(" ").str[0].str.extract(r"^(\d+)$", expand=False)
+    )
+    result = result.dropna(subset=["Concentration new", "Duration after transfection new"])
+    result["Concentration new"] = result["Concentration new"].astype(float)
+    result["id_"] = result["id_"].astype(int)
+    result["Duration after transfection new"] = result["Duration after transfection new"].astype(int)
+    return result
+
+
+def vectorized_parse(df: pd.DataFrame) -> pd.DataFrame:
+
+    concentration = parse_concentration(df["Concentration"])
+    ids = parse_smdb_id(df["SMDB_id"])
+    duration = parse_duration(df["Duration after transfection"])
+
+    positions = np.flatnonzero(~(pd.isna(concentration) | pd.isna(duration)))
+    return pd.DataFrame({
+        "Concentration new": concentration[positions].to_numpy(dtype=np.float64),
+        "id_": ids[positions].to_numpy(dtype=np.int64),
+        "Duration after transfection new": duration[positions].to_numpy(dtype=np.int64),
+    }, index=df.index[positions])
+
+
+def measure(function, df: pd.DataFrame, repeats: int):
+
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = function(df)
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Бенчмарк разбора числовых полей')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Размер синтетического датасета')
+    parser.add_argument('--repeats', type=int, default=3, help='Количество повторов (берется лучший)')
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"Синтетический датасет: {len(df)} строк")
+
+    legacy_seconds, legacy_result = measure(legacy_parse, df, args.repeats)
+    vectorized_seconds, vectorized_result = measure(vectorized_parse, df, args.repeats)
+
+    # Результаты обоих способов должны совпадать
+    pd.testing.assert_frame_equal(legacy_result, vectorized_result)
+
+    print(f"  цепочки .str: {legacy_seconds:8.2f} с, {len(df) / legacy_seconds:12,.0f} строк/с")
+    print(f"  etl/parsers:  {vectorized_seconds:8.2f} с, {len(df) / vectorized_seconds:12,.0f} строк/с")
+    print(f"  ускорение: x{legacy_seconds / vectorized_seconds:.1f}")
+
+
+if __name__ == '__main__':
+    main()
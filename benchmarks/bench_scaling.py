@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# Масштабирование этапов пайплайна на синтетических данных siRNAmod:
+# время, пропускная способность и пиковая память на 100k / 1M / 10M строк.
+# Каждый размер считается в отдельном процессе, чтобы пик RSS не копился между прогонами
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.categories import encode_low_cardinality
+from etl.db_pool import acquire_connection, release_connection
+from etl.extract import clean_raw_data, get_database_credentials, schema_read_options
+from etl.extract import FIRST_SHEET_ID, SECOND_SHEET_ID, SOURCE_SCHEMAS
+from etl.join import join_frames, JOIN_ALGORITHMS, JOIN_MEMORY_BUDGET_BYTES
+from etl.load import ensure_enum_types, write_dataframe
+from etl.metrics import RunReport
+from etl.parquet_writer import parquet_options, write_parquet_dataset
+from etl.synthetic import write_sheets
+from etl.transform import prepare_for_database, transform_data
+
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+
+def run_size(rows: int, dtype_backend: str, table_name: str, trace_memory: bool,
+             join_algorithm: str = "auto", join_memory_budget: int = JOIN_MEMORY_BUDGET_BYTES) -> dict:
+
+    report = RunReport(trace_memory=trace_memory)
+    quiet = io.StringIO()
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(quiet):
+        with report.stage("generate") as record:
+            first_path, second_path = write_sheets(directory, rows)
+            record['rows_out'] = rows
+
+        with report.stage("read_csv") as record:
+            # Только колонки из схемы источников, как в пайплайне
+            df1 = pd.read_csv(first_path, **schema_read_options(FIRST_SHEET_ID, dtype_backend))
+            df1 = df1.rename(columns=SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"])
+            df2 = pd.read_csv(second_path, **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+            df2 = df2.rename(columns=SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"])
+            record['rows_out'] = len(df1) + len(df2)
+
+        with report.stage("merge", len(df1)) as record:
+            # Тот же join_frames, что в пайплайне; входы без локальных ссылок, чтобы spill мог их освободить
+            frames = [df1, df2]
+            del df1, df2
+            merged, profile = join_frames(frames.pop(0), frames.pop(0), "SMDB_id",
+                                          algorithm=join_algorithm, memory_budget=join_memory_budget)
+            record['rows_out'] = len(merged)
+            record['algorithm'] = profile['algorithm']
+
+        with report.stage("clean", len(merged)) as record:
+            cleaned = clean_raw_data(merged, dtype_backend)
+            record['rows_out'] = len(cleaned)
+        del merged
+
+        with report.stage("encode", len(cleaned)) as record:
+            encoded = encode_low_cardinality(cleaned)
+            record['rows_out'] = len(encoded)
+        del cleaned
+
+        with report.stage("transform", len(encoded)) as record:
+            transformed = transform_data(encoded)
+            record['rows_out'] = len(transformed)
+        del encoded
+
+        if table_name:
+            credentials = get_database_credentials()
+            conn = acquire_connection(credentials)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+                ensure_enum_types(cursor, transformed, table_name)
+                cursor.execute(prepare_for_database(transformed, table_name))
+                with report.stage("load_copy", len(transformed)) as record:
+                    record['rows_out'] = write_dataframe(cursor, transformed, table_name, "copy")
+                    conn.commit()
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+                conn.commit()
+            finally:
+                release_connection(credentials, conn)
+
+        with report.stage("save_parquet", len(transformed)) as record:
+            write_parquet_dataset(transformed, os.path.join(directory, "processed.parquet"), parquet_options())
+            record['rows_out'] = len(transformed)
+
+        with report.stage("save_csv", len(transformed)) as record:
+            transformed.to_csv(os.path.join(directory, "processed.csv"), index=False)
+            record['rows_out'] = len(transformed)
+
+    summary = report.summary()
+    summary['rows'] = rows
+    return summary
+
+
+def run_in_subprocess(rows: int, args) -> dict:
+
+    command = [sys.executable, os.path.abspath(__file__), '--single', str(rows), '--backend', args.backend]
+    if args.table_name:
+        command += ['--table-name', args.table_name]
+    if args.trace_memory:
+        command.append('--trace-memory')
+    command += ['--join-algorithm', args.join_algorithm, '--join-memory-mb', str(args.join_memory_mb)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Прогон на {rows} строк завершился с ошибкой:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_results(result: dict) -> None:
+
+    print(f"\n{result['rows']:,} строк: всего {result['wall_seconds']:.2f} с, пик RSS {result['peak_rss_mb']:.0f} МБ")
+    for stage in result['stages']:
+        rows = stage['rows_in'] if stage['rows_in'] is not None else stage['rows_out']
+        throughput = rows / stage['wall_seconds'] if rows and stage['wall_seconds'] > 0 else 0
+        traced = f" {stage['tracemalloc_peak_mb']:9.1f} МБ" if stage['tracemalloc_peak_mb'] is not None else ""
+        algorithm = f" ({stage['algorithm']})" if stage.get('algorithm') else ""
+        print(f"  {stage['name']:>12}: {stage['wall_seconds']:8.2f} с, {throughput:12,.0f} строк/с, "
+              f"RSS {stage['peak_rss_mb']:8.1f} МБ{traced}{algorithm}")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Бенчмарк масштабирования этапов ETL на синтетических данных')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Размеры основного листа (например: 100000 1000000 10000000)')
+    parser.add_argument('--backend', choices=['numpy_nullable', 'pyarrow'], default='numpy_nullable',
+                        help='Бэкенд типов pandas')
+    parser.add_argument('--table-name', default=None,
+                        help='Замерить и загрузку COPY в эту временную таблицу (учетные данные из .env)')
+    parser.add_argument('--trace-memory', action='store_true', help='Замерять пик tracemalloc (медленнее)')
+    parser.add_argument('--join-algorithm', choices=JOIN_ALGORITHMS, default='auto',
+                        help='Алгоритм соединения листов (как --join-algorithm пайплайна)')
+    parser.add_argument('--join-memory-mb', type=int, default=JOIN_MEMORY_BUDGET_BYTES // 1024 // 1024,
+                        help='Бюджет памяти соединения в МБ, при превышении auto выбирает spill')
+    parser.add_argument('--output', default=None, help='JSON с результатами всех прогонов')
+    parser.add_argument('--single', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Дочерний процесс: один размер, результат - последней строкой JSON
+    if args.single is not None:
+        print(json.dumps(run_size(args.single, args.backend, args.table_name, args.trace_memory,
+                                  args.join_algorithm, args.join_memory_mb * 1024 * 1024)))
+        return
+
+    results = []
+    for rows in args.sizes:
+        result = run_in_subprocess(rows, args)
+        results.append(result)
+        print_results(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
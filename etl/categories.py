@@ -0,0 +1,75 @@
+import re
+import pandas as pd
+from typing import List
+
+
+# Колонка переводится в category, если доля уникальных значений не больше этой
+CATEGORY_MAX_RATIO = 0.05
+
+# Ограничения PostgreSQL: метка ENUM и имя типа - не длиннее 63 байт
+POSTGRES_NAME_MAX_BYTES = 63
+
+
+def encode_low_cardinality(df: pd.DataFrame, max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+
+    print("\n" + "=" * 50)
+    print(f"ПРОФИЛИРОВАНИЕ КАРДИНАЛЬНОСТИ (порог доли уникальных: {max_ratio})")
+    print("=" * 50)
+
+    if max_ratio <= 0 or len(df) == 0:
+        print("Словарное кодирование отключено")
+        return df
+
+    encoded = {}
+    total_before = 0
+    total_after = 0
+    for col in df.columns:
+        series = df[col]
+        if not (pd.api.types.is_string_dtype(series.dtype) or pd.api.types.is_object_dtype(series.dtype)):
+            continue
+
+        distinct_count = series.nunique(dropna=True)
+        ratio = distinct_count / len(df)
+        if ratio > max_ratio:
+            continue
+
+        # Метки категорий - object, как их возвращают Parquet и снимок Arrow IPC:
+        # иначе перечитанный кадр отличается по dtype от только что закодированного
+        categorical = series.astype("category")
+        categorical = categorical.cat.set_categories(categorical.cat.categories.astype(object))
+        before = int(series.memory_usage(deep=True, index=False))
+        after = int(categorical.memory_usage(deep=True, index=False))
+        total_before += before
+        total_after += after
+        encoded[col] = categorical
+        print(f"  - {col}: {distinct_count} значений (доля {ratio:.4f}), "
+              f"{before / 1024:.1f} КБ -> {after / 1024:.1f} КБ")
+
+    if not encoded:
+        print("Подходящих колонок не найдено")
+        return df
+
+    print(f"✓ В category переведено колонок: {len(encoded)}, "
+          f"экономия памяти: {(total_before - total_after) / 1024 / 1024:.2f} МБ")
+    return df.assign(**encoded)
+
+
+def enum_type_name(table_name: str, column: str) -> str:
+
+    # Имя ENUM-типа для колонки: <таблица>_<колонка>_enum в пределах 63 байт
+    slug = re.sub(r"[^0-9a-z]+", "_", column.lower()).strip("_")
+    max_slug_length = POSTGRES_NAME_MAX_BYTES - len(table_name) - len("__enum")
+    return f"{table_name}_{slug[:max(max_slug_length, 1)]}_enum"
+
+
+def enum_columns(df: pd.DataFrame) -> List[str]:
+
+    # Категориальные колонки, которые можно хранить в PostgreSQL как ENUM
+    columns = []
+    for col, dtype in df.dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        labels = [str(label) for label in dtype.categories]
+        if all(len(label.encode("utf-8")) <= POSTGRES_NAME_MAX_BYTES for label in labels):
+            columns.append(col)
+    return columns
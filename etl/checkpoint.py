@@ -0,0 +1,257 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+from contextlib import nullcontext
+import pandas as pd
+import pyarrow.parquet as pq
+from typing import Callable, Dict, List, Optional, Tuple
+from .http_cache import SheetCache
+from .metrics import RunReport
+from .parquet_writer import arrow_to_dataframe, dataframe_to_arrow
+
+
+# Этапы пакетного режима, результаты которых сохраняются, в порядке выполнения
+CHECKPOINT_STAGES = ("raw", "cleaned", "transformed")
+
+# Параметры хранилища контрольных точек по умолчанию
+CHECKPOINT_DIR = 'data/checkpoints'
+CHECKPOINT_MAX_AGE_SECONDS = 7 * 24 * 3600
+CHECKPOINT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def code_version(*functions) -> str:
+    """Хэш исходного кода модулей, где определены функции этапа: правка кода делает старые точки недействительными"""
+
+    modules = {}
+    for function in functions:
+        module = inspect.getmodule(function)
+        modules[module.__name__] = module
+
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        digest.update(inspect.getsource(modules[name]).encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage: str, *inputs) -> str:
+
+    # Ключ этапа - хэш его входов: ключа предыдущего этапа, параметров и версии кода
+    payload = json.dumps([stage, *inputs], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+
+    # Содержимое DataFrame: колонки, типы и хэши строк
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def sources_digest(sources: Dict[str, Dict], cache: SheetCache) -> str:
+
+    # Отпечаток исходных выгрузок по телам ответов в HTTP кэше:
+    # свежая копия берется без сети, иначе ревалидация (304) или загрузка
+    digest = hashlib.sha256()
+    for name in sorted(sources):
+        source = sources[name]
+        path = cache.fetch(source['key'], source['url'], timeout=source.get('timeout'))
+        # Типы колонок в read_options - объекты pandas (ArrowDtype), в отпечаток идет их имя
+        digest.update(json.dumps([name, source.get('rename'), source.get('read_options')], sort_keys=True, default=str).encode())
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def _category_value_types(df: pd.DataFrame) -> Dict[str, str]:
+
+    # Для category Arrow хранит только словарь: тип значений (string, string[pyarrow]) при чтении теряется
+    types = {}
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            value_type = dtype.categories.dtype
+            types[str(col)] = f"string[{value_type.storage}]" if isinstance(value_type, pd.StringDtype) else str(value_type)
+    return types
+
+
+def _restore_category_types(df: pd.DataFrame, types: Dict[str, str]) -> pd.DataFrame:
+
+    for col, value_type in types.items():
+        dtype = df[col].dtype
+        if str(dtype.categories.dtype) != value_type:
+            df[col] = df[col].astype(pd.CategoricalDtype(dtype.categories.astype(value_type), dtype.ordered))
+    return df
+
+
+class CheckpointStore:
+
+    def __init__(
+        self,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        max_age: float = CHECKPOINT_MAX_AGE_SECONDS,
+        max_bytes: int = CHECKPOINT_MAX_BYTES,
+    ):
+        self.checkpoint_dir = checkpoint_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+        # Точки, прочитанные или записанные в этом запуске, не вытесняются
+        self._in_use = set()
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def _name(self, stage: str, key: str) -> str:
+        return f"{stage}-{key}"
+
+    def _data_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.parquet")
+
+    def _meta_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{name}.json")
+
+    def _read_meta(self, name: str) -> Optional[Dict]:
+
+        if not os.path.exists(self._meta_path(name)) or not os.path.exists(self._data_path(name)):
+            return None
+        try:
+            with open(self._meta_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, name: str, meta: Dict) -> None:
+
+        tmp_path = self._meta_path(name) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path(name))
+
+    def exists(self, stage: str, key: str) -> bool:
+        return self._read_meta(self._name(stage, key)) is not None
+
+    def load(self, stage: str, key: str) -> pd.DataFrame:
+
+        name = self._name(stage, key)
+        meta = self._read_meta(name)
+        df = arrow_to_dataframe(pq.read_table(self._data_path(name)))
+        df = _restore_category_types(df, meta.get('category_types', {}))
+
+        self._in_use.add(name)
+        meta['last_access'] = time.time()
+        self._write_meta(name, meta)
+        print(f" Контрольная точка {stage}: {len(df)} строк из {self._data_path(name)}")
+        return df
+
+    def save(self, stage: str, key: str, df: pd.DataFrame) -> str:
+
+        name = self._name(stage, key)
+        path = self._data_path(name)
+
+        # Метаданные пишутся после данных: точка без .json считается незавершенной
+        tmp_path = path + '.tmp'
+        # Индекс сохраняется: после фильтрации строк он не RangeIndex, и resume должен вернуть тот же DataFrame
+        pq.write_table(dataframe_to_arrow(df, preserve_index=True), tmp_path)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        self._in_use.add(name)
+        self._write_meta(name, {
+            'stage': stage,
+            'key': key,
+            'rows': len(df),
+            'columns': len(df.columns),
+            'category_types': _category_value_types(df),
+            'created_at': now,
+            'last_access': now,
+            'size': os.path.getsize(path),
+        })
+        print(f" Контрольная точка {stage} сохранена: {path}")
+        return path
+
+    def evict(self) -> int:
+        """Удаляет точки старше max_age, затем давно не используемые, пока хранилище не уложится в max_bytes"""
+
+        entries = []
+        for file_name in os.listdir(self.checkpoint_dir):
+            if not file_name.endswith('.json'):
+                continue
+            name = file_name[:-len('.json')]
+            meta = self._read_meta(name)
+            if meta is not None:
+                entries.append((meta.get('last_access', 0), name, meta.get('size', 0), meta.get('created_at', 0)))
+
+        now = time.time()
+        total_size = sum(size for _, _, size, _ in entries)
+        removed = 0
+        for _, name, size, created_at in sorted(entries):
+            if name in self._in_use:
+                continue
+            if now - created_at <= self.max_age and total_size <= self.max_bytes:
+                continue
+            for path in (self._data_path(name), self._meta_path(name)):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_size -= size
+            removed += 1
+            print(f" Контрольные точки: удалена {name}")
+
+        return removed
+
+
+def _report_stage(report: Optional[RunReport], name: str, rows_in: Optional[int] = None):
+    return report.stage(name, rows_in) if report is not None else nullcontext({})
+
+
+def run_stages(
+    store: CheckpointStore,
+    stages: List[Tuple[str, str, Callable[[Optional[pd.DataFrame]], pd.DataFrame]]],
+    resume: bool = False,
+    force_stage: Optional[str] = None,
+    df: Optional[pd.DataFrame] = None,
+    report: Optional[RunReport] = None,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """Выполняет цепочку этапов (имя, ключ, функция от результата предыдущего этапа).
+
+    С resume=True результат берется из последней сохраненной точки с тем же ключом,
+    и выполняются только этапы после нее. force_stage и все этапы после него
+    пересчитываются в любом случае. df - вход первого этапа. Возвращает результат
+    и список этапов, взятых из контрольных точек.
+    """
+
+    names = [name for name, _, _ in stages]
+    if force_stage is not None and force_stage not in names:
+        # Иначе пересчитывать было бы нечего, и все этапы молча взялись бы из точек
+        raise ValueError(f"Этап {force_stage} не входит в цепочку контрольных точек: {', '.join(names)}")
+    forced = names.index(force_stage) if force_stage is not None else len(stages)
+
+    # Ищем с конца: если последний этап не менялся, предыдущие даже не читаются
+    start, reused = 0, []
+    if resume:
+        for i in range(forced - 1, -1, -1):
+            name, key, _ = stages[i]
+            if store.exists(name, key):
+                with _report_stage(report, f"resume_{name}") as record:
+                    df = store.load(name, key)
+                    record['rows_out'] = len(df)
+                start = i + 1
+                reused = names[:start]
+                break
+
+    for name, key, compute in stages[start:]:
+        with _report_stage(report, name, None if df is None else len(df)) as record:
+            df = compute(df)
+            store.save(name, key, df)
+            record['rows_out'] = len(df)
+
+    return df, reused
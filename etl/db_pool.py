@@ -0,0 +1,248 @@
+import threading
+import time
+import weakref
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from typing import Dict, Tuple
+
+
+# Параметры пула по умолчанию
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 4
+STATEMENT_TIMEOUT_MS = 10 * 60 * 1000
+# Проверка SELECT 1 - только для соединений, пролежавших в пуле дольше этого
+HEALTH_CHECK_IDLE_SECONDS = 30.0
+# Сколько ждать свободного соединения, когда все выданы
+ACQUIRE_TIMEOUT_SECONDS = 60.0
+# Интервал повторной попытки, если уведомление о возврате соединения было пропущено
+ACQUIRE_POLL_SECONDS = 0.1
+
+_settings = {
+    'min_size': POOL_MIN_SIZE,
+    'max_size': POOL_MAX_SIZE,
+    'statement_timeout_ms': STATEMENT_TIMEOUT_MS,
+    'health_check_idle_seconds': HEALTH_CHECK_IDLE_SECONDS,
+    'acquire_timeout_seconds': ACQUIRE_TIMEOUT_SECONDS,
+}
+
+# Один пул на набор учетных данных на весь процесс: проверка подключения,
+# DDL, загрузка и проверка результата берут уже открытые соединения,
+# и TLS/аутентификация выполняются один раз за запуск
+_pools: Dict[Tuple, psycopg2.pool.ThreadedConnectionPool] = {}
+_stats = {'connections': 0, 'checkouts': 0, 'discarded': 0}
+# Когда соединение вернулось в пул (для проверки после простоя)
+_released_at = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+# Счетчики меняются и под блокировкой пула (_connect при создании), поэтому у них своя блокировка
+_stats_lock = threading.Lock()
+# Уведомляет ожидающих, что соединение вернулось в пул
+_released = threading.Condition()
+
+
+class CountingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool, который считает открытые им соединения и открывает их вне своей блокировки"""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        # Соединения, которые сейчас открываются: место в пуле за ними уже занято
+        self._opening = 0
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _open(self):
+        conn = psycopg2.connect(*self._args, **self._kwargs)
+        with _stats_lock:
+            _stats['connections'] += 1
+        return conn
+
+    def _connect(self, key=None):
+        # Как в AbstractConnectionPool, но через _open (начальные min_size соединений и getconn с ключом)
+        conn = self._open()
+        if key is not None:
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        else:
+            self._pool.append(conn)
+        return conn
+
+    def getconn(self, key=None):
+
+        if key is not None:
+            return super().getconn(key)
+
+        # В ThreadedConnectionPool подключение (TCP/TLS/аутентификация) идет под блокировкой пула,
+        # и параллельные потоки открывали бы соединения по одному, а putconn ждал бы их
+        with self._lock:
+            if self.closed or self._pool:
+                return self._getconn()
+            if len(self._used) + self._opening >= self.maxconn:
+                raise psycopg2.pool.PoolError("connection pool exhausted")
+            self._opening += 1
+        try:
+            conn = self._open()
+        finally:
+            with self._lock:
+                self._opening -= 1
+
+        with self._lock:
+            if self.closed:
+                conn.close()
+                raise psycopg2.pool.PoolError("connection pool is closed")
+            key = self._getkey()
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        return conn
+
+
+def configure_pool(
+    min_size: int = POOL_MIN_SIZE,
+    max_size: int = POOL_MAX_SIZE,
+    statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+    health_check_idle_seconds: float = HEALTH_CHECK_IDLE_SECONDS,
+    acquire_timeout_seconds: float = ACQUIRE_TIMEOUT_SECONDS,
+) -> None:
+
+    if min_size < 0 or max_size < 1 or min_size > max_size:
+        raise ValueError(f"Некорректные размеры пула: min={min_size}, max={max_size}")
+    if health_check_idle_seconds < 0 or acquire_timeout_seconds < 0:
+        raise ValueError("Время простоя и ожидания соединения не может быть отрицательным")
+
+    # Новые настройки действуют для пулов, созданных после вызова
+    close_all_pools()
+    _settings.update(
+        min_size=min_size,
+        max_size=max_size,
+        statement_timeout_ms=statement_timeout_ms,
+        health_check_idle_seconds=health_check_idle_seconds,
+        acquire_timeout_seconds=acquire_timeout_seconds,
+    )
+
+
+def _pool_key(credentials: Dict[str, str]) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in credentials.items()))
+
+
+def get_pool(credentials: Dict[str, str]) -> psycopg2.pool.ThreadedConnectionPool:
+
+    key = _pool_key(credentials)
+    with _lock:
+        if key not in _pools:
+            connect_kwargs = dict(credentials)
+            # Таймаут задается на уровне сессии, чтобы зависший запрос не держал загрузку
+            if _settings['statement_timeout_ms']:
+                timeout_option = f"-c statement_timeout={int(_settings['statement_timeout_ms'])}"
+                connect_kwargs['options'] = f"{connect_kwargs.get('options', '')} {timeout_option}".strip()
+            _pools[key] = CountingConnectionPool(
+                _settings['min_size'],
+                _settings['max_size'],
+                **connect_kwargs
+            )
+        return _pools[key]
+
+
+def _is_healthy(conn) -> bool:
+
+    if conn.closed:
+        return False
+
+    # Только что открытое или недавно возвращенное соединение не проверяем:
+    # лишний запрос к серверу на каждую выдачу заметен при частых коротких операциях
+    released_at = _released_at.get(conn)
+    if released_at is None or time.monotonic() - released_at < _settings['health_check_idle_seconds']:
+        return True
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _getconn(pool: psycopg2.pool.ThreadedConnectionPool):
+
+    # Все соединения выданы - ThreadedConnectionPool сразу бросает PoolError;
+    # вместо этого ждем, пока другой поток вернет соединение. Подключение (TCP/TLS/аутентификация)
+    # идет вне _released, чтобы потоки открывали соединения параллельно
+    deadline = time.monotonic() + _settings['acquire_timeout_seconds']
+    while True:
+        try:
+            return pool.getconn()
+        except psycopg2.pool.PoolError:
+            remaining = deadline - time.monotonic()
+            if pool.closed or remaining <= 0:
+                raise
+        # Короткое ожидание: уведомление могло прийти между getconn и wait
+        with _released:
+            _released.wait(min(remaining, ACQUIRE_POLL_SECONDS))
+
+
+def _putconn(pool: psycopg2.pool.ThreadedConnectionPool, conn, close: bool = False) -> None:
+
+    if not close:
+        _released_at[conn] = time.monotonic()
+    pool.putconn(conn, close=close)
+    with _released:
+        _released.notify()
+
+
+def acquire_connection(credentials: Dict[str, str]):
+    """Берет соединение из пула, предварительно проверив, что оно живое.
+
+    Если все соединения выданы, ждет освобождения до acquire_timeout_seconds
+    (configure_pool), затем бросает psycopg2.pool.PoolError.
+    """
+
+    pool = get_pool(credentials)
+
+    # Разорванные соединения (рестарт сервера, таймаут простоя) закрываем и берем следующее
+    for _ in range(_settings['max_size'] + 1):
+        conn = _getconn(pool)
+        if _is_healthy(conn):
+            with _stats_lock:
+                _stats['checkouts'] += 1
+            return conn
+        with _stats_lock:
+            _stats['discarded'] += 1
+        _putconn(pool, conn, close=True)
+
+    raise psycopg2.OperationalError("Не удалось получить рабочее соединение из пула")
+
+
+def release_connection(credentials: Dict[str, str], conn) -> None:
+    """Возвращает соединение в пул; незавершенная транзакция откатывается"""
+
+    pool = get_pool(credentials)
+    if conn.closed:
+        _putconn(pool, conn, close=True)
+        return
+
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _putconn(pool, conn, close=True)
+        return
+    _putconn(pool, conn)
+
+
+def pool_max_size() -> int:
+
+    # Сколько соединений одновременно может выдать пул: параллельные этапы не должны брать больше
+    return _settings['max_size']
+
+
+def pool_stats() -> Dict[str, int]:
+
+    with _lock:
+        pools = len(_pools)
+    with _stats_lock:
+        return {'pools': pools, **_stats}
+
+
+def close_all_pools() -> None:
+
+    with _lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
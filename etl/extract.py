@@ -1,43 +1,279 @@
 import pandas as pd
+import pyarrow as pa
 import os
-from typing import Tuple
+from typing import Dict, Iterator, Optional, Tuple
+from .fetch import fetch_sources, FETCH_RETRIES, FETCH_TIMEOUT_SECONDS
+from .http_cache import SheetCache
+from .http_stream import iter_csv_stream, read_csv_stream
+from .join import join_frames, join_options
+from .sheets_api import iter_sheet_chunks, read_sheet, read_sheets, API_DEFAULT_SHEET
+from .metrics import print_memory_usage
+from .snapshot import write_snapshot, RAW_SNAPSHOT_PATH, SNAPSHOT_COMPRESSION
 from .validate import validate_raw_data
 
 
-def extract_data_from_google_sheets() -> pd.DataFrame:
+# Бэкенды типов pandas: обычные nullable-типы или Arrow (string[pyarrow] и т.д.)
+DTYPE_BACKENDS = ("numpy_nullable", "pyarrow")
+
+# Экспорт сырых данных в CSV (по флагу --raw-csv)
+RAW_CSV_PATH = 'data/raw/raw_data.csv'
+
+# Идентификаторы исходных Google Sheets таблиц
+FIRST_SHEET_ID = "1scmkeENxadknow2rZ6H9LiG9m_BJmkBH"
+SECOND_SHEET_ID = "1G6m-QoLgdWbOV3rSUBOaxn1cQBKkKk1H"
+
+# Откуда читаются листы: CSV-экспорт по ссылке, тот же экспорт потоком через пул соединений
+# (без HTTP кэша, тело разбирается по мере загрузки) или Google Sheets API (ключ в GOOGLE_API_KEY)
+EXTRACT_SOURCES = ("csv", "http", "api")
+
+# Копии листов в формате Google Sheets для API (CSV-экспорт идет по исходным файлам)
+API_SPREADSHEET_IDS = {
+    FIRST_SHEET_ID: "1Ty6n4XXAGfe_MZVUfRp_R7CmJVUnxlbUAUpCPa63VU0",
+    SECOND_SHEET_ID: "1jU1sSmnQScxIFpE22L4vul53xH_ThcZ0h2vnbVs58Xg",
+}
+
+# Схема источников: какие колонки дает каждый лист и их тип при чтении (None - тип выводит парсер).
+# Остальные колонки не разбираются вовсе, поэтому удалять в clean_raw_data больше нечего.
+# Второй лист нужен только для отбора строк по SMDB_id: из него читается один ключ,
+# а Efficacy первого листа сразу получает имя, которое раньше давал суффикс pd.merge
+SOURCE_SCHEMAS = {
+    FIRST_SHEET_ID: {
+        "columns": {
+            "SMDB_id": "string",
+            "Efficacy": None,
+            "Experiment used to check activity": "string",
+            "Target gene": "string",
+            "Cell or Organism used": "string",
+            "Transfection method": "string",
+            "siRNA sense": "string",
+            "siRNA antisense": "string",
+            "Modification sense": "string",
+            "Modification antisense": "string",
+            "Position sense": "string",
+            "Position antisense": "string",
+            "siRNA concentration": "string",
+            "Concentration": "string",
+            "Duration after transfection": "string",
+        },
+        "rename": {"Efficacy": "Efficacy_x"},
+    },
+    SECOND_SHEET_ID: {
+        "columns": {"SMDBid": "string"},
+        "rename": {"SMDBid": "SMDB_id"},
+    },
+}
+
+
+def sheet_export_url(sheet_id: str, format: str = "csv") -> str:
+
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format={format}"
+
+
+def sheet_source(sheet_id: str, cache: Optional[SheetCache] = None) -> str:
+
+    # Без кэша pandas читает прямо по URL, с кэшем - из локальной копии
+    url = sheet_export_url(sheet_id)
+    if cache is None:
+        return url
+    return cache.fetch(sheet_id, url)
+
+
+def csv_read_options(dtype_backend: str = "numpy_nullable", chunked: bool = False) -> Dict:
+
+    # С Arrow-бэкендом читаем сразу в Arrow-типы, без промежуточных Python-объектов.
+    # Движок pyarrow не умеет читать кусками, для потокового режима остается C-движок
+    if dtype_backend != "pyarrow":
+        return {}
+    if chunked:
+        return {"dtype_backend": "pyarrow"}
+    return {"engine": "pyarrow", "dtype_backend": "pyarrow"}
+
+
+def read_dtype(name: str, dtype_backend: str = "numpy_nullable"):
+
+    # Тип из схемы источника в тип pandas того же бэкенда, что дает convert_dtypes
+    if name == "string":
+        return pd.ArrowDtype(pa.string()) if dtype_backend == "pyarrow" else "string"
+    return name
+
+
+def source_column_types(sheet_id: str, chunked: bool = False) -> Dict[str, Optional[str]]:
+
+    # Кусками тип колонки не выводится: один кусок дал бы целые, другой - текст,
+    # и файлы потокового режима (схема по первому куску) не приняли бы следующий кусок
+    columns = SOURCE_SCHEMAS[sheet_id]["columns"]
+    if not chunked:
+        return columns
+    return {col: name or "string" for col, name in columns.items()}
+
+
+def schema_read_options(sheet_id: str, dtype_backend: str = "numpy_nullable", chunked: bool = False) -> Dict:
+
+    # Парсер читает только колонки из схемы и сразу в целевые типы
+    columns = source_column_types(sheet_id, chunked)
+    options = csv_read_options(dtype_backend, chunked)
+    options["usecols"] = list(columns)
+    options["dtype"] = {col: read_dtype(name, dtype_backend) for col, name in columns.items() if name is not None}
+    return options
+
+
+def sheet_sources(
+    timeout: float = FETCH_TIMEOUT_SECONDS,
+    dtype_backend: str = "numpy_nullable",
+    stream: bool = False,
+) -> Dict[str, Dict]:
+
+    # Все источники ETL: ключ кэша, URL выгрузки, переименования колонок, таймаут и параметры чтения
+    return {
+        "первый датасет": {
+            "key": FIRST_SHEET_ID,
+            "url": sheet_export_url(FIRST_SHEET_ID),
+            "rename": SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"],
+            "timeout": timeout,
+            "stream": stream,
+            "read_options": schema_read_options(FIRST_SHEET_ID, dtype_backend),
+        },
+        "второй датасет": {
+            "key": SECOND_SHEET_ID,
+            "url": sheet_export_url(SECOND_SHEET_ID),
+            "rename": SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"],
+            "timeout": timeout,
+            "stream": stream,
+            "read_options": schema_read_options(SECOND_SHEET_ID, dtype_backend),
+        },
+    }
+
+
+def api_sources() -> Dict[str, Dict]:
+
+    # Те же листы и та же схема колонок, что у CSV-источников
+    return {
+        name: {
+            "spreadsheet_id": API_SPREADSHEET_IDS[sheet_id],
+            "sheet": API_DEFAULT_SHEET,
+            "columns": SOURCE_SCHEMAS[sheet_id]["columns"],
+            "rename": SOURCE_SCHEMAS[sheet_id]["rename"],
+        }
+        for name, sheet_id in (("первый датасет", FIRST_SHEET_ID), ("второй датасет", SECOND_SHEET_ID))
+    }
+
+
+def read_source_frames(
+    source: str = "csv",
+    cache: Optional[SheetCache] = None,
+    timeout: float = FETCH_TIMEOUT_SECONDS,
+    retries: int = FETCH_RETRIES,
+    dtype_backend: str = "numpy_nullable",
+) -> Dict[str, pd.DataFrame]:
+
+    if source == "api":
+        frames, _ = read_sheets(api_sources(), dtype_backend)
+        return frames
+    if source in ("csv", "http"):
+        # http - те же выгрузки, но потоком: HTTP кэш не используется
+        stream = source == "http"
+        frames, _ = fetch_sources(sheet_sources(timeout, dtype_backend, stream), None if stream else cache, retries)
+        return frames
+    raise ValueError(f"Неизвестный источник: {source} (доступны: {', '.join(EXTRACT_SOURCES)})")
+
+
+def read_second_sheet(cache: Optional[SheetCache] = None, dtype_backend: str = "numpy_nullable", source: str = "csv") -> pd.DataFrame:
+
+    if source == "api":
+        return read_sheet(api_sources()["второй датасет"], dtype_backend)
+    if source == "http":
+        df = read_csv_stream(sheet_export_url(SECOND_SHEET_ID), **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+    else:
+        df = pd.read_csv(sheet_source(SECOND_SHEET_ID, cache), **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+    return df.rename(columns=SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"])
+
+
+def extract_data_from_google_sheets(
+    cache: Optional[SheetCache] = None,
+    timeout: float = FETCH_TIMEOUT_SECONDS,
+    retries: int = FETCH_RETRIES,
+    dtype_backend: str = "numpy_nullable",
+    join: Optional[Dict] = None,
+    source: str = "csv",
+) -> pd.DataFrame:
 
     print("=" * 50)
-    print("EXTRACT: Загрузка данных из Google Sheets")
+    print(f"EXTRACT: Загрузка данных из Google Sheets (источник: {source})")
     print("=" * 50)
     
-    # Первый датасет
-    format = "csv"
-    id1 = "1scmkeENxadknow2rZ6H9LiG9m_BJmkBH"
-    print("Загружаем первый датасет...")
-    df1 = pd.read_csv(f"https://docs.google.com/spreadsheets/d/{id1}/export?format={format}")
-    print(f"✓ Загружено {len(df1)} строк из первого датасета")
-    
-    # Второй датасет
-    id2 = "1G6m-QoLgdWbOV3rSUBOaxn1cQBKkKk1H"
-    print("Загружаем второй датасет...")
-    df2 = pd.read_csv(
-        f"https://docs.google.com/spreadsheets/d/{id2}/export?format={format}"
-    ).rename(columns={"SMDBid": "SMDB_id"})
-    print(f"✓ Загружено {len(df2)} строк из второго датасета")
-    
-    # Объединяем датасеты
+    # CSV-выгрузки загружаем параллельно (http - потоком), через API - постранично запросами batchGet
+    print("Загружаем датасеты...")
+    frames = read_source_frames(source, cache, timeout, retries, dtype_backend)
+    print(f"✓ Загружено {len(frames['первый датасет'])} строк из первого датасета")
+    print(f"✓ Загружено {len(frames['второй датасет'])} строк из второго датасета")
+    
+    # Объединяем датасеты: сначала профиль повторов SMDB_id, затем hash, sorted или соединение с выгрузкой на диск
     print("Объединяем датасеты по SMDB_id...")
-    merged_data = pd.merge(df1, df2, on="SMDB_id")
+    options = join or join_options()
+    # Листы передаются без локальных ссылок и без **: при соединении на диске join_frames
+    # освобождает их после записи партиций (через ** вызов держал бы кортеж аргументов)
+    merged_data, _ = join_frames(
+        frames.pop("первый датасет"), frames.pop("второй датасет"), "SMDB_id",
+        algorithm=options['algorithm'], fanout=options['fanout'],
+        memory_budget=options['memory_budget'], spill_dir=options['spill_dir'],
+    )
     print(f"✓ Объединенный датасет: {len(merged_data)} строк")
     
     return merged_data
 
 
-def clean_raw_data(df: pd.DataFrame) -> pd.DataFrame:
+def iter_google_sheets_chunks(
+    chunk_size: int,
+    cache: Optional[SheetCache] = None,
+    dtype_backend: str = "numpy_nullable",
+    source: str = "csv",
+) -> Iterator[pd.DataFrame]:
+
+    print("=" * 50)
+    print(f"EXTRACT: Потоковая загрузка из Google Sheets (по {chunk_size} строк, источник: {source})")
+    print("=" * 50)
+    
+    # Второй датасет целиком держим в памяти как индекс по SMDB_id
+    print("Загружаем второй датасет и строим индекс по SMDB_id...")
+    index = read_second_sheet(cache, dtype_backend, source).set_index("SMDB_id")
+    print(f"✓ Индекс второго датасета: {len(index)} строк")
+    
+    # Первый датасет читаем кусками и соединяем каждый кусок с индексом.
+    # join по колонке-ключу дает те же колонки и суффиксы, что и pd.merge
+    print("Читаем первый датасет кусками...")
+    if source == "api":
+        # Кусок - страница API из chunk_size строк
+        source_settings = {**api_sources()["первый датасет"], "columns": source_column_types(FIRST_SHEET_ID, chunked=True)}
+        reader = iter_sheet_chunks(source_settings, dtype_backend, page_rows=chunk_size)
+    elif source == "http":
+        # Кусок разбирается, пока остальная выгрузка еще скачивается
+        reader = iter_csv_stream(
+            sheet_export_url(FIRST_SHEET_ID), chunk_size, **schema_read_options(FIRST_SHEET_ID, dtype_backend, chunked=True)
+        )
+    else:
+        reader = pd.read_csv(
+            sheet_source(FIRST_SHEET_ID, cache),
+            chunksize=chunk_size,
+            **schema_read_options(FIRST_SHEET_ID, dtype_backend, chunked=True)
+        )
+    # Источник закрывается и при остановке на середине (ошибка в потребителе, close() генератора):
+    # незакрытый поток ответа держал бы соединение пула до сборки мусора
+    try:
+        for chunk_number, chunk in enumerate(reader, 1):
+            chunk = chunk.rename(columns=SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"])
+            merged_chunk = chunk.join(index, on="SMDB_id", how="inner", lsuffix="_x", rsuffix="_y")
+            print(f"✓ Кусок {chunk_number}: {len(chunk)} строк, после объединения {len(merged_chunk)}")
+            yield merged_chunk
+    finally:
+        reader.close()
+
+
+def clean_raw_data(df: pd.DataFrame, dtype_backend: str = "numpy_nullable") -> pd.DataFrame:
 
     print("Очистка сырых данных...")
     
-    # Удаляем ненужные колонки
+    # Удаляем ненужные колонки: при чтении по SOURCE_SCHEMAS их уже нет,
+    # список остается для данных, прочитанных целиком (старые снимки, сторонние выгрузки)
     columns_to_drop = [
         "Melting point (°C)",
         "Reference Link", 
@@ -49,8 +285,12 @@ def clean_raw_data(df: pd.DataFrame) -> pd.DataFrame:
     ]
     
     existing_columns_to_drop = [col for col in columns_to_drop if col in df.columns]
-    cleaned_data = df.drop(columns=existing_columns_to_drop)
-    print(f"✓ Удалены колонки: {existing_columns_to_drop}")
+    if existing_columns_to_drop:
+        cleaned_data = df.drop(columns=existing_columns_to_drop)
+        print(f"✓ Удалены колонки: {existing_columns_to_drop}")
+    else:
+        cleaned_data = df
+        print("✓ Лишних колонок нет: отобраны при чтении")
     
     # Удаляем строки с пропусками в важных колонках
     string_columns = [
@@ -73,35 +313,48 @@ def clean_raw_data(df: pd.DataFrame) -> pd.DataFrame:
     print(f"Удалено строк с пропусками: {before_count - after_count}")
     print(f"Осталось строк: {after_count}")
     
-    # Оптимизируем типы данных
-    cleaned_data = cleaned_data.convert_dtypes()
-    print("Типы данных оптимизированы")
+    # Оптимизируем типы данных (с Arrow-бэкендом строки остаются string[pyarrow])
+    cleaned_data = cleaned_data.convert_dtypes(dtype_backend=dtype_backend)
+    print(f"Типы данных оптимизированы (бэкенд: {dtype_backend})")
     
     return cleaned_data
 
 
-def save_raw_data(df: pd.DataFrame) -> str:
+def save_raw_data(df: pd.DataFrame, csv: bool = False, compression: str = SNAPSHOT_COMPRESSION) -> str:
 
-    os.makedirs('data/raw', exist_ok=True)
-    output_path = 'data/raw/raw_data.csv'
-    df.to_csv(output_path, index=False)
-    print(f"Сырые данные сохранены в {output_path}")
+    # Основной формат - снимок Arrow IPC с типами, CSV - только по запросу
+    output_path = write_snapshot(df, RAW_SNAPSHOT_PATH, compression)
+    print(f"Сырые данные сохранены в {output_path} (Arrow IPC)")
+    if csv:
+        os.makedirs(os.path.dirname(RAW_CSV_PATH), exist_ok=True)
+        df.to_csv(RAW_CSV_PATH, index=False)
+        print(f"Сырые данные экспортированы в {RAW_CSV_PATH}")
     return output_path
 
 
-def extract_data() -> Tuple[pd.DataFrame, str]:
+def extract_data(
+    cache: Optional[SheetCache] = None,
+    timeout: float = FETCH_TIMEOUT_SECONDS,
+    retries: int = FETCH_RETRIES,
+    dtype_backend: str = "numpy_nullable",
+    raw_csv: bool = False,
+    join: Optional[Dict] = None,
+    source: str = "csv",
+) -> Tuple[pd.DataFrame, str]:
 
     # Извлекаем данные из Google Sheets
-    raw_df = extract_data_from_google_sheets()
+    raw_df = extract_data_from_google_sheets(cache, timeout, retries, dtype_backend, join, source)
+    print_memory_usage("extract (после объединения)", raw_df)
     
     # Очищаем данные
-    cleaned_df = clean_raw_data(raw_df)
+    cleaned_df = clean_raw_data(raw_df, dtype_backend)
+    print_memory_usage("extract (после очистки)", cleaned_df)
     
     # Валидируем сырые данные
     validate_raw_data(cleaned_df)
     
     # Сохраняем сырые данные
-    output_path = save_raw_data(cleaned_df)
+    output_path = save_raw_data(cleaned_df, raw_csv)
     
     return cleaned_df, output_path
 
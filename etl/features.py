@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+
+# Колонки с последовательностями и префиксы признаков для них
+SEQUENCE_COLUMNS = {
+    "siRNA sense": "sense",
+    "siRNA antisense": "antisense",
+}
+
+# Коды нуклеотидов: A=0, C=1, G=2, U/T=3, прочие символы - OTHER_CODE, хвост строки - PAD_CODE
+NUCLEOTIDES = "ACGU"
+OTHER_CODE = 4
+PAD_CODE = 255
+KMER_SIZE = 2
+
+# Позиции от 5'-конца с one-hot признаками нуклеотида: 19 нт дуплекса и выступ 2 нт.
+# Число колонок фиксировано, чтобы схема Parquet не зависела от данных (и кусков потокового режима)
+SEQUENCE_POSITIONS = 21
+
+_LOOKUP = np.full(256, OTHER_CODE, dtype=np.uint8)
+for _code, _letters in enumerate(("Aa", "Cc", "Gg", "UuTt")):
+    for _letter in _letters:
+        _LOOKUP[ord(_letter)] = _code
+_LOOKUP[0] = PAD_CODE
+
+
+def encode_sequences(values) -> Tuple[np.ndarray, np.ndarray]:
+    """Строки -> матрица кодов uint8 (строка на последовательность) и длины"""
+
+    # Обозначение дезоксинуклеотида ("dTdT") убираем, пробелы по краям тоже.
+    # Дальше строки лежат как байты фиксированной ширины, и перевод в коды -
+    # одна индексация по таблице, без цикла по символам
+    cleaned = pd.Series(values, dtype=object).fillna("").astype(str).str.strip().str.replace("d", "", regex=False)
+    raw = np.array(cleaned.str.encode("ascii", errors="replace").tolist() or [b""], dtype="S")[:len(cleaned)]
+    width = raw.dtype.itemsize
+    matrix = _LOOKUP[np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(len(raw), width)]
+    lengths = (matrix != PAD_CODE).sum(axis=1).astype(np.int16)
+    return matrix, lengths
+
+
+def kmer_labels(k: int = KMER_SIZE) -> list:
+
+    labels = [""]
+    for _ in range(k):
+        labels = [label + letter for label in labels for letter in NUCLEOTIDES]
+    return labels
+
+
+def kmer_windows(matrix: np.ndarray, k: int = KMER_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Номер k-мера (0..4**k-1) в каждом окне и маска окон только из A/C/G/U"""
+
+    n, width = matrix.shape
+    windows = max(width - k + 1, 0)
+    index = np.zeros((n, windows), dtype=np.int64)
+    valid = np.ones((n, windows), dtype=bool)
+    for offset in range(k):
+        codes = matrix[:, offset:offset + windows]
+        valid &= codes < OTHER_CODE
+        index = index * 4 + np.where(codes < OTHER_CODE, codes, 0)
+    return index, valid
+
+
+def kmer_frequencies(matrix: np.ndarray, k: int = KMER_SIZE) -> np.ndarray:
+    """Доли k-меров в каждой последовательности, матрица (n, 4**k)"""
+
+    n, width = matrix.shape
+    result = np.zeros((n, 4 ** k), dtype=np.float32)
+    if n == 0 or width < k:
+        return result
+
+    # Окна с прочими символами или хвостом строки не считаются
+    index, valid = kmer_windows(matrix, k)
+    rows = np.broadcast_to(np.arange(n)[:, None], index.shape)
+    counts = np.bincount((rows * 4 ** k + index)[valid], minlength=n * 4 ** k).reshape(n, 4 ** k)
+    totals = counts.sum(axis=1, keepdims=True)
+    np.divide(counts, totals, out=result, where=totals > 0)
+    return result
+
+
+def position_one_hot(matrix: np.ndarray, positions: int = SEQUENCE_POSITIONS) -> np.ndarray:
+    """Нуклеотид в каждой позиции 1..positions, матрица (n, positions, 4) из bool; после конца цепи - все False"""
+
+    window = np.full((len(matrix), positions), PAD_CODE, dtype=np.uint8)
+    width = min(positions, matrix.shape[1])
+    window[:, :width] = matrix[:, :width]
+    return window[:, :, None] == np.arange(len(NUCLEOTIDES), dtype=np.uint8)
+
+
+def strand_features(values, prefix: str, k: int = KMER_SIZE, positions: int = SEQUENCE_POSITIONS) -> Dict[str, np.ndarray]:
+
+    matrix, lengths = encode_sequences(values)
+
+    features = {f"{prefix}_length": lengths}
+    counts = {letter: (matrix == code).sum(axis=1).astype(np.int16) for code, letter in enumerate(NUCLEOTIDES)}
+    gc_content = np.full(len(lengths), np.nan, dtype=np.float32)
+    np.divide(counts["G"] + counts["C"], lengths, out=gc_content, where=lengths > 0)
+    features[f"{prefix}_gc_content"] = gc_content
+    for letter, count in counts.items():
+        features[f"{prefix}_count_{letter}"] = count
+
+    # Концевые нуклеотиды (коды 0-3 как в NUCLEOTIDES, 4 - другой символ, 255 - пустая строка)
+    rows = np.arange(len(lengths))
+    last = np.maximum(lengths.astype(np.int64) - 1, 0)
+    features[f"{prefix}_5p_base"] = matrix[rows, 0]
+    features[f"{prefix}_3p_base"] = matrix[rows, last]
+
+    frequencies = kmer_frequencies(matrix, k)
+    for i, label in enumerate(kmer_labels(k)):
+        features[f"{prefix}_kmer_{label}"] = frequencies[:, i]
+
+    one_hot = position_one_hot(matrix, positions)
+    for position in range(positions):
+        for code, letter in enumerate(NUCLEOTIDES):
+            features[f"{prefix}_pos{position + 1}_{letter}"] = one_hot[:, position, code]
+    return features
+
+
+def sequence_features(df: pd.DataFrame, k: int = KMER_SIZE, positions: int = SEQUENCE_POSITIONS) -> pd.DataFrame:
+    """Числовые признаки последовательностей siRNA для Parquet"""
+
+    print("\n" + "=" * 30)
+    print(f"ПРИЗНАКИ ПОСЛЕДОВАТЕЛЬНОСТЕЙ (k-меры длины {k})")
+    print("=" * 30)
+
+    columns = {}
+    for column, prefix in SEQUENCE_COLUMNS.items():
+        if column not in df.columns:
+            print(f" Колонка {column} не найдена, признаки не считаются")
+            continue
+        # Признаки считаются по уникальным последовательностям и раскладываются по строкам
+        codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        for name, values in strand_features(np.asarray(uniques, dtype=object), prefix, k, positions).items():
+            columns[name] = values[codes]
+        print(f"✓ {column}: {len(uniques)} уникальных последовательностей")
+
+    features = pd.DataFrame(columns, index=df.index)
+    print(f"✓ Добавлено признаков: {len(features.columns)}")
+    return features
+
+
+def add_sequence_features(df: pd.DataFrame, k: int = KMER_SIZE, positions: int = SEQUENCE_POSITIONS) -> pd.DataFrame:
+
+    features = sequence_features(df, k, positions)
+    return pd.concat([df, features], axis=1)
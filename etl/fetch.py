@@ -0,0 +1,102 @@
+import io
+import time
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from .http_cache import SheetCache
+from .http_stream import open_stream
+
+
+# Параметры загрузки по умолчанию
+FETCH_TIMEOUT_SECONDS = 60
+FETCH_RETRIES = 3
+FETCH_BACKOFF_SECONDS = 1.0
+
+
+def download_sheet(url: str, key: str, cache: Optional[SheetCache] = None, timeout: float = FETCH_TIMEOUT_SECONDS):
+
+    # Возвращает то, что умеет читать pd.read_csv: путь к копии в кэше или буфер с телом ответа
+    if cache is not None:
+        return cache.fetch(key, url, timeout=timeout)
+
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return io.BytesIO(response.content)
+
+
+def fetch_source(
+    name: str,
+    source: Dict,
+    cache: Optional[SheetCache] = None,
+    retries: int = FETCH_RETRIES,
+    backoff: float = FETCH_BACKOFF_SECONDS,
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+
+    # timeout - на каждый запрос (соединение и ожидание данных), а не на всю загрузку:
+    # с повторами и задержками между ними источник может грузиться дольше
+    timeout = source.get('timeout', FETCH_TIMEOUT_SECONDS)
+    if retries < 1:
+        raise ValueError(f"{name}: число попыток должно быть не меньше 1, передано {retries}")
+    start_time = time.perf_counter()
+
+    stream = None
+    for attempt in range(1, retries + 1):
+        try:
+            if source.get('stream'):
+                # Тело разбирается по мере загрузки, без полной копии ответа в памяти
+                with open_stream(source['url'], timeout) as stream:
+                    df = pd.read_csv(stream, **source.get('read_options', {}))
+            else:
+                body = download_sheet(source['url'], source['key'], cache, timeout)
+                df = pd.read_csv(body, **source.get('read_options', {}))
+            break
+        except (requests.RequestException, OSError) as e:
+            if attempt == retries:
+                raise
+            # Экспоненциальная задержка между попытками: backoff, 2*backoff, 4*backoff...
+            delay = backoff * 2 ** (attempt - 1)
+            print(f" {name}: попытка {attempt} не удалась ({e}), повтор через {delay:.1f} с")
+            time.sleep(delay)
+
+    if source.get('rename'):
+        df = df.rename(columns=source['rename'])
+
+    timing = {
+        'seconds': time.perf_counter() - start_time,
+        'attempts': attempt,
+        'rows': len(df),
+    }
+    if stream is not None:
+        timing.update(bytes=stream.bytes_read, encoding=stream.content_encoding)
+    return df, timing
+
+
+def fetch_sources(
+    sources: Dict[str, Dict],
+    cache: Optional[SheetCache] = None,
+    retries: int = FETCH_RETRIES,
+    backoff: float = FETCH_BACKOFF_SECONDS,
+    max_workers: Optional[int] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[str, float]]]:
+
+    # Все источники скачиваются и парсятся параллельно,
+    # поэтому общее время близко ко времени самого медленного из них
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources)) as executor:
+        futures = {
+            name: executor.submit(fetch_source, name, source, cache, retries, backoff)
+            for name, source in sources.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    frames = {name: df for name, (df, _) in results.items()}
+    timings = {name: timing for name, (_, timing) in results.items()}
+
+    for name, timing in timings.items():
+        print(f" {name}: {timing['rows']} строк за {timing['seconds']:.2f} с (попыток: {timing['attempts']})")
+        if 'encoding' in timing:
+            print(f"   потоком, сжатие {timing['encoding']}, {timing['bytes'] / 1024 / 1024:.1f} МБ после распаковки")
+    print(f" Все источники загружены за {time.perf_counter() - start_time:.2f} с")
+
+    return frames, timings
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+import requests
+from typing import Dict, Optional
+
+
+# Параметры кэша по умолчанию
+CACHE_DIR = 'data/cache'
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+REQUEST_TIMEOUT_SECONDS = 60
+
+
+class SheetCache:
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        ttl: float = CACHE_TTL_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        # Счетчики для итоговой сводки
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale = 0
+
+        # Записи, выданные в этом запуске, не вытесняются (их могут читать другие потоки)
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_meta(self, key: str) -> Optional[Dict]:
+
+        if not os.path.exists(self._meta_path(key)) or not os.path.exists(self._body_path(key)):
+            return None
+        try:
+            with open(self._meta_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: Dict) -> None:
+
+        tmp_path = self._meta_path(key) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(key))
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def fetch(self, key: str, url: str, timeout: Optional[float] = None) -> str:
+        """Возвращает путь к локальной копии ответа, при необходимости скачивая или ревалидируя ее"""
+
+        with self._lock:
+            self._in_use.add(key)
+
+        meta = self._read_meta(key)
+        now = time.time()
+
+        # Свежая копия - не ходим в сеть вовсе
+        if meta is not None and now - meta['fetched_at'] < self.ttl:
+            self._count('hits')
+            meta['last_access'] = now
+            self._write_meta(key, meta)
+            print(f" Кэш: {key} взят из кэша (возраст {now - meta['fetched_at']:.0f} с)")
+            return self._body_path(key)
+
+        # Условный запрос: сервер ответит 304, если данные не менялись
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = requests.get(url, headers=headers, timeout=timeout or self.timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            # Нет сети или сервер недоступен - отдаем то, что есть
+            self._count('stale')
+            meta['last_access'] = now
+            self._write_meta(key, meta)
+            print(f" Кэш: не удалось обновить {key} ({e}), используем сохраненную копию")
+            return self._body_path(key)
+
+        if response.status_code == 304:
+            self._count('revalidated')
+            meta['fetched_at'] = now
+            meta['last_access'] = now
+            self._write_meta(key, meta)
+            print(f" Кэш: {key} не изменился (304 Not Modified)")
+            return self._body_path(key)
+
+        # Новая версия - сохраняем тело атомарно
+        self._count('misses')
+        tmp_path = self._body_path(key) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, self._body_path(key))
+
+        self._write_meta(key, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+            'last_access': now,
+            'size': len(response.content),
+        })
+        print(f" Кэш: {key} загружен заново ({len(response.content)} байт)")
+
+        self.evict()
+        return self._body_path(key)
+
+    def evict(self) -> int:
+        """Удаляет давно не используемые записи, пока кэш не уложится в max_bytes"""
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            meta = self._read_meta(key)
+            if meta is not None:
+                entries.append((meta.get('last_access', 0), key, meta.get('size', 0)))
+
+        total_size = sum(size for _, _, size in entries)
+        removed = 0
+        for _, key, size in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if key in self._in_use:
+                continue
+            for path in (self._body_path(key), self._meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_size -= size
+            removed += 1
+            print(f" Кэш: удалена запись {key}")
+
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'stale': self.stale,
+        }
@@ -0,0 +1,107 @@
+import io
+import threading
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from typing import Iterator, Optional
+
+
+# Соединений в пуле на хост: по одному на параллельно скачиваемый лист с запасом
+HTTP_POOL_SIZE = 8
+
+# Размер куска тела ответа, который отдается парсеру CSV
+HTTP_CHUNK_BYTES = 256 * 1024
+
+HTTP_TIMEOUT_SECONDS = 60
+
+# Сжатия, которые urllib3 умеет распаковывать в этом окружении (gzip, deflate, br/zstd при наличии библиотек)
+HTTP_ACCEPT_ENCODING = ACCEPT_ENCODING
+
+# Одна сессия на процесс: соединения к docs.google.com переиспользуются между листами и запусками extract
+_session = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            # Повторы делает fetch_source с задержкой, адаптер только держит пул соединений
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Accept-Encoding'] = HTTP_ACCEPT_ENCODING
+            _session = session
+        return _session
+
+
+class ResponseStream(io.RawIOBase):
+    """Тело ответа как бинарный файл для pd.read_csv: куски iter_content читаются по мере разбора.
+
+    Распаковка gzip/deflate идет в urllib3 по кускам, UTF-8 декодирует сам парсер CSV
+    в своем буфере, поэтому тело целиком не хранится ни в байтах, ни в строке.
+    """
+
+    def __init__(self, response: requests.Response, chunk_size: int = HTTP_CHUNK_BYTES):
+        self.response = response
+        self._chunks = response.iter_content(chunk_size)
+        self._chunk = memoryview(b'')
+        # Байты после распаковки, отданные парсеру
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+
+        if not self._chunk:
+            chunk = next(self._chunks, b'')
+            if not chunk:
+                return 0
+            self._chunk = memoryview(chunk)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        self.bytes_read += size
+        return size
+
+    @property
+    def content_encoding(self) -> str:
+        return self.response.headers.get('Content-Encoding', 'identity')
+
+    def close(self) -> None:
+        self.response.close()
+        super().close()
+
+
+def open_stream(url: str, timeout: float = HTTP_TIMEOUT_SECONDS, session: Optional[requests.Session] = None) -> ResponseStream:
+
+    response = (session or get_session()).get(url, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    return ResponseStream(response)
+
+
+def read_csv_stream(url: str, timeout: float = HTTP_TIMEOUT_SECONDS, **read_options) -> pd.DataFrame:
+
+    with open_stream(url, timeout) as body:
+        return pd.read_csv(body, **read_options)
+
+
+def iter_csv_stream(url: str, chunk_size: int, timeout: float = HTTP_TIMEOUT_SECONDS, **read_options) -> Iterator[pd.DataFrame]:
+    """Куски CSV по мере загрузки тела ответа.
+
+    Если куски читаются не до конца (ошибка, ранняя остановка), генератор нужно закрыть
+    (close() или contextlib.closing): иначе соединение из пула сессии остается занятым,
+    пока генератор не соберет сборщик мусора.
+    """
+
+    # Кусок DataFrame разбирается, пока остальное тело еще идет по сети
+    with open_stream(url, timeout) as body:
+        yield from pd.read_csv(body, chunksize=chunk_size, **read_options)
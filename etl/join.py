@@ -0,0 +1,339 @@
+import contextlib
+import math
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, List, Tuple
+from .parquet_writer import arrow_to_dataframe, dataframe_to_arrow
+
+
+# Алгоритмы соединения: auto выбирает по профилю ключей и оценке памяти
+JOIN_ALGORITHMS = ("auto", "hash", "sorted", "spill")
+
+# Что делать, если ключ повторяется с обеих сторон (many-to-many, строки размножаются)
+JOIN_FANOUT_POLICIES = ("warn", "fail")
+
+# Бюджет памяти на входы и результат соединения; при превышении соединение идет по партициям на диске
+JOIN_MEMORY_BUDGET_BYTES = 1024 * 1024 * 1024
+
+# Временные партиции grace hash join
+JOIN_SPILL_DIR = 'data/spill'
+
+# Служебные колонки с номерами строк входов: порядок результата как у pd.merge
+# (по левой таблице, повторы одной левой строки - по правой)
+LEFT_ROW_COLUMN = '__left_row'
+RIGHT_ROW_COLUMN = '__right_row'
+
+SUFFIXES = ("_x", "_y")
+
+# Строк в одном блоке при записи партиций и при слиянии результата: в памяти Arrow-копия
+# только одного блока, а не всей таблицы
+JOIN_BLOCK_ROWS = 200_000
+
+
+def join_options(
+    algorithm: str = "auto",
+    fanout: str = "warn",
+    memory_budget: int = JOIN_MEMORY_BUDGET_BYTES,
+    spill_dir: str = JOIN_SPILL_DIR,
+) -> Dict:
+
+    return {
+        'algorithm': algorithm,
+        'fanout': fanout,
+        'memory_budget': memory_budget,
+        'spill_dir': spill_dir,
+    }
+
+
+def profile_keys(left: pd.DataFrame, right: pd.DataFrame, key: str) -> Dict:
+    """Кратность ключа с обеих сторон и точное число строк результата до соединения"""
+
+    left_counts = left[key].value_counts(dropna=False)
+    right_counts = right[key].value_counts(dropna=False)
+    common = left_counts.to_frame('left').join(right_counts.to_frame('right'), how='inner')
+    fanout_keys = common[(common['left'] > 1) & (common['right'] > 1)]
+
+    left_bytes = int(left.memory_usage(deep=True, index=False).sum())
+    right_bytes = int(right.memory_usage(deep=True, index=False).sum())
+    output_rows = int((common['left'] * common['right']).sum())
+    row_bytes = left_bytes / max(len(left), 1) + right_bytes / max(len(right), 1)
+
+    left_unique = len(left_counts) == len(left)
+    right_unique = len(right_counts) == len(right)
+    if left_unique and right_unique:
+        relationship = 'one-to-one'
+    elif right_unique:
+        relationship = 'many-to-one'
+    elif left_unique:
+        relationship = 'one-to-many'
+    else:
+        relationship = 'many-to-many'
+
+    return {
+        'key': key,
+        'left_rows': len(left),
+        'right_rows': len(right),
+        'left_max_multiplicity': int(left_counts.max()) if len(left_counts) else 0,
+        'right_max_multiplicity': int(right_counts.max()) if len(right_counts) else 0,
+        'relationship': relationship,
+        'matched_keys': len(common),
+        'fanout_keys': len(fanout_keys),
+        'fanout_extra_rows': int((fanout_keys['left'] * fanout_keys['right'] - fanout_keys['left']).sum()),
+        'output_rows': output_rows,
+        'has_null_keys': bool(left[key].isna().any() or right[key].isna().any()),
+        'sorted': bool(left[key].is_monotonic_increasing and right[key].is_monotonic_increasing),
+        'input_bytes': left_bytes + right_bytes,
+        'estimated_bytes': int(left_bytes + right_bytes + output_rows * row_bytes),
+    }
+
+
+def print_join_profile(profile: Dict) -> None:
+
+    print(f" Ключ {profile['key']}: {profile['relationship']}, "
+          f"повторов слева до {profile['left_max_multiplicity']}, справа до {profile['right_max_multiplicity']}")
+    print(f" Совпавших ключей: {profile['matched_keys']}, ожидается строк: {profile['output_rows']} "
+          f"(~{profile['estimated_bytes'] / 1024 / 1024:.1f} МБ со входами)")
+    if profile['fanout_keys']:
+        print(f" Внимание: {profile['fanout_keys']} ключей повторяются с обеих сторон, "
+              f"лишних строк от размножения: {profile['fanout_extra_rows']}")
+
+
+def choose_algorithm(profile: Dict, memory_budget: int = JOIN_MEMORY_BUDGET_BYTES) -> str:
+
+    if profile['estimated_bytes'] > memory_budget:
+        return 'spill'
+    # Уже отсортированные ключи соединяются бинарным поиском без хэш-таблицы
+    if profile['sorted'] and not profile['has_null_keys']:
+        return 'sorted'
+    return 'hash'
+
+
+def _assemble(left: pd.DataFrame, right: pd.DataFrame, key: str, left_rows: np.ndarray, right_rows: np.ndarray) -> pd.DataFrame:
+
+    # Те же колонки и суффиксы, что у pd.merge: ключ один раз, совпадающие имена с _x/_y
+    right = right.drop(columns=[key])
+    overlap = set(left.columns) & set(right.columns)
+    left_part = left.take(left_rows).rename(columns={col: col + SUFFIXES[0] for col in overlap})
+    right_part = right.take(right_rows).rename(columns={col: col + SUFFIXES[1] for col in overlap})
+    left_part.index = right_part.index = pd.RangeIndex(len(left_rows))
+    return pd.concat([left_part, right_part], axis=1)
+
+
+def sorted_join(left: pd.DataFrame, right: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Sort-merge join: правая сторона по ключу (уже отсортированная не сортируется), левая ищется бинарным поиском"""
+
+    right_keys = right[key].to_numpy()
+    order = None if right[key].is_monotonic_increasing else np.argsort(right_keys, kind='stable')
+    if order is not None:
+        right_keys = right_keys[order]
+
+    left_keys = left[key].to_numpy()
+    starts = np.searchsorted(right_keys, left_keys, side='left')
+    stops = np.searchsorted(right_keys, left_keys, side='right')
+    counts = stops - starts
+
+    # Для каждой левой строки - все совпавшие правые в исходном порядке
+    left_rows = np.repeat(np.arange(len(left)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_rows = np.repeat(starts, counts) + offsets
+    if order is not None:
+        right_rows = order[right_rows]
+    return _assemble(left, right, key, left_rows, right_rows)
+
+
+def _spill_partitions(df: pd.DataFrame, key: str, partitions: int, directory: str, prefix: str, row_column: str) -> pa.Schema:
+
+    # Схема выводится по всей таблице без копирования данных, блоки пишутся в ней:
+    # иначе блок с одними пропусками получил бы тип null
+    schema = pa.Schema.from_pandas(df, preserve_index=False).append(pa.field(row_column, pa.int64()))
+    paths = [os.path.join(directory, f"{prefix}-{number}.arrow") for number in range(partitions)]
+    with contextlib.ExitStack() as stack:
+        writers = [stack.enter_context(pa.ipc.new_file(stack.enter_context(pa.OSFile(path, 'wb')), schema)) for path in paths]
+        for start in range(0, len(df), JOIN_BLOCK_ROWS):
+            block = df.iloc[start:start + JOIN_BLOCK_ROWS]
+            # Номер строки добавляется в копию блока, вся таблица не копируется
+            table = dataframe_to_arrow(block.assign(**{row_column: np.arange(start, start + len(block), dtype=np.int64)}), schema)
+            # Партиция по хэшу ключа: одинаковые ключи обеих таблиц попадают в партицию с одним номером
+            partition_ids = pa.array(pd.util.hash_pandas_object(block[key], index=False).to_numpy() % partitions)
+            for number, writer in enumerate(writers):
+                writer.write_table(table.filter(pc.equal(partition_ids, number)))
+    return schema
+
+
+def _result_schema(left_schema: pa.Schema, right_schema: pa.Schema, key: str) -> pa.Schema:
+
+    # Схема результата по схемам входов, а не по первой партиции: в ней колонка может оказаться пустой
+    overlap = (set(left_schema.names) & set(right_schema.names)) - {key}
+    fields = [
+        field.with_name(field.name + SUFFIXES[0]) if field.name in overlap else field
+        for field in left_schema
+    ]
+    fields += [
+        field.with_name(field.name + SUFFIXES[1]) if field.name in overlap else field
+        for field in right_schema if field.name != key
+    ]
+    return pa.schema(fields)
+
+
+def _read_partition(directory: str, prefix: str, number: int) -> pd.DataFrame:
+
+    with pa.memory_map(os.path.join(directory, f"{prefix}-{number}.arrow")) as source:
+        return arrow_to_dataframe(pa.ipc.open_file(source).read_all())
+
+
+def _read_mapped(path: str) -> pa.Table:
+
+    # Таблица ссылается на страницы файла без копирования в память процесса
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _read_result(path: str) -> pd.DataFrame:
+
+    # По одной колонке: прочитанные страницы файла освобождаются вместе с таблицей колонки,
+    # поэтому в памяти не оказываются одновременно весь файл и весь DataFrame
+    names = _read_mapped(path).schema.names
+    columns = {name: arrow_to_dataframe(_read_mapped(path).select([name]))[name] for name in names}
+    return pd.DataFrame(columns, columns=names)
+
+
+def _merge_partitions(paths: List[str], rows: int, schema: pa.Schema, result_path: str, block_rows: int) -> None:
+    """K-way слияние партиций, каждая отсортирована по номерам строк, в файл результата.
+
+    Строки одной левой строки лежат в одной партиции (партиция выбирается по ключу),
+    поэтому блок номеров [start, stop) - это непрерывный срез каждой партиции; в памяти
+    одновременно только один блок результата.
+    """
+
+    parts = [_read_mapped(path) for path in paths]
+    positions = [part.column(LEFT_ROW_COLUMN).to_numpy() for part in parts]
+    offsets = [0] * len(parts)
+    with pa.OSFile(result_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for start in range(0, rows, block_rows):
+            stop = min(start + block_rows, rows)
+            pieces = []
+            for number, part in enumerate(parts):
+                end = offsets[number] + int(np.searchsorted(positions[number][offsets[number]:], stop, side='left'))
+                if end > offsets[number]:
+                    pieces.append(part.slice(offsets[number], end - offsets[number]))
+                offsets[number] = end
+            if not pieces:
+                continue
+            block = pa.concat_tables(pieces)
+            # Стабильная сортировка: строки одной левой строки уже упорядочены в своей партиции
+            order = np.argsort(block.column(LEFT_ROW_COLUMN).to_numpy(), kind='stable')
+            writer.write_table(block.take(order).drop_columns([LEFT_ROW_COLUMN, RIGHT_ROW_COLUMN]))
+
+
+def spill_join(
+    inputs: List[pd.DataFrame],
+    key: str,
+    partitions: int,
+    spill_dir: str = JOIN_SPILL_DIR,
+) -> pd.DataFrame:
+    """Grace hash join: обе таблицы делятся по хэшу ключа на партиции на диске,
+    в памяти одновременно хэш-таблица и результат только одной партиции.
+
+    inputs - список [left, right]; таблицы забираются из него и освобождаются сразу
+    после записи на диск, поэтому вызывающий код не должен держать на них ссылки.
+    """
+
+    os.makedirs(spill_dir, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='join-', dir=spill_dir)
+    left, right = inputs.pop(0), inputs.pop(0)
+    # Типы результата как у pd.merge: после Arrow строки и категории могут вернуться другими типами.
+    # head(0).copy() - пустые таблицы без ссылок на данные входов
+    template = pd.merge(left.head(0).copy(), right.head(0).copy(), on=key)
+    left_rows = len(left)
+    try:
+        left_schema = _spill_partitions(left, key, partitions, directory, 'left', LEFT_ROW_COLUMN)
+        del left
+        right_schema = _spill_partitions(right, key, partitions, directory, 'right', RIGHT_ROW_COLUMN)
+        del right
+        schema = _result_schema(left_schema.remove_metadata(), right_schema.remove_metadata(), key)
+
+        # Результат каждой партиции сразу упорядочивается по номерам строк и уходит на диск:
+        # порядок повторов внутри pd.merge партиции может отличаться от соединения целиком
+        paths = []
+        for number in range(partitions):
+            joined = pd.merge(
+                _read_partition(directory, 'left', number),
+                _read_partition(directory, 'right', number),
+                on=key,
+            )
+            joined = joined.sort_values([LEFT_ROW_COLUMN, RIGHT_ROW_COLUMN])
+            paths.append(os.path.join(directory, f'joined-{number}.arrow'))
+            with pa.OSFile(paths[-1], 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(pa.Table.from_pandas(joined, schema=schema, preserve_index=False))
+            del joined
+
+        result_path = os.path.join(directory, 'result.arrow')
+        result_schema = pa.schema([field for field in schema if field.name not in (LEFT_ROW_COLUMN, RIGHT_ROW_COLUMN)])
+        _merge_partitions(paths, left_rows, result_schema, result_path, JOIN_BLOCK_ROWS)
+        merged = _read_result(result_path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for col, dtype in template.dtypes.items():
+        if merged[col].dtype != dtype:
+            # По колонке, а не astype всего DataFrame: остальные колонки не копируются
+            merged[col] = merged[col].astype(dtype)
+        elif dtype == object and merged[col].isna().any():
+            # Пропуски в object-колонках Arrow возвращает как None, а read_csv и pd.merge дают NaN
+            merged[col] = merged[col].where(merged[col].notna(), np.nan)
+    return merged
+
+
+def join_frames(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    key: str,
+    algorithm: str = "auto",
+    fanout: str = "warn",
+    memory_budget: int = JOIN_MEMORY_BUDGET_BYTES,
+    spill_dir: str = JOIN_SPILL_DIR,
+) -> Tuple[pd.DataFrame, Dict]:
+    """Inner join по ключу с профилем кратности ключей; результат совпадает с pd.merge(left, right, on=key)"""
+
+    start_time = time.perf_counter()
+    profile = profile_keys(left, right, key)
+    print_join_profile(profile)
+
+    if profile['fanout_keys'] and fanout == 'fail':
+        raise ValueError(
+            f"Ключ {key} повторяется с обеих сторон у {profile['fanout_keys']} значений: "
+            f"соединение добавит {profile['fanout_extra_rows']} строк"
+        )
+
+    if algorithm == "auto":
+        algorithm = choose_algorithm(profile, memory_budget)
+    if algorithm == "sorted" and profile['has_null_keys']:
+        # Пропуски в ключе не сравниваются при бинарном поиске, а pd.merge соединяет их между собой
+        print(" В ключе есть пропуски, вместо sorted используется hash")
+        algorithm = "hash"
+
+    if algorithm == "hash":
+        merged = pd.merge(left, right, on=key)
+    elif algorithm == "sorted":
+        merged = sorted_join(left, right, key)
+    elif algorithm == "spill":
+        partitions = max(2, math.ceil(profile['estimated_bytes'] / memory_budget) * 2)
+        print(f" Соединение по {partitions} партициям на диске (оценка {profile['estimated_bytes'] / 1024 / 1024:.1f} МБ, "
+              f"бюджет {memory_budget / 1024 / 1024:.0f} МБ)")
+        # Ссылки на входы передаются spill_join: записав партиции, она их освобождает
+        inputs = [left, right]
+        del left, right
+        merged = spill_join(inputs, key, partitions, spill_dir)
+    else:
+        raise ValueError(f"Неизвестный алгоритм соединения: {algorithm} (доступны: {', '.join(JOIN_ALGORITHMS)})")
+
+    profile['algorithm'] = algorithm
+    profile['seconds'] = round(time.perf_counter() - start_time, 4)
+    print(f"✓ Соединение {algorithm}: {len(merged)} строк за {profile['seconds']:.2f} с")
+    return merged, profile
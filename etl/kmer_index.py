@@ -0,0 +1,261 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from .features import SEQUENCE_COLUMNS, encode_sequences, kmer_windows
+
+
+# Индекс лежит рядом с processed_data.parquet
+KMER_INDEX_PATH = 'data/processed/kmer_index.npz'
+KMER_INDEX_SIZE = 5
+TOP_N = 10
+
+# Поля записей, которые возвращает поиск
+RECORD_COLUMNS = {
+    'id_': 'id_',
+    'Target gene': 'target_gene',
+    'Efficacy_x': 'efficacy',
+}
+
+# Колонки данных, которые нужны для построения индекса
+KMER_INDEX_COLUMNS = ['id_', *SEQUENCE_COLUMNS, *[col for col in RECORD_COLUMNS if col != 'id_']]
+
+
+def _entry_kmers(sequences: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    # Пары (запись, k-мер) без повторов внутри одной последовательности
+    matrix, _ = encode_sequences(sequences)
+    if matrix.shape[1] < k:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    index, valid = kmer_windows(matrix, k)
+    rows = np.broadcast_to(np.arange(len(sequences), dtype=np.int64)[:, None], index.shape)
+    pairs = np.unique(rows[valid] * 4 ** k + index[valid])
+    return pairs // 4 ** k, pairs % 4 ** k
+
+
+def _text_values(values: pd.Series) -> np.ndarray:
+
+    # Пропуски -> '' без fillna по object-колонке (pandas предупреждает о понижении типа)
+    return values.astype(str).where(values.notna(), '').to_numpy()
+
+
+def _entries_from_frame(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+
+    # Одна запись индекса на последовательность: строка данных x цепь (sense/antisense)
+    parts = []
+    for strand, (column, _) in enumerate(SEQUENCE_COLUMNS.items()):
+        if column not in df.columns:
+            continue
+        part = pd.DataFrame({
+            'id': df['id_'].to_numpy(dtype=np.int64),
+            'strand': np.full(len(df), strand, dtype=np.uint8),
+            'sequence': _text_values(df[column]),
+        })
+        for column_name, field in RECORD_COLUMNS.items():
+            if column_name != 'id_':
+                part[field] = _text_values(df[column_name]) if column_name in df.columns else np.full(len(df), '')
+        parts.append(part)
+
+    # id_ в данных повторяется (разные эксперименты), поэтому запись - уникальная комбинация всех полей
+    entries = pd.concat(parts, ignore_index=True).drop_duplicates()
+    return {
+        'entry_id': entries['id'].to_numpy(dtype=np.int64),
+        'entry_strand': entries['strand'].to_numpy(dtype=np.uint8),
+        'entry_sequence': entries['sequence'].to_numpy(dtype=str),
+        'entry_target_gene': entries['target_gene'].to_numpy(dtype=str),
+        'entry_efficacy': entries['efficacy'].to_numpy(dtype=str),
+    }
+
+
+def _csr(entry_numbers: np.ndarray, kmers: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    # Постинг-листы подряд, отсортированы по k-меру; offsets[k]..offsets[k+1] - записи с k-мером k
+    order = np.argsort(kmers, kind='stable')
+    postings = entry_numbers[order].astype(np.int32)
+    offsets = np.zeros(4 ** k + 1, dtype=np.int64)
+    np.cumsum(np.bincount(kmers, minlength=4 ** k), out=offsets[1:])
+    return postings, offsets
+
+
+def build_index(df: pd.DataFrame, k: int = KMER_INDEX_SIZE) -> Dict[str, np.ndarray]:
+    """Инвертированный индекс k-меров по siRNA sense/antisense"""
+
+    entries = _entries_from_frame(df)
+    entry_numbers, kmers = _entry_kmers(entries['entry_sequence'], k)
+    postings, offsets = _csr(entry_numbers, kmers, k)
+
+    index = dict(entries)
+    index['k'] = np.array(k)
+    index['entry_kmer_count'] = np.bincount(entry_numbers, minlength=len(entries['entry_id'])).astype(np.int32)
+    index['entry_active'] = np.ones(len(entries['entry_id']), dtype=bool)
+    index['postings'] = postings
+    index['offsets'] = offsets
+    return index
+
+
+def update_index(index: Dict[str, np.ndarray], df: pd.DataFrame, prune: bool = False) -> Tuple[Dict[str, np.ndarray], int]:
+    """Добавляет новые записи, не пересчитывая k-меры уже проиндексированных.
+
+    prune=True - df содержит весь датасет: записи, которых в нем больше нет
+    (удаленные или измененные строки), выключаются.
+    """
+
+    k = int(index['k'])
+    entries = _entries_from_frame(df)
+
+    fields = ['entry_id', 'entry_strand', 'entry_sequence', 'entry_target_gene', 'entry_efficacy']
+    index_keys = pd.MultiIndex.from_arrays([index[field] for field in fields])
+    entry_keys = pd.MultiIndex.from_arrays([entries[field] for field in fields])
+
+    new_mask = ~entry_keys.isin(index_keys[index['entry_active']])
+    entry_active = index['entry_active']
+    if prune:
+        entry_active = entry_active & index_keys.isin(entry_keys)
+    if not new_mask.any():
+        return dict(index, entry_active=entry_active), 0
+
+    added = {field: entries[field][new_mask] for field in fields}
+
+    start = len(index['entry_id'])
+    entry_numbers, kmers = _entry_kmers(added['entry_sequence'], k)
+    old_kmers = np.repeat(np.arange(4 ** k), np.diff(index['offsets']))
+    postings, offsets = _csr(
+        np.concatenate([index['postings'].astype(np.int64), entry_numbers + start]),
+        np.concatenate([old_kmers, kmers]),
+        k,
+    )
+
+    updated = {field: np.concatenate([index[field], added[field]]) for field in fields}
+    updated['k'] = index['k']
+    updated['entry_kmer_count'] = np.concatenate([
+        index['entry_kmer_count'],
+        np.bincount(entry_numbers, minlength=int(new_mask.sum())).astype(np.int32),
+    ])
+    updated['entry_active'] = np.concatenate([entry_active, np.ones(int(new_mask.sum()), dtype=bool)])
+    updated['postings'] = postings
+    updated['offsets'] = offsets
+    return updated, int(new_mask.sum())
+
+
+def save_index(index: Dict[str, np.ndarray], path: str = KMER_INDEX_PATH) -> str:
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # np.savez сам добавляет .npz, поэтому пишем через открытый файл и переименовываем атомарно
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **index)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_index(path: str = KMER_INDEX_PATH) -> Dict[str, np.ndarray]:
+
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def refresh_index(df: pd.DataFrame, path: str = KMER_INDEX_PATH, k: int = KMER_INDEX_SIZE) -> Dict[str, np.ndarray]:
+
+    print("\n" + "=" * 30)
+    print("ИНДЕКС K-МЕРОВ")
+    print("=" * 30)
+
+    start_time = time.perf_counter()
+    if os.path.exists(path):
+        index = load_index(path)
+        if int(index['k']) == k:
+            index, added = update_index(index, df, prune=True)
+            print(f"✓ Индекс обновлен: добавлено записей {added}")
+            # Выключенные записи остаются в постинг-листах; когда их много, индекс пересобирается
+            if index['entry_active'].mean() < 0.5:
+                print(" Больше половины записей устарело, индекс пересобирается")
+                index = build_index(df, k)
+        else:
+            print(f" Длина k-меров изменилась ({int(index['k'])} -> {k}), индекс строится заново")
+            index = build_index(df, k)
+    else:
+        index = build_index(df, k)
+        print(f"✓ Индекс построен: {len(index['entry_id'])} последовательностей")
+
+    save_index(index, path)
+    print(f"✓ Индекс сохранен в {path} ({int(index['entry_active'].sum())} активных записей, "
+          f"{len(index['postings'])} вхождений k-меров, {time.perf_counter() - start_time:.2f} с)")
+    return index
+
+
+def query_index(
+    index: Dict[str, np.ndarray],
+    sequence: str,
+    top_n: int = TOP_N,
+    strand: Optional[str] = None,
+) -> pd.DataFrame:
+    """Top-N записей, ближайших к последовательности по сходству Жаккара множеств k-меров"""
+
+    k = int(index['k'])
+    _, query_kmers = _entry_kmers(np.array([sequence]), k)
+    columns = ['id_', 'strand', 'sequence', 'Target gene', 'Efficacy_x', 'shared_kmers', 'similarity']
+    if len(query_kmers) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Просматриваются только постинг-листы k-меров запроса, а не все записи
+    offsets = index['offsets']
+    candidates = np.concatenate([index['postings'][offsets[kmer]:offsets[kmer + 1]] for kmer in query_kmers])
+    entries, shared = np.unique(candidates, return_counts=True)
+
+    keep = index['entry_active'][entries]
+    if strand is not None:
+        keep &= index['entry_strand'][entries] == list(SEQUENCE_COLUMNS.values()).index(strand)
+    entries, shared = entries[keep], shared[keep]
+
+    similarity = shared / (len(query_kmers) + index['entry_kmer_count'][entries] - shared)
+    best = np.argsort(-similarity, kind='stable')[:top_n]
+    entries = entries[best]
+
+    strand_names = np.array(list(SEQUENCE_COLUMNS.values()))
+    return pd.DataFrame({
+        'id_': index['entry_id'][entries],
+        'strand': strand_names[index['entry_strand'][entries]],
+        'sequence': index['entry_sequence'][entries],
+        'Target gene': index['entry_target_gene'][entries],
+        'Efficacy_x': index['entry_efficacy'][entries],
+        'shared_kmers': shared[best],
+        'similarity': np.round(similarity[best], 4),
+    }, columns=columns)
+
+
+def main(argv: Optional[list] = None):
+
+    parser = argparse.ArgumentParser(description='Индекс k-меров siRNA: построение и поиск похожих последовательностей')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Построить или дополнить индекс по Parquet')
+    build_parser.add_argument('--input', default='data/processed/processed_data.parquet', help='Обработанные данные')
+    build_parser.add_argument('--index', default=KMER_INDEX_PATH, help='Файл индекса')
+    build_parser.add_argument('-k', type=int, default=KMER_INDEX_SIZE, help='Длина k-меров')
+
+    query_parser = subparsers.add_parser('query', help='Найти похожие последовательности')
+    query_parser.add_argument('sequence', help='Последовательность запроса')
+    query_parser.add_argument('--index', default=KMER_INDEX_PATH, help='Файл индекса')
+    query_parser.add_argument('--top', type=int, default=TOP_N, help='Сколько записей вернуть')
+    query_parser.add_argument('--strand', choices=list(SEQUENCE_COLUMNS.values()), default=None,
+                              help='Искать только по одной цепи')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        refresh_index(pd.read_parquet(args.input, columns=KMER_INDEX_COLUMNS), args.index, args.k)
+        return
+
+    index = load_index(args.index)
+    start_time = time.perf_counter()
+    result = query_index(index, args.sequence, args.top, args.strand)
+    elapsed = time.perf_counter() - start_time
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(result.to_string(index=False))
+    print(f"\nНайдено {len(result)} записей за {elapsed * 1000:.1f} мс "
+          f"(в индексе {int(index['entry_active'].sum())} последовательностей)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,214 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import io
+import contextvars
 import os
-from typing import Dict
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from .categories import enum_columns, enum_type_name
+from .db_pool import acquire_connection, pool_max_size, release_connection
+from .modifications import array_columns, with_array_lists, with_array_literals
+from .parquet_writer import link_or_copy, parquet_options, remove_output, write_manifest, write_parquet_dataset
+from .snapshot import write_snapshot, PROCESSED_SNAPSHOT_PATH, SNAPSHOT_COMPRESSION
 from .validate import validate_database_connection
 
 
-def load_to_database(df: pd.DataFrame, credentials: Dict[str, str], table_name: str, max_rows: int = 100) -> bool:
+# Способы загрузки в БД: COPY FROM STDIN (по умолчанию),
+# пакетный execute_values и старая построчная вставка (для сравнения)
+LOAD_METHODS = ("copy", "batch", "rows")
+
+# Сколько строк кодируем в CSV за один COPY
+COPY_CHUNK_SIZE = 50000
+
+# Сколько строк отправляем в одном INSERT ... VALUES
+BATCH_PAGE_SIZE = 1000
+
+# Колонка с хэшем содержимого строки для инкрементальной загрузки
+ROW_HASH_COLUMN = "row_hash"
+
+# Параллельная загрузка: партиций больше, чем соединений, чтобы повтор
+# упавшей партиции был недорогим, а свободные соединения брали следующие
+LOAD_PARTITIONS_PER_WORKER = 4
+LOAD_RETRIES = 3
+LOAD_RETRY_DELAY_SECONDS = 1.0
+
+
+def quote_column(column: str) -> str:
+
+    # Экранируем названия колонок если нужно
+    return f'"{column}"' if ' ' in column or '-' in column else column
+
+
+def format_column_list(columns: Iterable[str]) -> str:
+
+    return ', '.join(quote_column(col) for col in columns)
+
+
+def copy_dataframe(cursor, df: pd.DataFrame, table_name: str, chunk_size: int = COPY_CHUNK_SIZE) -> int:
+
+    # Потоково передаем DataFrame через COPY FROM STDIN в формате CSV.
+    # CSV генерируется кусками по chunk_size строк, поэтому в памяти
+    # никогда не лежит текстовое представление всего датасета
+    copy_sql = f"COPY {table_name} ({format_column_list(df.columns)}) FROM STDIN WITH (FORMAT csv)"
+    
+    for start in range(0, len(df), chunk_size):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunk_size].to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+    
+    return len(df)
+
+
+def _iter_row_batches(df: pd.DataFrame, batch_size: int):
+
+    # Приводим значения к питоновским типам (numpy.int64 и pd.NA psycopg2 не понимает)
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield list(chunk.itertuples(index=False, name=None))
+
+
+def insert_dataframe_batched(cursor, df: pd.DataFrame, table_name: str, page_size: int = BATCH_PAGE_SIZE) -> int:
+
+    # Запасной вариант: многострочные INSERT через execute_values
+    insert_sql = f"INSERT INTO {table_name} ({format_column_list(df.columns)}) VALUES %s"
+    
+    inserted_count = 0
+    for rows in _iter_row_batches(df, page_size):
+        psycopg2.extras.execute_values(cursor, insert_sql, rows, page_size=page_size)
+        inserted_count += len(rows)
+    
+    return inserted_count
+
+
+def insert_dataframe_rows(cursor, df: pd.DataFrame, table_name: str) -> int:
+
+    # Старый способ: одна команда INSERT на каждую строку
+    placeholders = ', '.join(['%s'] * len(df.columns))
+    insert_sql = f"INSERT INTO {table_name} ({format_column_list(df.columns)}) VALUES ({placeholders})"
+    
+    inserted_count = 0
+    for index, row in df.iterrows():
+        try:
+            cursor.execute(insert_sql, tuple(row))
+            inserted_count += 1
+        except Exception as e:
+            print(f" Ошибка вставки строки {index}: {e}")
+    
+    return inserted_count
+
+
+def write_dataframe(cursor, df: pd.DataFrame, table_name: str, method: str = "copy") -> int:
+
+    # Колонки-списки (позиции и коды модификаций) идут в массивы PostgreSQL
+    if method == "copy":
+        return copy_dataframe(cursor, with_array_literals(df), table_name)
+    if method == "batch":
+        return insert_dataframe_batched(cursor, with_array_lists(df), table_name)
+    if method == "rows":
+        return insert_dataframe_rows(cursor, with_array_lists(df), table_name)
+    raise ValueError(f"Неизвестный способ загрузки: {method} (доступны: {', '.join(LOAD_METHODS)})")
+
+
+def save_modification_code_table(credentials: Dict[str, str], table_name: str, codes: Dict[str, int]) -> str:
+
+    # Справочник кодов модификаций рядом с основной таблицей: code -> название
+    codes_table = f"{table_name}_modification_codes"
+    conn = acquire_connection(credentials)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {codes_table} (code SMALLINT PRIMARY KEY, name TEXT NOT NULL)")
+        if codes:
+            psycopg2.extras.execute_values(
+                cursor,
+                f"INSERT INTO {codes_table} (code, name) VALUES %s ON CONFLICT (code) DO UPDATE SET name = EXCLUDED.name",
+                [(code, name) for name, code in codes.items()],
+            )
+        conn.commit()
+        cursor.close()
+    finally:
+        release_connection(credentials, conn)
+    print(f" Справочник модификаций записан в таблицу {codes_table} ({len(codes)} кодов)")
+    return codes_table
+
+
+def ensure_enum_types(cursor, df: pd.DataFrame, table_name: str) -> None:
+
+    # Словарное кодирование category переносим в БД как ENUM-типы:
+    # тип создается при первой загрузке, новые значения добавляются в него
+    for column in enum_columns(df):
+        type_name = enum_type_name(table_name, column)
+        labels = [str(label) for label in df[column].cat.categories]
+        
+        cursor.execute("SELECT 1 FROM pg_type WHERE typname = %s", (type_name,))
+        if cursor.fetchone() is None:
+            values = ', '.join(cursor.mogrify('%s', (label,)).decode() for label in labels)
+            cursor.execute(f"CREATE TYPE {type_name} AS ENUM ({values})")
+        else:
+            for label in labels:
+                cursor.execute(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS %s", (label,))
+        print(f" ENUM {type_name}: {len(labels)} значений")
+    
+    # Новые значения ENUM нельзя использовать в той же транзакции, где они добавлены
+    cursor.connection.commit()
+
+
+def has_column(cursor, table_name: str, column: str) -> bool:
+
+    cursor.execute(
+        "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = %s AND NOT attisdropped",
+        (table_name, column),
+    )
+    return cursor.fetchone() is not None
+
+
+def prepare_table(cursor, df: pd.DataFrame, table_name: str, unique_ids: bool = False) -> bool:
+    """Создает и очищает таблицу для полной перезаливки.
+
+    unique_ids - в загружаемых данных id_ не повторяется: тогда уникальный индекс
+    инкрементальной загрузки остается. Возвращает True, если в таблице есть колонка
+    row_hash - тогда перезаливка должна записать и хэши строк.
+    """
+
+    # ENUM-типы для категориальных колонок
+    ensure_enum_types(cursor, df, table_name)
+    
+    # Создаем таблицу
+    from .transform import prepare_for_database
+    create_sql = prepare_for_database(df, table_name)
+    cursor.execute(create_sql)
+    print(" Таблица создана/проверена")
+    
+    # Очищаем таблицу
+    cursor.execute(f"TRUNCATE TABLE {table_name}")
+    print(" Таблица очищена")
+    
+    # Уникальный индекс инкрементальной загрузки мешает только перезаливке с повторами id_
+    # (или когда данные заранее неизвестны, как в потоковом режиме); при следующей
+    # инкрементальной загрузке он создастся снова
+    if not unique_ids:
+        cursor.execute("SELECT to_regclass(%s)", (f"{table_name}_id__key",))
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(f"DROP INDEX {table_name}_id__key")
+            print(f" Уникальный индекс {table_name}_id__key удален: id_ в данных может повторяться")
+    
+    return has_column(cursor, table_name, ROW_HASH_COLUMN)
+
+
+def has_unique_ids(df: pd.DataFrame) -> bool:
+
+    return 'id_' in df.columns and not df['id_'].duplicated().any()
+
+
+def load_to_database(df: pd.DataFrame, credentials: Dict[str, str], table_name: str, max_rows: Optional[int] = None, method: str = "copy") -> bool:
 
     print("\n" + "=" * 50)
     print(f"LOAD: Загрузка в базу данных (таблица: {table_name})")
@@ -21,41 +224,29 @@ def load_to_database(df: pd.DataFrame, credentials: Dict[str, str], table_name:
     conn = None
     try:
         # Подключаемся к PostgreSQL
-        conn = psycopg2.connect(**credentials)
+        conn = acquire_connection(credentials)
         cursor = conn.cursor()
-        print(" Подключение к PostgreSQL установлено")
+        print(" Соединение с PostgreSQL получено из пула")
         
-        # Создаем таблицу
-        from .transform import prepare_for_database
-        create_sql = prepare_for_database(df, table_name)
-        cursor.execute(create_sql)
-        print(" Таблица создана/проверена")
-        
-        # Очищаем таблицу
-        cursor.execute(f"TRUNCATE TABLE {table_name}")
-        print(" Таблица очищена")
-        
-        # Записываем данные (максимум max_rows строк)
-        data_to_insert = df.head(max_rows)
-        print(f" Загружаем {len(data_to_insert)} строк (максимум {max_rows})...")
-        
-        # Подготавливаем SQL для вставки
-        columns = ', '.join([f'"{col}"' if ' ' in col or '-' in col else col for col in df.columns])
-        placeholders = ', '.join(['%s'] * len(df.columns))
-        insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        
-        # Вставляем данные построчно
-        inserted_count = 0
-        for index, row in data_to_insert.iterrows():
-            try:
-                cursor.execute(insert_sql, tuple(row))
-                inserted_count += 1
-            except Exception as e:
-                print(f" Ошибка вставки строки {index}: {e}")
+        # Создаем и очищаем таблицу
+        data_to_insert = df if max_rows is None else df.head(max_rows)
+        if prepare_table(cursor, data_to_insert, table_name, has_unique_ids(data_to_insert)):
+            # Таблица уже знакома инкрементальной загрузке: хэши пишутся сразу, чтобы следующая
+            # инкрементальная загрузка применила только настоящие изменения
+            data_to_insert = data_to_insert.assign(**{ROW_HASH_COLUMN: compute_row_hashes(data_to_insert)})
+        
+        # Записываем данные (все строки или максимум max_rows)
+        limit_info = "без ограничения" if max_rows is None else f"максимум {max_rows}"
+        print(f" Загружаем {len(data_to_insert)} строк ({limit_info}), способ: {method}...")
+        
+        start_time = time.perf_counter()
+        inserted_count = write_dataframe(cursor, data_to_insert, table_name, method)
         
         # Подтверждаем изменения
         conn.commit()
-        print(f" Данные записаны в базу ({inserted_count} строк)")
+        elapsed = time.perf_counter() - start_time
+        rate = inserted_count / elapsed if elapsed > 0 else float("inf")
+        print(f" Данные записаны в базу ({inserted_count} строк за {elapsed:.2f} с, {rate:,.0f} строк/с)")
         
         # Проверяем запись
         cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
@@ -85,36 +276,455 @@ def load_to_database(df: pd.DataFrame, credentials: Dict[str, str], table_name:
     finally:
         if conn:
             cursor.close()
-            conn.close()
-            print(" Соединение с PostgreSQL закрыто")
+            release_connection(credentials, conn)
+            print(" Соединение с PostgreSQL возвращено в пул")
+
+
+def partition_by_id(df: pd.DataFrame, partitions: int) -> List[pd.DataFrame]:
+    """Делит DataFrame на партиции по диапазонам id_: все строки одного id_ попадают в одну партицию"""
+
+    ids = df['id_'].to_numpy()
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+
+    # Границы примерно равных партиций сдвигаются к началу группы своего id_
+    bounds = np.linspace(0, len(df), max(min(partitions, len(df)), 1) + 1).astype(int)
+    bounds[1:-1] = np.searchsorted(sorted_ids, sorted_ids[bounds[1:-1]], side='left')
+    bounds = np.unique(bounds)
+    return [df.iloc[order[start:stop]] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _load_partition(credentials: Dict[str, str], df: pd.DataFrame, table_name: str, method: str, retries: int) -> int:
+
+    # Каждая партиция - отдельная транзакция на своем соединении из пула:
+    # неудачная попытка откатывается целиком и повторяется, остальные партиции не трогаются
+    for attempt in range(1, retries + 1):
+        conn = None
+        try:
+            conn = acquire_connection(credentials)
+            with conn.cursor() as cursor:
+                inserted_count = write_dataframe(cursor, df, table_name, method)
+            conn.commit()
+            return inserted_count
+        except psycopg2.Error as e:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            if attempt == retries:
+                raise
+            print(f" Партиция id_ {df['id_'].min()}-{df['id_'].max()}: попытка {attempt} не удалась ({e}), повтор")
+            time.sleep(LOAD_RETRY_DELAY_SECONDS * attempt)
+        finally:
+            if conn is not None:
+                release_connection(credentials, conn)
+
+
+def table_exists(cursor, table_name: str) -> bool:
+
+    cursor.execute("SELECT to_regclass(%s)", (table_name,))
+    return cursor.fetchone()[0] is not None
+
+
+def table_indexes(cursor, table_name: str) -> List[Tuple[str, str, bool]]:
+    """Индексы таблицы: имя, определение и признак ограничения (PRIMARY KEY / UNIQUE / EXCLUDE)"""
+
+    cursor.execute(
+        """
+        SELECT COALESCE(c.conname, i.relname),
+               COALESCE(pg_get_constraintdef(c.oid), pg_get_indexdef(x.indexrelid)),
+               c.oid IS NOT NULL
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid
+        WHERE x.indrelid = %s::regclass
+        ORDER BY 1
+        """,
+        (table_name,),
+    )
+    return cursor.fetchall()
+
+
+def table_grants(cursor, table_name: str) -> List[Tuple[str, str, bool]]:
+    """Права на таблицу, выданные владельцем: получатель (PUBLIC или роль), привилегия, WITH GRANT OPTION"""
+
+    cursor.execute(
+        """
+        SELECT CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE pg_get_userbyid(a.grantee) END,
+               a.privilege_type, a.is_grantable
+        FROM pg_class c, aclexplode(c.relacl) a
+        WHERE c.oid = %s::regclass AND a.grantee <> c.relowner
+        ORDER BY 1, 2
+        """,
+        (table_name,),
+    )
+    return cursor.fetchall()
+
+
+def copy_indexes(cursor, indexes: List[Tuple[str, str, bool]], target: str, suffix: str) -> List[Tuple[str, str, bool]]:
+    """Создает индексы и ограничения на target под временными именами <имя><suffix>.
+
+    Каждый - в своей точке сохранения: индекс, который больше не подходит к данным
+    (исчезла колонка, повторы в уникальном ключе), пропускается с предупреждением.
+    Возвращает созданные (временное имя, исходное имя, ограничение ли) для переименования после подмены.
+    """
+
+    created = []
+    for name, definition, is_constraint in indexes:
+        temporary = f"{name[:63 - len(suffix)]}{suffix}"
+        if is_constraint:
+            create_sql = f"ALTER TABLE {target} ADD CONSTRAINT {temporary} {definition}"
+        else:
+            create_sql = re.sub(r"^(CREATE (?:UNIQUE )?INDEX) \S+ ON (?:ONLY )?\S+ ", rf"\1 {temporary} ON {target} ", definition, count=1)
+        cursor.execute("SAVEPOINT copy_index")
+        try:
+            cursor.execute(create_sql)
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT copy_index")
+            print(f" Внимание: индекс {name} не перенесен ({str(e).strip().splitlines()[0]})")
+            continue
+        cursor.execute("RELEASE SAVEPOINT copy_index")
+        created.append((temporary, name, is_constraint))
+    return created
+
+
+def copy_grants(cursor, grants: List[Tuple[str, str, bool]], target: str) -> None:
+
+    for grantee, privilege, grantable in grants:
+        role = grantee if grantee == 'PUBLIC' else psycopg2.extensions.quote_ident(grantee, cursor)
+        cursor.execute(f"GRANT {privilege} ON {target} TO {role}{' WITH GRANT OPTION' if grantable else ''}")
+
+
+def parallel_load_to_database(
+    df: pd.DataFrame,
+    credentials: Dict[str, str],
+    table_name: str,
+    max_rows: Optional[int] = None,
+    method: str = "copy",
+    workers: int = 4,
+    retries: int = LOAD_RETRIES,
+) -> bool:
+    """Полная перезаливка в несколько соединений.
+
+    Партиции по диапазонам id_ параллельно пишутся в UNLOGGED таблицу
+    {table_name}_staging, затем одна транзакция переводит ее в LOGGED, строит на ней
+    индексы и права прежней таблицы и подменяет ею основную таблицу. До подмены
+    читатели видят прежние данные, при ошибке основная таблица не меняется.
+
+    Партиции берут соединения из общего пула: соединений не больше его размера
+    (--pool-max-size), на время записи партиций функция свое соединение не держит.
+    """
+
+    print("\n" + "=" * 50)
+    print(f"LOAD: Параллельная загрузка в базу данных (таблица: {table_name}, соединений: {workers})")
+    print("=" * 50)
+
+    if df is None or len(df) == 0:
+        print(" Нет данных для загрузки")
+        return False
+
+    validate_database_connection(credentials)
+
+    if workers > pool_max_size():
+        # Иначе лишние потоки получили бы PoolError от исчерпанного пула
+        print(f" Внимание: в пуле {pool_max_size()} соединений, партиции пишутся в {pool_max_size()} потоков вместо {workers}")
+        workers = pool_max_size()
+
+    from .transform import prepare_for_database
+    staging_table = f"{table_name}_staging"
+    data_to_insert = df if max_rows is None else df.head(max_rows)
+
+    conn = None
+    try:
+        conn = acquire_connection(credentials)
+        with conn.cursor() as cursor:
+            # ENUM-типы общие для основной и промежуточной таблицы
+            ensure_enum_types(cursor, data_to_insert, table_name)
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            # Колонки - по данным (схема могла измениться), индексы и права - от прежней таблицы после загрузки
+            create_sql = prepare_for_database(data_to_insert, table_name).replace(
+                f"CREATE TABLE IF NOT EXISTS {table_name}", f"CREATE UNLOGGED TABLE {staging_table}", 1
+            )
+            cursor.execute(create_sql)
+            if has_column(cursor, table_name, ROW_HASH_COLUMN):
+                # Хэши строк для следующей инкрементальной загрузки, как при обычной перезаливке
+                cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN {ROW_HASH_COLUMN} BIGINT")
+                data_to_insert = data_to_insert.assign(**{ROW_HASH_COLUMN: compute_row_hashes(data_to_insert)})
+        conn.commit()
+        release_connection(credentials, conn)
+        conn = None
+        print(f" Промежуточная таблица {staging_table} (UNLOGGED) создана")
+
+        partitions = partition_by_id(data_to_insert, workers * LOAD_PARTITIONS_PER_WORKER)
+
+        print(f" Загружаем {len(data_to_insert)} строк: {len(partitions)} партиций по id_, способ: {method}...")
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                # Копия контекста: вывод потоков попадает в лог приемника БД (см. sinks._sink_output)
+                executor.submit(contextvars.copy_context().run, _load_partition, credentials, partition, staging_table, method, retries)
+                for partition in partitions
+            ]
+            inserted_count = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - start_time
+        rate = inserted_count / elapsed if elapsed > 0 else float("inf")
+        print(f" Партиции записаны ({inserted_count} строк за {elapsed:.2f} с, {rate:,.0f} строк/с)")
+
+        conn = acquire_connection(credentials)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {staging_table}")
+            count_in_staging = cursor.fetchone()[0]
+            if count_in_staging != len(data_to_insert):
+                raise ValueError(f"В {staging_table} {count_in_staging} строк, ожидалось {len(data_to_insert)}")
+
+            # Подмена одной транзакцией: SET LOGGED пишет таблицу в WAL, чтобы она пережила сбой сервера.
+            # Индексы строятся после загрузки (быстрее, чем поддерживать их при COPY) под временными именами:
+            # имена индексов уникальны в схеме, а прежние еще заняты
+            start_time = time.perf_counter()
+            cursor.execute(f"ALTER TABLE {staging_table} SET LOGGED")
+            indexes = []
+            if table_exists(cursor, table_name):
+                indexes = copy_indexes(cursor, table_indexes(cursor, table_name), staging_table, "_staging")
+                copy_grants(cursor, table_grants(cursor, table_name), staging_table)
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+            cursor.execute(f"ALTER TABLE {staging_table} RENAME TO {table_name}")
+            for temporary, name, is_constraint in indexes:
+                if is_constraint:
+                    cursor.execute(f"ALTER TABLE {table_name} RENAME CONSTRAINT {temporary} TO {name}")
+                else:
+                    cursor.execute(f"ALTER INDEX {temporary} RENAME TO {name}")
+        conn.commit()
+        print(f" Таблица {table_name} заменена за {time.perf_counter() - start_time:.2f} с, в ней {count_in_staging} строк"
+              f"{', индексов перенесено: ' + str(len(indexes)) if indexes else ''}")
+        return True
+
+    except (psycopg2.Error, ValueError) as e:
+        print(f" Ошибка параллельной загрузки: {e}")
+        try:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            else:
+                conn = acquire_connection(credentials)
+            # Основная таблица не тронута, промежуточная больше не нужна
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            conn.commit()
+        except psycopg2.Error as cleanup_error:
+            print(f" Промежуточная таблица {staging_table} не удалена: {cleanup_error}")
+        return False
+    finally:
+        if conn is not None:
+            release_connection(credentials, conn)
+            print(" Соединение с PostgreSQL возвращено в пул")
+
+
+def _normalized_values(series: pd.Series) -> np.ndarray:
+
+    # Значение как текст Arrow: 1 и 1.0, category и строки, numpy- и Arrow-типы дают одно и то же
+    try:
+        array = pa.array(series, from_pandas=True)
+        if pa.types.is_dictionary(array.type):
+            array = array.dictionary_decode()
+        return pc.cast(array, pa.string()).to_numpy(zero_copy_only=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return np.where(series.isna().to_numpy(), None, series.astype(str).to_numpy(dtype=object))
+
+
+def compute_row_hashes(df: pd.DataFrame) -> np.ndarray:
+
+    # 64-битный хэш содержимого каждой строки; храним как BIGINT (int64).
+    # Хэшируются нормализованные значения, а не типы колонок: переключение --arrow
+    # или словарного кодирования не должно переписывать всю таблицу
+    literals = with_array_literals(df)
+    normalized = pd.DataFrame({col: _normalized_values(literals[col]) for col in literals.columns})
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy().view(np.int64)
+
+
+def diff_row_hashes(new_hashes: pd.Series, old_hashes: pd.Series) -> Dict[str, np.ndarray]:
+
+    # Обе серии индексированы по id_; строка без хэша (загружена до инкрементальной) считается измененной
+    common_ids = new_hashes.index.intersection(old_hashes.index)
+    changed = (new_hashes.loc[common_ids] != old_hashes.loc[common_ids]).fillna(True)
+
+    return {
+        'insert': new_hashes.index.difference(old_hashes.index).to_numpy(),
+        'update': common_ids[changed.to_numpy()].to_numpy(),
+        'delete': old_hashes.index.difference(new_hashes.index).to_numpy(),
+        'unchanged': common_ids[~changed.to_numpy()].to_numpy(),
+    }
+
+
+def upsert_to_database(df: pd.DataFrame, credentials: Dict[str, str], table_name: str, max_rows: Optional[int] = None, method: str = "copy") -> bool:
+
+    print("\n" + "=" * 50)
+    print(f"LOAD: Инкрементальная загрузка в базу данных (таблица: {table_name})")
+    print("=" * 50)
+    
+    if df is None or len(df) == 0:
+        print(" Нет данных для загрузки")
+        return False
+    
+    if 'id_' not in df.columns:
+        print(" Для инкрементальной загрузки нужна колонка id_")
+        return False
+    
+    # Валидация подключения к БД
+    validate_database_connection(credentials)
+    
+    start_time = time.perf_counter()
+    
+    # Ключ id_ должен быть уникальным, иначе ON CONFLICT не сможет выбрать строку
+    data = df if max_rows is None else df.head(max_rows)
+    data = data.drop_duplicates(subset=[col for col in data.columns if col not in array_columns(data)])
+    duplicated = data['id_'].duplicated(keep='last')
+    if duplicated.any():
+        print(f" Внимание: {duplicated.sum()} строк с повторяющимся id_, оставляем последние")
+        data = data[~duplicated]
+    
+    data = data.assign(**{ROW_HASH_COLUMN: compute_row_hashes(data)})
+    new_hashes = pd.Series(data[ROW_HASH_COLUMN].to_numpy(), index=data['id_'].to_numpy())
+    
+    conn = None
+    try:
+        conn = acquire_connection(credentials)
+        cursor = conn.cursor()
+        print(" Соединение с PostgreSQL получено из пула")
+        
+        # Таблица, колонка с хэшем и уникальный индекс по id_
+        from .transform import prepare_for_database
+        ensure_enum_types(cursor, data, table_name)
+        # (int64 в prepare_for_database отображается в INTEGER, поэтому row_hash добавляем отдельно как BIGINT)
+        cursor.execute(prepare_for_database(data.iloc[:0].drop(columns=[ROW_HASH_COLUMN]), table_name))
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {ROW_HASH_COLUMN} BIGINT")
+        
+        cursor.execute("SELECT to_regclass(%s)", (f"{table_name}_id__key",))
+        if cursor.fetchone()[0] is None:
+            # Индекса нет после перезаливки с повторами id_: оставляем по одной строке на id_
+            # (она перезапишется новыми данными или удалится вместе с id_)
+            cursor.execute(f"DELETE FROM {table_name} a USING {table_name} b WHERE a.id_ = b.id_ AND a.ctid < b.ctid")
+            if cursor.rowcount > 0:
+                print(f" Удалено {cursor.rowcount} повторов id_ перед созданием уникального индекса")
+            cursor.execute(f"CREATE UNIQUE INDEX {table_name}_id__key ON {table_name} (id_)")
+        
+        # Сравниваем хэши с тем, что уже лежит в таблице. Строки без хэша (до первой
+        # инкрементальной загрузки) не удаляются заранее, а обновляются на месте как измененные
+        cursor.execute(f"SELECT id_, {ROW_HASH_COLUMN} FROM {table_name}")
+        existing = cursor.fetchall()
+        old_hashes = pd.Series(
+            [row_hash for _, row_hash in existing],
+            index=[row_id for row_id, _ in existing],
+            dtype='Int64',
+        )
+        if old_hashes.isna().any():
+            print(f" Строк без хэша: {old_hashes.isna().sum()} (загружены до инкрементальной загрузки)")
+        diff = diff_row_hashes(new_hashes, old_hashes)
+        print(f" Новых строк: {len(diff['insert'])}, измененных: {len(diff['update'])}, "
+              f"удаленных: {len(diff['delete'])}, без изменений: {len(diff['unchanged'])}")
+        
+        # Удаления
+        if len(diff['delete']) > 0:
+            cursor.execute(f"DELETE FROM {table_name} WHERE id_ = ANY(%s)", (diff['delete'].tolist(),))
+        
+        # Вставки и обновления: пишем изменившиеся строки во временную таблицу
+        # и переносим их одним INSERT ... ON CONFLICT (id_) DO UPDATE
+        changed_ids = np.concatenate([diff['insert'], diff['update']])
+        changed_rows = data[data['id_'].isin(changed_ids)]
+        write_seconds = 0.0
+        if len(changed_rows) > 0:
+            staging_table = f"{table_name}_changes"
+            cursor.execute(f"CREATE TEMP TABLE {staging_table} (LIKE {table_name}) ON COMMIT DROP")
+            
+            write_start = time.perf_counter()
+            write_dataframe(cursor, changed_rows, staging_table, method)
+            write_seconds = time.perf_counter() - write_start
+            
+            columns = format_column_list(data.columns)
+            updates = ', '.join(f"{quote_column(col)} = EXCLUDED.{quote_column(col)}" for col in data.columns if col != 'id_')
+            cursor.execute(
+                f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table} "
+                f"ON CONFLICT (id_) DO UPDATE SET {updates}"
+            )
+        
+        conn.commit()
+        elapsed = time.perf_counter() - start_time
+        print(f" Изменения применены за {elapsed:.2f} с ({len(changed_rows)} строк записано, {len(diff['delete'])} удалено)")
+        
+        # Оценка полной перезаливки по скорости записи измененных строк
+        if len(changed_rows) > 0 and write_seconds > 0:
+            full_reload_seconds = len(data) * write_seconds / len(changed_rows)
+            print(f" Оценка полной перезаливки {len(data)} строк: {full_reload_seconds:.2f} с, "
+                  f"сэкономлено примерно {max(full_reload_seconds - elapsed, 0):.2f} с")
+        else:
+            print(f" Таблица не изменилась, перезаливка {len(data)} строк не понадобилась")
+        
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        print(f" В таблице теперь {cursor.fetchone()[0]} строк")
+        
+        return True
+        
+    except psycopg2.Error as e:
+        print(f" Ошибка PostgreSQL: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    except Exception as e:
+        print(f" Общая ошибка: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            cursor.close()
+            release_connection(credentials, conn)
+            print(" Соединение с PostgreSQL возвращено в пул")
 
 
-def save_parquet(df: pd.DataFrame) -> str:
+def save_parquet(df: pd.DataFrame, options: Optional[Dict] = None) -> str:
 
     print("\n" + "=" * 30)
     print("СОХРАНЕНИЕ PARQUET")
     print("=" * 30)
     
+    options = options or parquet_options()
+    
     # Создаем директорию data/processed если нет
     os.makedirs('data/processed', exist_ok=True)
     
-    # Сохраняем в Parquet
+    # Сериализуем данные один раз
     output_path = 'data/processed/processed_data.parquet'
-    df.to_parquet(output_path, index=False)
-    print(f" Данные сохранены в {output_path}")
-    print(f" Размер файла: {os.path.getsize(output_path)} байт")
+    remove_output(output_path)
+    write_parquet_dataset(df, output_path, options)
+    level_info = f", уровень {options['compression_level']}" if options['compression_level'] is not None else ""
+    print(f" Данные сохранены в {output_path} (сжатие {options['compression']}{level_info})")
     
-    # Также сохраняем в корень для обратной совместимости
+    # Путь в корне для обратной совместимости - ссылка на тот же файл,
+    # для партиционированного датасета (это директория) - запись в манифесте
     root_path = 'new_data.parquet'
-    df.to_parquet(root_path, index=False)
-    print(f" Данные также сохранены в {root_path}")
+    aliases = {}
+    if options['partition_cols']:
+        print(f" Партиционирование по: {options['partition_cols']}")
+        remove_output(root_path)
+        print(f" Вместо {root_path} используйте датасет {output_path} (см. манифест)")
+    else:
+        print(f" Размер файла: {os.path.getsize(output_path)} байт")
+        aliases[root_path] = link_or_copy(output_path, root_path)
+        print(f" {root_path} -> {output_path} ({aliases[root_path]})")
     
+    manifest_path = write_manifest(output_path, options, len(df), aliases)
+    print(f" Манифест: {manifest_path}")
+    
+    return output_path
+
+
+def save_snapshot(df: pd.DataFrame, compression: str = SNAPSHOT_COMPRESSION) -> str:
+
+    # Снимок для загрузчиков и ноутбуков: читается через mmap с исходными типами
+    output_path = write_snapshot(df, PROCESSED_SNAPSHOT_PATH, compression)
+    print(f" Снимок Arrow IPC сохранен в {output_path} ({os.path.getsize(output_path)} байт, сжатие {compression})")
     return output_path
 
 
 def save_final_csv(df: pd.DataFrame) -> str:
 
     output_path = 'new_data.csv'
-    df.to_csv(output_path, index=False)
+    with_array_literals(df).to_csv(output_path, index=False)
     print(f" Финальные данные сохранены в {output_path}")
     return output_path
\ No newline at end of file
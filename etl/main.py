@@ -5,12 +5,122 @@ import argparse
 import sys
 import os
 
-# Добавляем путь для импорта модулей etl
-sys.path.append(os.path.dirname(__file__))
+# Запуск скриптом (python etl/main.py): корень репозитория в sys.path, и модули
+# импортируются как пакет etl - так же, как при python -m etl.main
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = 'etl'
 
-from extract import extract_data, get_database_credentials
-from transform import transform_data
-from load import load_to_database, save_parquet, save_final_csv
+from .extract import extract_data, extract_data_from_google_sheets, clean_raw_data, save_raw_data, sheet_sources, get_database_credentials, EXTRACT_SOURCES
+from .validate import validate_raw_data, validate_transformed_data
+from .checkpoint import CheckpointStore, code_version, stage_key, sources_digest, frame_digest, run_stages
+from .checkpoint import CHECKPOINT_STAGES, CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_SECONDS, CHECKPOINT_MAX_BYTES
+from .metrics import print_memory_usage, RunReport
+from .categories import encode_low_cardinality, CATEGORY_MAX_RATIO
+from .features import add_sequence_features, KMER_SIZE
+from .kmer_index import refresh_index, KMER_INDEX_COLUMNS, KMER_INDEX_PATH
+from .parquet_writer import parquet_options, PARQUET_CODECS, PARQUET_COMPRESSION
+from .sheets_api import read_sheets
+from .join import join_frames, join_options, JOIN_ALGORITHMS, JOIN_FANOUT_POLICIES, JOIN_MEMORY_BUDGET_BYTES
+from .fetch import fetch_source, FETCH_RETRIES, FETCH_TIMEOUT_SECONDS
+from .transform import transform_data
+from .parallel import transform_frame
+from .load import load_to_database, parallel_load_to_database, upsert_to_database, save_parquet, save_snapshot, save_final_csv, save_modification_code_table, LOAD_METHODS, LOAD_RETRIES
+from .modifications import add_modification_arrays, load_modification_codes, save_modification_codes
+from .parsers import parse_concentration
+from .stream import run_streaming_pipeline
+from .sinks import run_sinks, sink, SINK_WORKERS
+from .snapshot import read_snapshot, RAW_SNAPSHOT_PATH, PROCESSED_SNAPSHOT_PATH, SNAPSHOT_CODECS, SNAPSHOT_COMPRESSION
+from .http_cache import SheetCache, CACHE_DIR, CACHE_TTL_SECONDS, CACHE_MAX_BYTES
+from .db_pool import configure_pool, close_all_pools, pool_stats, POOL_MIN_SIZE, POOL_MAX_SIZE, STATEMENT_TIMEOUT_MS
+
+
+def print_cache_stats(cache):
+
+    if cache is None:
+        return
+    stats = cache.stats()
+    print(
+        f"✓ HTTP кэш: попаданий {stats['hits']}, ревалидировано {stats['revalidated']}, "
+        f"промахов {stats['misses']}, устаревших копий {stats['stale']}"
+    )
+
+
+def print_pool_stats():
+
+    stats = pool_stats()
+    if stats['checkouts'] == 0:
+        return
+    print(
+        f"✓ Пул соединений PostgreSQL: открыто соединений {stats['connections']}, "
+        f"выдано из пула {stats['checkouts']}, отброшено неисправных {stats['discarded']}"
+    )
+
+
+def run_checkpointed_stages(args, store, cache, dtype_backend, modification_codes, join_settings, report):
+    """Extract -> очистка -> transform с сохранением результата каждого этапа в контрольной точке"""
+
+    sources = sheet_sources(args.fetch_timeout, dtype_backend)
+    raw_version = code_version(extract_data_from_google_sheets, fetch_source, join_frames, read_sheets)
+
+    def extract_stage(_):
+        raw_df = extract_data_from_google_sheets(cache, args.fetch_timeout, args.fetch_retries, dtype_backend, join_settings, args.source)
+        print_memory_usage("extract (после объединения)", raw_df)
+        return raw_df
+
+    def clean_stage(raw_df):
+        cleaned_df = clean_raw_data(raw_df, dtype_backend)
+        print_memory_usage("extract (после очистки)", cleaned_df)
+        validate_raw_data(cleaned_df)
+        save_raw_data(cleaned_df, args.raw_csv, args.snapshot_compression)
+        return cleaned_df
+
+    def transform_stage(cleaned_df):
+        encoded_df = encode_low_cardinality(cleaned_df, args.category_ratio)
+        print_memory_usage("после словарного кодирования", encoded_df)
+        transformed_df = transform_frame(encoded_df, args.workers)
+        if modification_codes is not None:
+            transformed_df = add_modification_arrays(transformed_df, modification_codes)
+            save_modification_codes(modification_codes)
+        print_memory_usage("transform", transformed_df)
+        return transformed_df
+
+    # С HTTP кэшем отпечаток источников считается по телам ответов, и этап raw
+    # тоже можно пропустить. Без кэша (и для Sheets API) выгрузки все равно скачиваются,
+    # поэтому raw выполняется всегда, а следующие этапы ключуются по содержимому данных
+    stages = []
+    raw_df = None
+    force_stage = args.force_stage
+    if cache is not None and args.source == "csv":
+        raw_key = stage_key("raw", sources_digest(sources, cache), dtype_backend, raw_version, join_settings['fanout'])
+        stages.append(("raw", raw_key, extract_stage))
+    else:
+        with report.stage("raw") as record:
+            raw_df = extract_stage(None)
+            record['rows_out'] = len(raw_df)
+        raw_key = stage_key("raw", frame_digest(raw_df), dtype_backend, raw_version, join_settings['fanout'])
+        if force_stage == "raw":
+            # raw уже пересчитан, вне цепочки --force-stage raw означает пересчет всех следующих этапов:
+            # ключи по содержимому не изменились бы, и очистка с transform взялись бы из старых точек
+            force_stage = "cleaned"
+
+    cleaned_key = stage_key("cleaned", raw_key, dtype_backend, code_version(clean_raw_data, validate_raw_data))
+    transformed_key = stage_key(
+        "transformed",
+        cleaned_key,
+        args.category_ratio,
+        modification_codes,
+        # Модули этапа: transform (и его валидация), параллельный запуск, кодирование, модификации
+        code_version(encode_low_cardinality, transform_data, transform_frame, validate_transformed_data,
+                     parse_concentration, add_modification_arrays),
+    )
+    stages.append(("cleaned", cleaned_key, clean_stage))
+    stages.append(("transformed", transformed_key, transform_stage))
+
+    transformed_df, reused = run_stages(store, stages, args.resume, force_stage, raw_df, report)
+    if reused:
+        print(f"✓ Взято из контрольных точек: {', '.join(reused)}")
+    return transformed_df
 
 
 def main():
@@ -24,8 +134,27 @@ def main():
   python etl/main.py                          # Запуск с настройками по умолчанию
   python etl/main.py --table-name ivanova     # Указание имени таблицы
   python etl/main.py --max-rows 50            # Ограничение количества строк
+  python etl/main.py --load-method batch      # Загрузка через execute_values вместо COPY
+  python etl/main.py --incremental            # Применить в БД только изменившиеся строки
+  python etl/main.py --load-workers 4         # Полная загрузка в 4 соединения через UNLOGGED таблицу и подмену
   python etl/main.py --skip-db                # Без загрузки в БД
   python etl/main.py --skip-csv               # Без сохранения CSV
+  python etl/main.py --raw-csv                # Дополнительно экспортировать сырые данные в CSV
+  python etl/main.py --snapshot-compression lz4   # Сжатые снимки Arrow IPC (меньше файл, но распаковка при чтении)
+  python etl/main.py --chunk-size 50000       # Потоковый режим кусками по 50000 строк
+  python etl/main.py --no-cache               # Всегда скачивать таблицы заново
+  python etl/main.py --arrow                  # Чтение движком pyarrow и Arrow-типы (string[pyarrow])
+  python etl/main.py --category-ratio 0       # Без словарного кодирования колонок
+  python etl/main.py --pool-max-size 8 --statement-timeout 120   # Пул соединений и таймаут запросов
+  python etl/main.py --metrics-out run_report.json   # Время, CPU и память по этапам в JSON
+  python etl/main.py --sequence-features      # Признаки последовательностей siRNA в Parquet
+  python etl/main.py --kmer-index             # Обновить индекс k-меров для поиска похожих siRNA
+  python etl/main.py --parse-modifications    # Позиции и коды модификаций как массивы (Parquet и БД)
+  python etl/main.py --resume                 # Пропустить неизменившиеся этапы (контрольные точки)
+  python etl/main.py --resume --force-stage transformed   # Пересчитать transform, extract взять из точки
+  python etl/main.py --partition-by "Target gene" --parquet-compression zstd --compression-level 9
+  python etl/main.py --source api             # Листы через Google Sheets API (ключ в GOOGLE_API_KEY)
+  python etl/main.py --source http            # CSV-экспорт потоком: разбор по мере загрузки, gzip
         """
     )
     
@@ -37,8 +166,37 @@ def main():
     parser.add_argument(
         '--max-rows',
         type=int,
-        default=100,
-        help='Максимальное количество строк для загрузки в БД (по умолчанию: 100)'
+        default=None,
+        help='Максимальное количество строк для загрузки в БД (по умолчанию: все строки)'
+    )
+    parser.add_argument(
+        '--load-method',
+        choices=LOAD_METHODS,
+        default='copy',
+        help='Способ загрузки в БД: copy (COPY FROM STDIN), batch (execute_values), rows (построчно). По умолчанию: copy'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Инкрементальная загрузка: INSERT ... ON CONFLICT (id_) только для изменившихся строк вместо TRUNCATE'
+    )
+    parser.add_argument(
+        '--load-workers',
+        type=int,
+        default=1,
+        help='Параллельная полная загрузка: столько соединений пишут партиции по id_ в UNLOGGED таблицу, затем подмена; не больше --pool-max-size (по умолчанию: 1)'
+    )
+    parser.add_argument(
+        '--sink-workers',
+        type=int,
+        default=SINK_WORKERS,
+        help=f'Потоков для параллельной записи в БД, Parquet, Arrow IPC и CSV; 1 - по очереди (по умолчанию: {SINK_WORKERS})'
+    )
+    parser.add_argument(
+        '--load-retries',
+        type=int,
+        default=LOAD_RETRIES,
+        help=f'Попыток загрузки одной партиции при параллельной загрузке (по умолчанию: {LOAD_RETRIES})'
     )
     parser.add_argument(
         '--skip-db',
@@ -50,65 +208,450 @@ def main():
         action='store_true', 
         help='Пропустить сохранение CSV файла'
     )
+    parser.add_argument(
+        '--raw-csv',
+        action='store_true',
+        help=f'Кроме снимка Arrow IPC ({RAW_SNAPSHOT_PATH}) экспортировать сырые данные в CSV'
+    )
+    parser.add_argument(
+        '--snapshot-compression',
+        choices=SNAPSHOT_CODECS,
+        default=SNAPSHOT_COMPRESSION,
+        help=f'Сжатие снимков Arrow IPC; без сжатия они читаются через mmap без копирования (по умолчанию: {SNAPSHOT_COMPRESSION})'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=None,
+        help='Потоковый режим: обрабатывать первый датасет кусками по N строк'
+    )
+    parser.add_argument(
+        '--arrow',
+        action='store_true',
+        help='Читать выгрузки движком pyarrow и хранить строки как string[pyarrow] на всех этапах'
+    )
+    parser.add_argument(
+        '--category-ratio',
+        type=float,
+        default=CATEGORY_MAX_RATIO,
+        help=f'Колонки с долей уникальных значений не выше порога хранятся как category/ENUM; 0 - отключить (по умолчанию: {CATEGORY_MAX_RATIO})'
+    )
+    parser.add_argument(
+        '--partition-by',
+        nargs='+',
+        default=None,
+        help='Колонки для партиционирования Parquet датасета (например: "Target gene")'
+    )
+    parser.add_argument(
+        '--parquet-compression',
+        choices=PARQUET_CODECS,
+        default=PARQUET_COMPRESSION,
+        help=f'Кодек сжатия Parquet (по умолчанию: {PARQUET_COMPRESSION})'
+    )
+    parser.add_argument(
+        '--compression-level',
+        type=int,
+        default=None,
+        help='Уровень сжатия для кодеков, которые его поддерживают (zstd, gzip, brotli)'
+    )
+    parser.add_argument(
+        '--row-group-size',
+        type=int,
+        default=None,
+        help='Максимальное количество строк в row group Parquet'
+    )
+    parser.add_argument(
+        '--no-parquet-statistics',
+        action='store_true',
+        help='Не записывать статистики колонок (min/max) в Parquet'
+    )
+    parser.add_argument(
+        '--source',
+        choices=EXTRACT_SOURCES,
+        default='csv',
+        help='Источник листов: csv (экспорт по ссылке), http (тот же экспорт потоком через пул соединений, без HTTP кэша) '
+             'или api (Google Sheets API, ключ в GOOGLE_API_KEY). По умолчанию: csv'
+    )
+    parser.add_argument(
+        '--join-algorithm',
+        choices=JOIN_ALGORITHMS,
+        default='auto',
+        help='Соединение листов по SMDB_id: hash, sorted (sort-merge), spill (по партициям на диске) или auto по профилю ключей'
+    )
+    parser.add_argument(
+        '--join-fanout',
+        choices=JOIN_FANOUT_POLICIES,
+        default='warn',
+        help='SMDB_id повторяется в обоих листах (many-to-many): предупредить или остановить запуск (по умолчанию: warn)'
+    )
+    parser.add_argument(
+        '--join-memory-mb',
+        type=float,
+        default=JOIN_MEMORY_BUDGET_BYTES / 1024 / 1024,
+        help='Бюджет памяти соединения в МБ, при превышении соединение идет по партициям на диске (по умолчанию: 1024)'
+    )
+    parser.add_argument(
+        '--fetch-timeout',
+        type=float,
+        default=FETCH_TIMEOUT_SECONDS,
+        help=f'Таймаут одного HTTP-запроса в секундах: на соединение и на ожидание следующих данных, '
+             f'а не на всю загрузку; с повторами источник может грузиться дольше (по умолчанию: {FETCH_TIMEOUT_SECONDS})'
+    )
+    parser.add_argument(
+        '--fetch-retries',
+        type=int,
+        default=FETCH_RETRIES,
+        help=f'Количество попыток загрузки источника, не меньше 1 (по умолчанию: {FETCH_RETRIES})'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=CACHE_DIR,
+        help=f'Директория HTTP кэша выгрузок Google Sheets (по умолчанию: {CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Не использовать HTTP кэш выгрузок'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=CACHE_TTL_SECONDS,
+        help=f'Сколько секунд кэш считается свежим без ревалидации (по умолчанию: {CACHE_TTL_SECONDS})'
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        default=CACHE_MAX_BYTES / 1024 / 1024,
+        help='Максимальный размер кэша в МБ, старые записи вытесняются (по умолчанию: 200)'
+    )
+    parser.add_argument(
+        '--pool-min-size',
+        type=int,
+        default=POOL_MIN_SIZE,
+        help=f'Сколько соединений с БД открывать заранее (по умолчанию: {POOL_MIN_SIZE})'
+    )
+    parser.add_argument(
+        '--pool-max-size',
+        type=int,
+        default=POOL_MAX_SIZE,
+        help=f'Максимальное число соединений с БД в пуле (по умолчанию: {POOL_MAX_SIZE})'
+    )
+    parser.add_argument(
+        '--statement-timeout',
+        type=float,
+        default=STATEMENT_TIMEOUT_MS / 1000,
+        help=f'Таймаут одного SQL-запроса в секундах, 0 - без ограничения (по умолчанию: {STATEMENT_TIMEOUT_MS // 1000})'
+    )
+    parser.add_argument(
+        '--sequence-features',
+        action='store_true',
+        help='Добавить в Parquet признаки последовательностей siRNA (длина, GC, состав, концы, k-меры, нуклеотиды по позициям)'
+    )
+    parser.add_argument(
+        '--kmer-size',
+        type=int,
+        default=KMER_SIZE,
+        help=f'Длина k-меров для признаков последовательностей (по умолчанию: {KMER_SIZE})'
+    )
+    parser.add_argument(
+        '--parse-modifications',
+        action='store_true',
+        help='Разобрать Modification/Position в массивы позиций и кодов модификаций (Parquet, БД, CSV)'
+    )
+    parser.add_argument(
+        '--kmer-index',
+        action='store_true',
+        help=f'Построить или дополнить индекс k-меров последовательностей ({KMER_INDEX_PATH})'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Число процессов для transform в пакетном режиме: данные делятся на партиции и передаются через общую память (по умолчанию: 1)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Брать результаты этапов raw/cleaned/transformed из контрольных точек, если их входы и код не менялись'
+    )
+    parser.add_argument(
+        '--force-stage',
+        choices=CHECKPOINT_STAGES,
+        default=None,
+        help='Пересчитать этот этап и все следующие, даже если есть контрольная точка'
+    )
+    parser.add_argument(
+        '--no-checkpoints',
+        action='store_true',
+        help='Не сохранять контрольные точки этапов'
+    )
+    parser.add_argument(
+        '--checkpoint-dir',
+        default=CHECKPOINT_DIR,
+        help=f'Директория контрольных точек (по умолчанию: {CHECKPOINT_DIR})'
+    )
+    parser.add_argument(
+        '--checkpoint-max-age',
+        type=float,
+        default=CHECKPOINT_MAX_AGE_SECONDS / 3600,
+        help=f'Контрольные точки старше стольких часов удаляются (по умолчанию: {CHECKPOINT_MAX_AGE_SECONDS // 3600})'
+    )
+    parser.add_argument(
+        '--checkpoint-max-mb',
+        type=float,
+        default=CHECKPOINT_MAX_BYTES / 1024 / 1024,
+        help='Максимальный размер контрольных точек в МБ, давно не используемые вытесняются (по умолчанию: 1024)'
+    )
+    parser.add_argument(
+        '--metrics-out',
+        default=None,
+        help='Путь для JSON-отчета с метриками этапов (включает и замер tracemalloc)'
+    )
     
     args = parser.parse_args()
+    if args.fetch_retries < 1:
+        parser.error("--fetch-retries: нужна хотя бы одна попытка")
+    if args.load_retries < 1:
+        parser.error("--load-retries: нужна хотя бы одна попытка")
     
     print("ЗАПУСК ETL ПАЙПЛАЙНА ИЗ GOOGLE SHEETS")
     print("=" * 60)
-    print(f"Источник: Google Sheets")
+    print(f"Источник: Google Sheets ({args.source})")
     print(f"Таблица БД: {args.table_name}")
-    print(f"Максимум строк в БД: {args.max_rows}")
+    print(f"Максимум строк в БД: {args.max_rows if args.max_rows is not None else 'все'}")
+    print(f"Способ загрузки в БД: {args.load_method}{' (инкрементально)' if args.incremental else ''}"
+          f"{', соединений ' + str(args.load_workers) if args.load_workers > 1 else ''}")
     print(f"Пропуск БД: {args.skip_db}")
     print(f"Пропуск CSV: {args.skip_csv}")
+    print(f"Потоковый режим: {'куски по ' + str(args.chunk_size) + ' строк' if args.chunk_size else 'нет'}")
+    print(f"HTTP кэш: {'выключен' if args.no_cache else args.cache_dir}")
+    print(f"Контрольные точки: {'выключены' if args.no_checkpoints else args.checkpoint_dir}{' (resume)' if args.resume else ''}")
+    print(f"Типы данных: {'Arrow (pyarrow)' if args.arrow else 'pandas nullable'}")
+    print(f"Процессов transform: {args.workers}")
+    print(f"Потоков записи (БД, Parquet, Arrow IPC, CSV): {args.sink_workers}")
     print("=" * 60)
     
+    cache = None
+    if not args.no_cache:
+        cache = SheetCache(args.cache_dir, args.cache_ttl, int(args.cache_max_mb * 1024 * 1024))
+    
+    dtype_backend = 'pyarrow' if args.arrow else 'numpy_nullable'
+    # Размер пула задает только --pool-max-size: если он меньше --load-workers,
+    # parallel_load_to_database пишет партиции в pool_max_size потоков
+    configure_pool(args.pool_min_size, args.pool_max_size, int(args.statement_timeout * 1000))
+    parquet_settings = parquet_options(
+        args.partition_by,
+        args.parquet_compression,
+        args.compression_level,
+        args.row_group_size,
+        not args.no_parquet_statistics
+    )
+    modification_codes = load_modification_codes() if args.parse_modifications else None
+    join_settings = join_options(args.join_algorithm, args.join_fanout, int(args.join_memory_mb * 1024 * 1024))
+    checkpoints = None
+    if not args.no_checkpoints and not args.chunk_size:
+        checkpoints = CheckpointStore(
+            args.checkpoint_dir,
+            args.checkpoint_max_age * 3600,
+            int(args.checkpoint_max_mb * 1024 * 1024)
+        )
+    report = RunReport(trace_memory=args.metrics_out is not None)
+    status = 'failed'
+    
     try:
-        # Шаг 1: Extract - загрузка из Google Sheets
-        print("\nЭТАП 1: ИЗВЛЕЧЕНИЕ ДАННЫХ")
-        raw_df, raw_path = extract_data()
+        if args.chunk_size:
+            if args.incremental:
+                print("Внимание: в потоковом режиме инкрементальная загрузка не поддерживается, выполняется полная")
+            if args.category_ratio > 0:
+                print("Внимание: в потоковом режиме словарное кодирование колонок не выполняется")
+            if args.resume or args.force_stage:
+                print("Внимание: в потоковом режиме контрольные точки не используются")
+            if args.workers > 1:
+                print("Внимание: в потоковом режиме куски преобразуются в одном процессе")
+            if args.load_workers > 1:
+                print("Внимание: в потоковом режиме куски загружаются в БД через одно соединение")
+            # Потоковый режим: extract -> transform -> load по кускам
+            credentials = None if args.skip_db else get_database_credentials()
+            with report.stage("stream") as record:
+                stats = run_streaming_pipeline(
+                    args.chunk_size,
+                    credentials,
+                    args.table_name,
+                    args.max_rows,
+                    args.load_method,
+                    args.skip_csv,
+                    cache,
+                    dtype_backend,
+                    parquet_settings,
+                    args.kmer_size if args.sequence_features else None,
+                    modification_codes,
+                    args.raw_csv,
+                    args.snapshot_compression,
+                    args.source
+                )
+                record['rows_in'] = stats['raw_rows']
+                record['rows_out'] = stats['rows']
+            
+            if modification_codes is not None:
+                save_modification_codes(modification_codes)
+                if credentials is not None:
+                    save_modification_code_table(credentials, args.table_name, modification_codes)
+            
+            if args.kmer_index and stats['rows'] > 0:
+                with report.stage("kmer_index", stats['rows']):
+                    # Снимок отображается в память, читаются только колонки индекса
+                    processed_df = read_snapshot(PROCESSED_SNAPSHOT_PATH, KMER_INDEX_COLUMNS)
+                    refresh_index(processed_df, KMER_INDEX_PATH)
+            
+            print("\nETL ПАЙПЛАЙН УСПЕШНО ЗАВЕРШЕН (ПОТОКОВЫЙ РЕЖИМ)!")
+            print("=" * 50)
+            print(f"✓ Обработано кусков: {stats['chunks']}")
+            print(f"✓ Сырые данные: {RAW_SNAPSHOT_PATH} ({stats['raw_rows']} строк)")
+            print(f"✓ Обработанные данные (Parquet): data/processed/processed_data.parquet")
+            print(f"✓ Обработанные данные (Arrow IPC): {PROCESSED_SNAPSHOT_PATH}")
+            if not args.skip_csv:
+                print(f"✓ Обработанные данные (CSV): new_data.csv")
+            if not args.skip_db:
+                print(f"✓ Данные в БД: таблица {args.table_name} ({stats['db_rows']} строк)")
+            print(f"✓ Всего обработано строк: {stats['rows']}")
+            print(f"✓ Всего колонок: {stats['columns']}")
+            print_cache_stats(cache)
+            print_pool_stats()
+            status = 'ok'
+            return
         
-        # Шаг 2: Transform - преобразование данных
-        print("\nЭТАП 2: ПРЕОБРАЗОВАНИЕ ДАННЫХ") 
-        transformed_df = transform_data(raw_df)
+        if checkpoints is not None:
+            # Шаги 1-2 с контрольными точками: неизменившиеся этапы не пересчитываются
+            print("\nЭТАПЫ 1-2: ИЗВЛЕЧЕНИЕ И ПРЕОБРАЗОВАНИЕ (С КОНТРОЛЬНЫМИ ТОЧКАМИ)")
+            transformed_df = run_checkpointed_stages(args, checkpoints, cache, dtype_backend, modification_codes, join_settings, report)
+            raw_path = RAW_SNAPSHOT_PATH
+        else:
+            # Шаг 1: Extract - загрузка из Google Sheets
+            print("\nЭТАП 1: ИЗВЛЕЧЕНИЕ ДАННЫХ")
+            with report.stage("extract") as record:
+                raw_df, raw_path = extract_data(cache, args.fetch_timeout, args.fetch_retries, dtype_backend, args.raw_csv, join_settings, args.source)
+                record['rows_out'] = len(raw_df)
+            
+            # Словарное кодирование колонок с малым числом уникальных значений
+            with report.stage("encode", len(raw_df)) as record:
+                raw_df = encode_low_cardinality(raw_df, args.category_ratio)
+                record['rows_out'] = len(raw_df)
+            print_memory_usage("после словарного кодирования", raw_df)
+            
+            # Шаг 2: Transform - преобразование данных
+            print("\nЭТАП 2: ПРЕОБРАЗОВАНИЕ ДАННЫХ") 
+            with report.stage("transform", len(raw_df)) as record:
+                transformed_df = transform_frame(raw_df, args.workers)
+                record['rows_out'] = len(transformed_df)
+            print_memory_usage("transform", transformed_df)
+            
+            # Модификации и позиции -> массивы Arrow (коды стабильны между запусками)
+            if modification_codes is not None:
+                with report.stage("parse_modifications", len(transformed_df)) as record:
+                    transformed_df = add_modification_arrays(transformed_df, modification_codes)
+                    save_modification_codes(modification_codes)
+                    record['rows_out'] = len(transformed_df)
         
         # Шаг 3: Load - загрузка в различные форматы
         print("\nЭТАП 3: ЗАГРУЗКА ДАННЫХ")
         
+        # Признаки последовательностей пишутся только в Parquet (БД и CSV остаются как были)
+        parquet_df = transformed_df
+        if args.sequence_features:
+            with report.stage("sequence_features", len(transformed_df)) as record:
+                parquet_df = add_sequence_features(transformed_df, args.kmer_size)
+                record['rows_out'] = len(parquet_df)
+        
+        # Все приемники читают один и тот же transformed_df и выполняются параллельно
+        loaded_rows = len(transformed_df) if args.max_rows is None else min(args.max_rows, len(transformed_df))
+        sinks = []
+        
         # Загрузка в базу данных (если не пропущена)
-        db_success = True
         if not args.skip_db:
             credentials = get_database_credentials()
-            db_success = load_to_database(
-                transformed_df, 
-                credentials, 
-                args.table_name,
-                args.max_rows
-            )
+            
+            def write_database(df):
+                if args.load_workers > 1 and not args.incremental:
+                    success = parallel_load_to_database(
+                        df,
+                        credentials,
+                        args.table_name,
+                        args.max_rows,
+                        args.load_method,
+                        args.load_workers,
+                        args.load_retries
+                    )
+                else:
+                    load_function = upsert_to_database if args.incremental else load_to_database
+                    success = load_function(
+                        df, 
+                        credentials, 
+                        args.table_name,
+                        args.max_rows,
+                        args.load_method
+                    )
+                if not success:
+                    raise RuntimeError(f"данные не загружены в таблицу {args.table_name}")
+                if modification_codes is not None:
+                    save_modification_code_table(credentials, args.table_name, modification_codes)
+            
+            sinks.append(sink("load_database", write_database, loaded_rows))
         
-        # Сохранение в Parquet
-        parquet_path = save_parquet(transformed_df)
+        # Parquet (с признаками последовательностей) и снимок Arrow IPC тех же данных, что идут в БД и CSV
+        sinks.append(sink("save_parquet", lambda df: save_parquet(df, parquet_settings), df=parquet_df))
+        sinks.append(sink("save_snapshot", lambda df: save_snapshot(df, args.snapshot_compression)))
+        
+        # Индекс k-меров рядом с Parquet (дополняется, а не строится заново)
+        if args.kmer_index:
+            sinks.append(sink("kmer_index", lambda df: refresh_index(df, KMER_INDEX_PATH)))
         
         # Сохранение в CSV (если не пропущено)
-        csv_path = None
         if not args.skip_csv:
-            csv_path = save_final_csv(transformed_df)
+            sinks.append(sink("save_csv", save_final_csv))
+        
+        with report.stage("load", len(transformed_df)) as record:
+            results = {result['name']: result for result in run_sinks(transformed_df, sinks, args.sink_workers)}
+            record['rows_out'] = len(transformed_df)
+        for result in results.values():
+            report.add_stage(result, record['peak_rss_mb'])
+        
+        # Ошибка БД, как и раньше, не прерывает пайплайн; без файлов результата запуск считается неудачным
+        db_success = 'load_database' in results and results['load_database']['status'] == 'ok'
+        failed = [name for name, result in results.items() if result['status'] != 'ok' and name != 'load_database']
+        if failed:
+            raise RuntimeError(f"Не удалось записать: {', '.join(failed)}")
+        parquet_path = results['save_parquet']['value']
+        snapshot_path = results['save_snapshot']['value']
+        csv_path = results['save_csv']['value'] if 'save_csv' in results else None
         
         print("\nETL ПАЙПЛАЙН УСПЕШНО ЗАВЕРШЕН!")
         print("=" * 50)
         print(f"✓ Сырые данные: {raw_path}")
         print(f"✓ Обработанные данные (Parquet): {parquet_path}")
+        print(f"✓ Обработанные данные (Arrow IPC): {snapshot_path}")
         if csv_path:
             print(f"✓ Обработанные данные (CSV): {csv_path}")
-        if not args.skip_db and db_success:
-            print(f"✓ Данные в БД: таблица {args.table_name} ({args.max_rows} строк)")
+        if db_success:
+            print(f"✓ Данные в БД: таблица {args.table_name} ({loaded_rows} строк)")
         print(f"✓ Всего обработано строк: {len(transformed_df)}")
         print(f"✓ Всего колонок: {len(transformed_df.columns)}")
+        print_cache_stats(cache)
+        print_pool_stats()
+        status = 'ok'
         
     except Exception as e:
         print(f"\nОШИБКА В ETL ПАЙПЛАЙНЕ: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        close_all_pools()
+        if checkpoints is not None:
+            checkpoints.evict()
+        report.print_summary()
+        if args.metrics_out:
+            report.write(args.metrics_out, status)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+import psutil
+
+
+# Как часто фоновый поток замеряет RSS процесса во время этапа
+RSS_SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+
+    # deep=True считает и содержимое строк (Python-объекты или Arrow-буферы)
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def print_memory_usage(stage: str, df: pd.DataFrame) -> int:
+
+    memory_bytes = frame_memory_bytes(df)
+    print(f" Память [{stage}]: {memory_bytes / 1024 / 1024:.2f} МБ ({len(df)} строк, {len(df.columns)} колонок)")
+    return memory_bytes
+
+
+def _count_rows(value) -> Optional[int]:
+
+    # Этапы возвращают DataFrame или кортеж (DataFrame, путь)
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    return None
+
+
+class _RssSampler:
+
+    # RSS замеряется в отдельном потоке, чтобы поймать пик внутри этапа,
+    # а не только значения на входе и выходе
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+class RunReport:
+    """Собирает метрики по этапам пайплайна и сохраняет их в JSON"""
+
+    def __init__(self, trace_memory: bool = False):
+        # tracemalloc заметно замедляет код на чистом Python, поэтому включается явно
+        self.trace_memory = trace_memory
+        self.stages: List[Dict] = []
+        self.started_at = datetime.now(timezone.utc)
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """Замеряет этап; rows_out можно записать в выданный словарь.
+
+        Этапы не должны быть вложенными: пик tracemalloc сбрасывается на входе в этап.
+        """
+
+        record = {'name': name, 'rows_in': rows_in, 'rows_out': None, 'status': 'ok'}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+
+        try:
+            with _RssSampler() as sampler:
+                yield record
+        except BaseException:
+            record['status'] = 'failed'
+            raise
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - start_wall, 4)
+            record['cpu_seconds'] = round(time.process_time() - start_cpu, 4)
+            record['peak_rss_mb'] = round(sampler.peak / 1024 / 1024, 2)
+            record['tracemalloc_peak_mb'] = None
+            if self.trace_memory:
+                record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            self.stages.append(record)
+            print(f" Этап [{name}]: {record['wall_seconds']:.2f} с (CPU {record['cpu_seconds']:.2f} с), "
+                  f"пик RSS {record['peak_rss_mb']:.1f} МБ")
+
+    def add_stage(self, record: Dict, peak_rss_mb: float) -> None:
+        """Этап, замеренный вне stage() - например, приемник в потоке пула.
+
+        RSS - общий процесса, поэтому для параллельных этапов передается пик всей фазы.
+        """
+
+        stage = {key: record.get(key) for key in ('name', 'rows_in', 'rows_out', 'status', 'wall_seconds', 'cpu_seconds')}
+        stage.update(peak_rss_mb=peak_rss_mb, tracemalloc_peak_mb=None)
+        if record.get('error'):
+            stage['error'] = record['error']
+        self.stages.append(stage)
+
+    def track(self, name: str):
+        """Декоратор: этап с rows_in/rows_out по DataFrame в аргументах и результате"""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                rows_in = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+                with self.stage(name, rows_in) as record:
+                    result = func(*args, **kwargs)
+                    record['rows_out'] = _count_rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def summary(self, status: str = 'ok') -> Dict:
+
+        return {
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'wall_seconds': round(time.perf_counter() - self._start_wall, 4),
+            'cpu_seconds': round(time.process_time() - self._start_cpu, 4),
+            'peak_rss_mb': round(max([stage['peak_rss_mb'] for stage in self.stages], default=0.0), 2),
+            'stages': self.stages,
+        }
+
+    def print_summary(self) -> None:
+
+        print("\n" + "=" * 50)
+        print("МЕТРИКИ ЭТАПОВ")
+        print("=" * 50)
+        for stage in self.stages:
+            rows = f"{stage['rows_in'] if stage['rows_in'] is not None else '-'} -> " \
+                   f"{stage['rows_out'] if stage['rows_out'] is not None else '-'}"
+            traced = f", tracemalloc {stage['tracemalloc_peak_mb']:.1f} МБ" if stage['tracemalloc_peak_mb'] is not None else ""
+            print(f"  - {stage['name']}: {stage['wall_seconds']:.2f} с, CPU {stage['cpu_seconds']:.2f} с, "
+                  f"RSS {stage['peak_rss_mb']:.1f} МБ{traced}, строк {rows}")
+
+    def write(self, path: str, status: str = 'ok') -> str:
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(status), f, ensure_ascii=False, indent=2)
+        print(f"✓ Отчет о запуске: {path}")
+        return path
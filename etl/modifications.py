@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, List, Tuple
+
+
+# Текстовые колонки: модификации и позиции одной цепи.
+# "Inverted abasic* 2-Methoxy" + "1,21 * 20,21": группы через "*" идут парами,
+# то есть Inverted abasic в позициях 1 и 21, 2-Methoxy в позициях 20 и 21
+MODIFICATION_COLUMNS = {
+    "sense": ("Modification sense", "Position sense"),
+    "antisense": ("Modification antisense", "Position antisense"),
+}
+
+# Коды модификаций стабильны между запусками: словарь только дополняется
+MODIFICATION_CODES_PATH = 'data/processed/modification_codes.json'
+
+POSITION_RANGE_PATTERN = re.compile(r"^(\d+)\s*-\s*(\d+)$")
+
+
+def positions_column(strand: str) -> str:
+    return f"Modification {strand} positions"
+
+
+def codes_column(strand: str) -> str:
+    return f"Modification {strand} codes"
+
+
+def load_modification_codes(path: str = MODIFICATION_CODES_PATH) -> Dict[str, int]:
+
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_modification_codes(codes: Dict[str, int], path: str = MODIFICATION_CODES_PATH) -> str:
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(codes, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def parse_positions(text: str) -> List[int]:
+
+    # "1,21" -> [1, 21]; "1-3" -> [1, 2, 3]; нечисловые токены пропускаются
+    positions = []
+    for token in text.split(","):
+        token = token.strip()
+        if token.isdigit():
+            positions.append(int(token))
+            continue
+        match = POSITION_RANGE_PATTERN.match(token)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            positions.extend(range(min(start, end), max(start, end) + 1))
+    return positions
+
+
+def parse_modification_pair(modification: str, position: str, codes: Dict[str, int]) -> Tuple[List[int], List[int], bool]:
+    """Пары (позиция, код модификации), отсортированные по позиции; флаг - совпало ли число групп"""
+
+    modification_groups = [" ".join(group.split()) for group in modification.split("*")]
+    position_groups = position.split("*")
+
+    pairs = set()
+    for name, group in zip(modification_groups, position_groups):
+        if not name:
+            continue
+        # Новая модификация получает следующий свободный код
+        code = codes.setdefault(name, len(codes))
+        pairs.update((position, code) for position in parse_positions(group))
+
+    pairs = sorted(pairs)
+    return [position for position, _ in pairs], [code for _, code in pairs], len(modification_groups) == len(position_groups)
+
+
+def parse_modification_columns(df: pd.DataFrame, codes: Dict[str, int]) -> pd.DataFrame:
+    """Колонки-списки Arrow: позиции и коды модификаций по каждой цепи (выровнены по элементам)"""
+
+    result = {}
+    for strand, (modification_column, position_column) in MODIFICATION_COLUMNS.items():
+        if modification_column not in df.columns or position_column not in df.columns:
+            continue
+
+        # Разбираем только уникальные пары строк, затем раскладываем по строкам одним take
+        modifications = df[modification_column].astype(object).fillna("").astype(str)
+        positions = df[position_column].astype(object).fillna("").astype(str)
+        row_codes, uniques = pd.MultiIndex.from_arrays([modifications, positions]).factorize()
+
+        lengths = np.zeros(len(uniques), dtype=np.int32)
+        position_values, code_values = [], []
+        mismatched = 0
+        for i, (modification, position) in enumerate(uniques):
+            parsed_positions, parsed_codes, matched = parse_modification_pair(modification, position, codes)
+            lengths[i] = len(parsed_positions)
+            position_values.extend(parsed_positions)
+            code_values.extend(parsed_codes)
+            mismatched += not matched
+
+        offsets = pa.array(np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32))
+        take = pa.array(row_codes)
+        position_lists = pa.ListArray.from_arrays(offsets, pa.array(position_values, pa.int16())).take(take)
+        code_lists = pa.ListArray.from_arrays(offsets, pa.array(code_values, pa.int16())).take(take)
+        result[positions_column(strand)] = pd.arrays.ArrowExtensionArray(position_lists)
+        result[codes_column(strand)] = pd.arrays.ArrowExtensionArray(code_lists)
+
+        print(f"✓ {modification_column} / {position_column}: {len(uniques)} уникальных пар, "
+              f"{len(position_values)} позиций с модификациями")
+        if mismatched:
+            print(f" Внимание: в {mismatched} парах число групп модификаций и позиций не совпадает")
+
+    return pd.DataFrame(result, index=df.index)
+
+
+def add_modification_arrays(df: pd.DataFrame, codes: Dict[str, int]) -> pd.DataFrame:
+
+    print("\n" + "=" * 30)
+    print("РАЗБОР МОДИФИКАЦИЙ И ПОЗИЦИЙ")
+    print("=" * 30)
+
+    parsed = parse_modification_columns(df, codes)
+    print(f"✓ В словаре модификаций: {len(codes)} кодов")
+    return pd.concat([df, parsed], axis=1)
+
+
+def array_columns(df: pd.DataFrame) -> List[str]:
+
+    # Колонки-списки Arrow (для БД - массивы PostgreSQL)
+    return [
+        col for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and pa.types.is_list(dtype.pyarrow_dtype)
+    ]
+
+
+def list_array(series: pd.Series) -> pa.Array:
+
+    # Колонка из снимка или чекпойнта с несколькими батчами дает ChunkedArray:
+    # смещения, маска пропусков и list_parent_indices нужны по всей колонке
+    lists = pa.array(series)
+    if isinstance(lists, pa.ChunkedArray):
+        lists = lists.combine_chunks()
+    return lists
+
+
+def format_array_literals(series: pd.Series) -> pd.Series:
+
+    # [1, 21] -> "{1,21}" (литерал массива PostgreSQL) без поэлементного цикла в Python
+    lists = list_array(series)
+    # Смещения пересчитываются заново: у среза DataFrame они не начинаются с нуля
+    lengths = pc.fill_null(pc.list_value_length(lists), 0).to_numpy()
+    offsets = pa.array(np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32))
+    strings = pa.ListArray.from_arrays(offsets, pc.cast(pc.list_flatten(lists), pa.string()), mask=lists.is_null())
+    joined = pc.binary_join_element_wise("{", pc.binary_join(strings, ","), "}", "")
+    return pd.Series(joined.to_numpy(zero_copy_only=False), index=series.index, dtype=object)
+
+
+def has_modification(df: pd.DataFrame, strand: str, name: str, position: int, codes: Dict[str, int]) -> np.ndarray:
+    """Маска строк, где в цепи strand модификация name стоит в позиции position"""
+
+    if name not in codes:
+        return np.zeros(len(df), dtype=bool)
+
+    # Векторный фильтр по плоским массивам позиций и кодов вместо регулярок по тексту
+    position_lists = list_array(df[positions_column(strand)])
+    code_lists = list_array(df[codes_column(strand)])
+    hit = pc.and_(
+        pc.equal(pc.list_flatten(position_lists), position),
+        pc.equal(pc.list_flatten(code_lists), codes[name]),
+    )
+    rows = pc.filter(pc.list_parent_indices(position_lists), hit).to_numpy()
+    mask = np.zeros(len(df), dtype=bool)
+    mask[rows] = True
+    return mask
+
+
+def with_array_literals(df: pd.DataFrame) -> pd.DataFrame:
+
+    # Для CSV, COPY и хэшей строк: колонки-списки превращаются в текст "{1,21}"
+    columns = array_columns(df)
+    if not columns:
+        return df
+    return df.assign(**{col: format_array_literals(df[col]) for col in columns})
+
+
+def with_array_lists(df: pd.DataFrame) -> pd.DataFrame:
+
+    # Для execute_values и построчных INSERT: питоновские списки (psycopg2 передает их как ARRAY)
+    columns = array_columns(df)
+    if not columns:
+        return df
+    return df.assign(**{col: pd.Series(pa.array(df[col]).to_pylist(), index=df.index, dtype=object) for col in columns})
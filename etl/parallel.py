@@ -0,0 +1,133 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from .parquet_writer import arrow_to_dataframe, dataframe_to_arrow
+from .transform import transform_data
+from .validate import validate_transformed_data
+
+
+# Партиций больше, чем процессов: быстрые процессы забирают оставшиеся куски
+PARTITIONS_PER_WORKER = 2
+
+# spawn не наследует потоки родителя (замер RSS в RunReport), в отличие от fork
+PROCESS_START_METHOD = 'spawn'
+
+# Файлы Arrow IPC в tmpfs - та же общая память, но mmap Arrow сам следит за ссылками на буферы
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+# Служебная колонка с номером строки во входном DataFrame
+POSITION_COLUMN = '__position'
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def write_shared_table(table: pa.Table) -> str:
+    """Пишет таблицу в общую память в формате Arrow IPC; возвращает путь сегмента"""
+
+    fd, path = tempfile.mkstemp(prefix='etl-', suffix='.arrow', dir=SHARED_MEMORY_DIR)
+    os.close(fd)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+
+def read_shared_table(path: str) -> pa.Table:
+
+    # Таблица ссылается на страницы сегмента без копирования; после удаления файла
+    # отображение живет, пока на буферы есть ссылки
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def release_segment(path: str) -> None:
+
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _transform_partition(path: str, start: int, stop: int) -> str:
+    """Процесс пула: срез входа из общей памяти -> transform_data -> результат в новый сегмент"""
+
+    part = arrow_to_dataframe(read_shared_table(path).slice(start, stop - start))
+    # Номера строк как индекс: transform_data сохраняет индекс оставшихся строк
+    part.index = pd.RangeIndex(start, stop)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        transformed = transform_data(part)
+
+    return write_shared_table(dataframe_to_arrow(transformed.reset_index(names=POSITION_COLUMN)))
+
+
+def partition_bounds(rows: int, partitions: int) -> List[Tuple[int, int]]:
+
+    edges = np.linspace(0, rows, max(min(partitions, rows), 1) + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def transform_parallel(df: pd.DataFrame, workers: Optional[int] = None, partitions: Optional[int] = None) -> pd.DataFrame:
+    """transform_data по партициям в пуле процессов; результат совпадает с последовательным запуском.
+
+    Вход передается процессам одним сегментом общей памяти в формате Arrow IPC,
+    каждый процесс читает свой срез без копирования и возвращает результат
+    тоже через общую память, а не пиклингом DataFrame.
+    """
+
+    workers = workers or default_workers()
+    partitions = partitions or workers * PARTITIONS_PER_WORKER
+    bounds = partition_bounds(len(df), partitions)
+
+    print("\n" + "=" * 50)
+    print(f"TRANSFORM: параллельно, процессов {workers}, партиций {len(bounds)}")
+    print("=" * 50)
+
+    start_time = time.perf_counter()
+    path = write_shared_table(dataframe_to_arrow(df))
+    print(f"Вход в общей памяти: {os.path.getsize(path) / 1024 / 1024:.1f} МБ ({time.perf_counter() - start_time:.2f} с)")
+
+    futures = []
+    try:
+        context = multiprocessing.get_context(PROCESS_START_METHOD)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            for start, stop in bounds:
+                futures.append(executor.submit(_transform_partition, path, start, stop))
+        # Выход из пула дожидается всех партиций; результаты собираются в порядке партиций, а не завершения
+        combined = pa.concat_tables([read_shared_table(future.result()) for future in futures])
+    finally:
+        # Сегменты удаляются и у партиций, завершившихся после ошибки в другой партиции
+        result_paths = [
+            future.result() for future in futures if future.done() and not future.cancelled() and future.exception() is None
+        ]
+        for segment in [path, *result_paths]:
+            release_segment(segment)
+
+    transformed = arrow_to_dataframe(combined)
+    del combined
+    positions = transformed.pop(POSITION_COLUMN).to_numpy()
+    transformed.index = df.index[positions]
+
+    # После Arrow у категорий тип значений object вместо string - возвращаем типы входа
+    restore = {col: df[col].dtype for col in transformed.columns if col in df.columns and transformed[col].dtype != df[col].dtype}
+    if restore:
+        transformed = transformed.astype(restore)
+    print(f"✓ Партиции собраны: {len(transformed)} строк за {time.perf_counter() - start_time:.2f} с")
+
+    validate_transformed_data(transformed)
+    return transformed
+
+
+def transform_frame(df: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+
+    # Один процесс - обычный transform_data без затрат на запуск пула и общую память
+    if workers <= 1:
+        return transform_data(df)
+    return transform_parallel(df, workers)
@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, List, Optional
+
+
+# Параметры записи Parquet по умолчанию
+PARQUET_COMPRESSION = 'snappy'
+PARQUET_CODECS = ('snappy', 'zstd', 'gzip', 'brotli', 'lz4', 'none')
+MANIFEST_PATH = 'data/processed/manifest.json'
+
+
+def parquet_options(
+    partition_cols: Optional[List[str]] = None,
+    compression: str = PARQUET_COMPRESSION,
+    compression_level: Optional[int] = None,
+    row_group_size: Optional[int] = None,
+    write_statistics: bool = True,
+) -> Dict:
+
+    return {
+        'partition_cols': partition_cols or [],
+        'compression': compression,
+        'compression_level': compression_level,
+        'row_group_size': row_group_size,
+        'write_statistics': write_statistics,
+    }
+
+
+def _write_kwargs(options: Dict) -> Dict:
+
+    # Пустые параметры не передаем, чтобы работали значения pyarrow по умолчанию
+    kwargs = {
+        'compression': options['compression'],
+        'write_statistics': options['write_statistics'],
+    }
+    if options['compression_level'] is not None:
+        kwargs['compression_level'] = options['compression_level']
+    if options['row_group_size'] is not None:
+        kwargs['row_group_size'] = options['row_group_size']
+    return kwargs
+
+
+def remove_output(path: str) -> None:
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def dataframe_to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema] = None, preserve_index: bool = False) -> pa.Table:
+
+    # schema - общая для нескольких кусков одной таблицы, иначе выводится по df
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=preserve_index)
+
+    # pandas не умеет восстановить тип "list<...>[pyarrow]" из метаданных Parquet,
+    # поэтому для колонок-списков оставляем в метаданных object: при чтении это
+    # обычные колонки со списками, а с dtype_backend="pyarrow" - снова Arrow-списки
+    metadata = table.schema.pandas_metadata
+    if metadata is None or not any(pa.types.is_list(field.type) for field in table.schema):
+        return table
+    for column in metadata['columns']:
+        if str(column.get('numpy_type', '')).startswith('list<'):
+            column['numpy_type'] = 'object'
+    return table.replace_schema_metadata({**table.schema.metadata, b'pandas': json.dumps(metadata).encode()})
+
+
+def arrow_to_dataframe(table: pa.Table) -> pd.DataFrame:
+
+    # Обратное к dataframe_to_arrow: колонки-списки снова становятся list<...>[pyarrow]
+    df = table.to_pandas(types_mapper=lambda arrow_type: pd.ArrowDtype(arrow_type) if pa.types.is_list(arrow_type) else None)
+
+    # Строки ArrowDtype (--arrow) pandas записывает как "string[pyarrow]", а читает как StringDtype:
+    # возвращаем ArrowDtype, чтобы перечитанный кадр совпадал с записанным
+    metadata = table.schema.pandas_metadata or {}
+    arrow_strings = {
+        column['name']: pd.ArrowDtype(table.schema.field(column['field_name']).type)
+        for column in metadata.get('columns', [])
+        if column.get('numpy_type') == 'string[pyarrow]' and column['name'] in df.columns
+    }
+    return df.astype(arrow_strings) if arrow_strings else df
+
+
+def write_parquet_dataset(df: pd.DataFrame, path: str, options: Dict, basename_template: Optional[str] = None) -> str:
+
+    table = dataframe_to_arrow(df)
+
+    if options['partition_cols']:
+        # Hive-партиции: path/<колонка>=<значение>/part-*.parquet,
+        # читатели отбрасывают ненужные партиции по фильтру без чтения файлов
+        dataset_kwargs = {}
+        if basename_template is not None:
+            dataset_kwargs['basename_template'] = basename_template
+        pq.write_to_dataset(
+            table,
+            root_path=path,
+            partition_cols=options['partition_cols'],
+            existing_data_behavior='overwrite_or_ignore',
+            **dataset_kwargs,
+            **_write_kwargs(options),
+        )
+    else:
+        pq.write_table(table, path, **_write_kwargs(options))
+
+    return path
+
+
+def link_or_copy(source_path: str, target_path: str) -> str:
+
+    # Второй путь - жесткая ссылка на тот же файл (без повторной сериализации),
+    # если файловая система не позволяет - обычная копия
+    remove_output(target_path)
+    try:
+        os.link(source_path, target_path)
+        return 'hardlink'
+    except OSError:
+        shutil.copy2(source_path, target_path)
+        return 'copy'
+
+
+def write_manifest(dataset_path: str, options: Dict, rows: int, aliases: Dict[str, str]) -> str:
+
+    files = []
+    if os.path.isdir(dataset_path):
+        for root, _, names in os.walk(dataset_path):
+            files.extend(os.path.relpath(os.path.join(root, name), dataset_path) for name in names)
+    manifest = {
+        'dataset': dataset_path,
+        'rows': rows,
+        'partition_cols': options['partition_cols'],
+        'compression': options['compression'],
+        'compression_level': options['compression_level'],
+        'row_group_size': options['row_group_size'],
+        'write_statistics': options['write_statistics'],
+        'files': sorted(files),
+        'aliases': aliases,
+    }
+
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return MANIFEST_PATH
@@ -0,0 +1,60 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# Одна скомпилированная регулярка на поле. Все применяются через match(),
+# то есть от начала строки, и повторяют старую логику
+# .str.split(" ").str[0].str.extract(r"^(\d+\.?\d*)$"):
+# число должно занимать весь первый "токен" до пробела.
+
+# "0.02 nM" -> 0.02
+CONCENTRATION_PATTERN = re.compile(r"(\d+\.?\d*)(?: |$)")
+
+# "24 h" -> 24
+DURATION_PATTERN = re.compile(r"(\d+)(?: |$)")
+
+# "SM5329" -> 5329 (число между первым и вторым вхождением "SM")
+SMDB_ID_PATTERN = re.compile(r"(?:(?!SM).)*SM(\d+)(?:SM|$)", re.DOTALL)
+
+
+def parse_numeric_field(series: pd.Series, pattern: re.Pattern, dtype) -> pd.api.extensions.ExtensionArray:
+
+    # Сначала факторизуем колонку (хэширование в C), затем применяем регулярку
+    # только к уникальным значениям. Результат собирается одной индексацией
+    # сразу в типизированный массив с маской пропусков - без промежуточных
+    # Series со списками строк и без отдельных astype/dropna.
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+
+    parsed = np.zeros(len(uniques) + 1, dtype=dtype)
+    parsed_mask = np.ones(len(uniques) + 1, dtype=bool)
+    convert = float if np.issubdtype(dtype, np.floating) else int
+    for i, value in enumerate(uniques):
+        match = pattern.match(value) if isinstance(value, str) else None
+        if match is not None:
+            parsed[i] = convert(match.group(1))
+            parsed_mask[i] = False
+
+    # Код -1 (пропуск в исходной колонке) указывает на последний элемент - "не распознано"
+    values = parsed[codes]
+    mask = parsed_mask[codes]
+
+    if np.issubdtype(dtype, np.floating):
+        return pd.arrays.FloatingArray(values, mask)
+    return pd.arrays.IntegerArray(values, mask)
+
+
+def parse_concentration(series: pd.Series) -> pd.api.extensions.ExtensionArray:
+
+    return parse_numeric_field(series, CONCENTRATION_PATTERN, np.float64)
+
+
+def parse_duration(series: pd.Series) -> pd.api.extensions.ExtensionArray:
+
+    return parse_numeric_field(series, DURATION_PATTERN, np.int64)
+
+
+def parse_smdb_id(series: pd.Series) -> pd.api.extensions.ExtensionArray:
+
+    return parse_numeric_field(series, SMDB_ID_PATTERN, np.int64)
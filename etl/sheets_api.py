@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Ключ Google Sheets API берется из окружения (.env), как и учетные данные БД
+API_KEY_ENV = 'GOOGLE_API_KEY'
+
+# Строк в одном диапазоне (странице) и диапазонов в одном запросе values().batchGet
+API_PAGE_ROWS = 50000
+API_RANGES_PER_REQUEST = 4
+
+# Лист по умолчанию в таблицах проекта
+API_DEFAULT_SHEET = 'Лист1'
+
+# Значения, которые read_csv по умолчанию считает пропуском: CSV-экспорт и API дают одинаковые данные
+NA_VALUES = pa.array([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# Один объект сервиса на ключ на весь процесс: discovery-документ загружается один раз
+_services = {}
+_lock = threading.Lock()
+
+
+def get_service(api_key: Optional[str] = None):
+
+    key = api_key if api_key is not None else os.getenv(API_KEY_ENV, '')
+    with _lock:
+        if key not in _services:
+            # Клиент Google нужен только для источника api, CSV-режим работает без него
+            from googleapiclient.discovery import build
+            _services[key] = build("sheets", "v4", developerKey=key, cache_discovery=False)
+        return _services[key]
+
+
+def sheet_row_count(service, spreadsheet_id: str, sheet: str = API_DEFAULT_SHEET) -> int:
+
+    # Только размеры листов, без данных
+    result = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields="sheets.properties(title,gridProperties.rowCount)",
+    ).execute()
+    for item in result.get('sheets', []):
+        properties = item.get('properties', {})
+        if properties.get('title') == sheet:
+            return int(properties.get('gridProperties', {}).get('rowCount', 0))
+    raise ValueError(f"В таблице {spreadsheet_id} нет листа {sheet}")
+
+
+def page_ranges(sheet: str, rows: int, page_rows: int = API_PAGE_ROWS) -> List[str]:
+
+    # Диапазоны строк в A1-нотации: 'Лист1'!1:50000, 'Лист1'!50001:100000, ...
+    return [f"'{sheet}'!{start}:{min(start + page_rows - 1, rows)}" for start in range(1, rows + 1, page_rows)]
+
+
+def batch_get(service, spreadsheet_id: str, ranges: List[str]) -> List[List[List[str]]]:
+
+    # По колонкам (majorDimension=COLUMNS): каждая колонка страницы приходит одним списком,
+    # из которого сразу строится массив Arrow, без промежуточного списка строк
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        majorDimension='COLUMNS',
+        valueRenderOption='FORMATTED_VALUE',
+    ).execute()
+    return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+
+def _column_array(values: List[str], rows: int) -> pa.Array:
+
+    # API не возвращает пустые ячейки в конце колонки - дополняем до числа строк страницы;
+    # пустые ячейки и NA-значения - пропуски, как у read_csv
+    array = pa.array(values + [None] * (rows - len(values)), pa.string())
+    return pc.if_else(pc.is_in(array, value_set=NA_VALUES), pa.scalar(None, pa.string()), array)
+
+
+def page_table(columns: List[List[str]], names: List[str], positions: List[int]) -> pa.Table:
+    """Страница ответа (список колонок) -> таблица Arrow из колонок схемы"""
+
+    rows = max((len(column) for column in columns), default=0)
+    arrays = [_column_array(columns[position] if position < len(columns) else [], rows) for position in positions]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def typed_table(table: pa.Table, column_types: Dict[str, Optional[str]]) -> pa.Table:
+
+    # Колонки без типа в схеме выводятся как у read_csv: целые, вещественные или строки
+    for name, type_name in column_types.items():
+        if type_name is not None or name not in table.column_names:
+            continue
+        column = table.column(name)
+        for target in (pa.int64(), pa.float64()):
+            try:
+                table = table.set_column(table.column_names.index(name), name, pc.cast(column, target))
+                break
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+    return table
+
+
+def to_frame(table: pa.Table, column_types: Dict[str, Optional[str]], dtype_backend: str = "numpy_nullable") -> pd.DataFrame:
+
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    # Колонки типа string сразу в pd.StringDtype, остальные - обычные типы numpy
+    string_columns = [name for name, type_name in column_types.items() if type_name == "string"]
+    df = table.to_pandas()
+    return df.astype({name: "string" for name in string_columns if name in df.columns})
+
+
+def iter_sheet_tables(
+    source: Dict,
+    service=None,
+    page_rows: int = API_PAGE_ROWS,
+    ranges_per_request: int = API_RANGES_PER_REQUEST,
+) -> Iterator[pa.Table]:
+    """Страницы листа таблицами Arrow: несколько диапазонов строк на один запрос batchGet"""
+
+    service = service or get_service()
+    spreadsheet_id, sheet = source['spreadsheet_id'], source.get('sheet', API_DEFAULT_SHEET)
+    column_types = source['columns']
+
+    ranges = page_ranges(sheet, sheet_row_count(service, spreadsheet_id, sheet), page_rows)
+    names, positions = None, None
+    for start in range(0, len(ranges), ranges_per_request):
+        for columns in batch_get(service, spreadsheet_id, ranges[start:start + ranges_per_request]):
+            if names is None:
+                # Первая строка первой страницы - заголовок; разбираются только колонки схемы
+                header = [column[0] if column else '' for column in columns]
+                missing = [name for name in column_types if name not in header]
+                if missing:
+                    raise ValueError(f"В листе {sheet} таблицы {spreadsheet_id} нет колонок: {missing}")
+                names = list(column_types)
+                positions = [header.index(name) for name in names]
+                columns = [column[1:] for column in columns]
+            table = page_table(columns, names, positions)
+            if table.num_rows == 0:
+                # Пустая страница (пустые строки посреди листа) - данные могут идти дальше,
+                # поэтому читаем до конца сетки (rowCount)
+                continue
+            yield table
+
+
+def iter_sheet_chunks(
+    source: Dict,
+    dtype_backend: str = "numpy_nullable",
+    service=None,
+    page_rows: int = API_PAGE_ROWS,
+    ranges_per_request: int = API_RANGES_PER_REQUEST,
+) -> Iterator[pd.DataFrame]:
+
+    # Потоковый режим: каждая страница сразу становится типизированным DataFrame
+    for table in iter_sheet_tables(source, service, page_rows, ranges_per_request):
+        df = to_frame(typed_table(table, source['columns']), source['columns'], dtype_backend)
+        yield df.rename(columns=source.get('rename', {}))
+
+
+def read_sheet(
+    source: Dict,
+    dtype_backend: str = "numpy_nullable",
+    service=None,
+    page_rows: int = API_PAGE_ROWS,
+    ranges_per_request: int = API_RANGES_PER_REQUEST,
+) -> pd.DataFrame:
+
+    tables = list(iter_sheet_tables(source, service, page_rows, ranges_per_request))
+    if tables:
+        table = pa.concat_tables(tables)
+    else:
+        table = pa.table({name: pa.array([], pa.string()) for name in source['columns']})
+    # Типы колонок без схемы выводятся по всему листу, а не по отдельной странице
+    df = to_frame(typed_table(table, source['columns']), source['columns'], dtype_backend)
+    return df.rename(columns=source.get('rename', {}))
+
+
+def read_sheets(
+    sources: Dict[str, Dict],
+    dtype_backend: str = "numpy_nullable",
+    service=None,
+    page_rows: int = API_PAGE_ROWS,
+    ranges_per_request: int = API_RANGES_PER_REQUEST,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[str, float]]]:
+
+    # Клиент Google (httplib2) не потокобезопасен, поэтому листы читаются по очереди одним сервисом
+    service = service or get_service()
+    frames, timings = {}, {}
+    for name, source in sources.items():
+        start_time = time.perf_counter()
+        frames[name] = read_sheet(source, dtype_backend, service, page_rows, ranges_per_request)
+        timings[name] = {'seconds': time.perf_counter() - start_time, 'rows': len(frames[name])}
+        print(f" {name}: {len(frames[name])} строк через Sheets API за {timings[name]['seconds']:.2f} с")
+    return frames, timings
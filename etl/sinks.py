@@ -0,0 +1,123 @@
+import contextvars
+import io
+import sys
+import time
+import traceback
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Потоков для приемников: запись Parquet/Arrow, COPY в PostgreSQL и сжатие отпускают GIL,
+# поэтому фаза загрузки длится примерно как самый медленный приемник, а не как их сумма
+SINK_WORKERS = 4
+
+
+def sink(name: str, write: Callable[[pd.DataFrame], Any], rows: Optional[int] = None, df: Optional[pd.DataFrame] = None) -> Dict:
+
+    # write получает DataFrame и возвращает путь или другой результат; исключение - провал приемника.
+    # df - свои данные приемника (например, с дополнительными колонками), по умолчанию общие для фазы
+    return {'name': name, 'write': write, 'rows': rows, 'df': df}
+
+
+# Буфер вывода текущего приемника. ContextVar, а не id потока: потоки, которые приемник
+# запускает сам (параллельная загрузка в БД), получают копию контекста и пишут в тот же буфер
+_sink_output: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar('sink_output', default=None)
+
+
+class _ThreadOutput(io.TextIOBase):
+    """sys.stdout на время фазы: вывод каждого приемника копится в своем буфере, а не перемешивается"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        buffer = _sink_output.get()
+        return (buffer if buffer is not None else self.target).write(text)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+
+def _run_sink(spec: Dict, df: pd.DataFrame, output: Optional[_ThreadOutput] = None) -> Dict:
+
+    buffer = None
+    if output is not None:
+        buffer = io.StringIO()
+        _sink_output.set(buffer)
+    if spec['df'] is not None:
+        df = spec['df']
+    result = {'name': spec['name'], 'rows_in': len(df), 'rows_out': None, 'status': 'ok', 'error': None, 'value': None}
+    start_wall = time.perf_counter()
+    # CPU только этого потока: process_time сложил бы время всех приемников
+    start_cpu = time.thread_time()
+    try:
+        # Свой неглубокий DataFrame на приемник: данные общие, а ленивые перестройки блоков pandas - нет
+        result['value'] = spec['write'](df.copy(deep=False))
+        result['rows_out'] = spec['rows'] if spec['rows'] is not None else len(df)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc(file=sys.stdout)
+    finally:
+        result['wall_seconds'] = round(time.perf_counter() - start_wall, 4)
+        result['cpu_seconds'] = round(time.thread_time() - start_cpu, 4)
+        if buffer is not None:
+            result['log'] = buffer.getvalue()
+    return result
+
+
+def _print_result(result: Dict) -> None:
+
+    if result.get('log'):
+        print(result['log'], end='')
+    if result['status'] == 'ok':
+        print(f"✓ Приемник {result['name']}: {result['wall_seconds']:.2f} с")
+    else:
+        print(f"✗ Приемник {result['name']}: ошибка за {result['wall_seconds']:.2f} с ({result['error']})")
+
+
+def run_sinks(df: pd.DataFrame, sinks: List[Dict], workers: int = SINK_WORKERS) -> List[Dict]:
+    """Запускает приемники одного неизменяемого DataFrame параллельно в пуле потоков.
+
+    Ошибка одного приемника не останавливает остальные: у каждого свой статус,
+    время и текст ошибки. Результаты возвращаются в порядке sinks.
+    """
+
+    workers = max(1, min(workers, len(sinks)))
+    print(f"Приемники: {', '.join(spec['name'] for spec in sinks)} (потоков: {workers})")
+    start_time = time.perf_counter()
+
+    if workers == 1:
+        # Один поток - по очереди в основном потоке, вывод сразу в консоль
+        results = []
+        for spec in sinks:
+            results.append(_run_sink(spec, df))
+            _print_result(results[-1])
+    else:
+        output = _ThreadOutput(sys.stdout)
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sink') as executor:
+                # Каждый приемник - в своей копии контекста: буфер вывода не виден соседям
+                futures = {
+                    executor.submit(contextvars.copy_context().run, _run_sink, spec, df, output): index
+                    for index, spec in enumerate(sinks)
+                }
+                results = [None] * len(sinks)
+                # Лог приемника выводится целиком, как только он закончил
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    _print_result(results[futures[future]])
+        finally:
+            sys.stdout = output.target
+
+    elapsed = time.perf_counter() - start_time
+    total = sum(result['wall_seconds'] for result in results)
+    slowest = max(results, key=lambda result: result['wall_seconds'])
+    print(f" Фаза загрузки: {elapsed:.2f} с (сумма приемников {total:.2f} с, "
+          f"самый медленный {slowest['name']} {slowest['wall_seconds']:.2f} с)")
+    return results
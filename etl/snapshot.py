@@ -0,0 +1,92 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from typing import List, Optional
+from .parquet_writer import arrow_to_dataframe, dataframe_to_arrow
+
+
+# Снимки этапов в формате Arrow IPC (Feather v2) рядом с Parquet и CSV
+RAW_SNAPSHOT_PATH = 'data/raw/raw_data.arrow'
+PROCESSED_SNAPSHOT_PATH = 'data/processed/processed_data.arrow'
+
+# Без сжатия буферы файла читаются через mmap без копирования;
+# lz4/zstd уменьшают файл, но при чтении данные распаковываются в память
+SNAPSHOT_COMPRESSION = 'uncompressed'
+SNAPSHOT_CODECS = ('uncompressed', 'lz4', 'zstd')
+
+
+def write_snapshot(df: pd.DataFrame, path: str, compression: str = SNAPSHOT_COMPRESSION) -> str:
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Типы pandas (category, Int64, string[pyarrow], списки) сохраняются в метаданных схемы
+    tmp_path = path + '.tmp'
+    feather.write_feather(dataframe_to_arrow(df), tmp_path, compression=compression)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot_table(path: str, columns: Optional[List[str]] = None, memory_map: bool = True) -> pa.Table:
+
+    # Таблица ссылается на страницы файла, отображенного в память: читаются только нужные колонки
+    return feather.read_table(path, columns=columns, memory_map=memory_map)
+
+
+def read_snapshot(
+    path: str,
+    columns: Optional[List[str]] = None,
+    dtype_backend: Optional[str] = None,
+    memory_map: bool = True,
+) -> pd.DataFrame:
+    """DataFrame из снимка с исходными типами; с dtype_backend="pyarrow" все колонки остаются в Arrow без копирования"""
+
+    table = read_snapshot_table(path, columns, memory_map)
+    if dtype_backend == 'pyarrow':
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return arrow_to_dataframe(table)
+
+
+class SnapshotWriter:
+    """Снимок, который дописывается кусками (потоковый режим): один record batch на кусок"""
+
+    def __init__(self, path: str, compression: str = SNAPSHOT_COMPRESSION):
+        self.path = path
+        self.compression = None if compression == 'uncompressed' else compression
+        self.rows = 0
+        self._tmp_path = path + '.tmp'
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+
+        table = dataframe_to_arrow(df)
+        if self._writer is None:
+            # Схему файла задает первый кусок
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._schema = table.schema
+            self._writer = pa.ipc.new_file(self._tmp_path, self._schema, options=options)
+        else:
+            # convert_dtypes может вывести для куска чуть другие типы - приводим к схеме файла
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> Optional[str]:
+
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def discard(self) -> None:
+
+        # Незавершенный снимок (ошибка посреди потока) не подменяет предыдущий
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
@@ -0,0 +1,192 @@
+import os
+import pandas as pd
+import psycopg2
+import pyarrow.parquet as pq
+from typing import Dict, Optional
+from .db_pool import acquire_connection, release_connection
+from .extract import iter_google_sheets_chunks, clean_raw_data, RAW_CSV_PATH
+from .features import add_sequence_features
+from .modifications import add_modification_arrays, with_array_literals
+from .http_cache import SheetCache
+from .transform import transform_data
+from .load import ROW_HASH_COLUMN, compute_row_hashes, prepare_table, write_dataframe
+from .snapshot import SnapshotWriter, PROCESSED_SNAPSHOT_PATH, RAW_SNAPSHOT_PATH, SNAPSHOT_COMPRESSION
+from .parquet_writer import dataframe_to_arrow, link_or_copy, parquet_options, remove_output, write_manifest, write_parquet_dataset
+from .validate import validate_database_connection
+
+
+PARQUET_PATH = 'data/processed/processed_data.parquet'
+ROOT_PARQUET_PATH = 'new_data.parquet'
+FINAL_CSV_PATH = 'new_data.csv'
+
+
+def append_csv(df: pd.DataFrame, path: str, first_chunk: bool) -> None:
+
+    # Первый кусок перезаписывает файл вместе с заголовком, остальные дописываются
+    with_array_literals(df).to_csv(path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+
+
+def append_parquet(writer: Optional[pq.ParquetWriter], df: pd.DataFrame, path: str, options: Dict, chunk_number: int) -> Optional[pq.ParquetWriter]:
+
+    if options['partition_cols']:
+        # Партиционированный датасет: каждый кусок дописывает свои файлы в партиции
+        write_parquet_dataset(df, path, options, basename_template=f"chunk-{chunk_number}-{{i}}.parquet")
+        return None
+
+    table = dataframe_to_arrow(df)
+
+    if writer is None:
+        # Схему файла задает первый кусок
+        writer_kwargs = {
+            'compression': options['compression'],
+            'write_statistics': options['write_statistics'],
+        }
+        if options['compression_level'] is not None:
+            writer_kwargs['compression_level'] = options['compression_level']
+        writer = pq.ParquetWriter(path, table.schema, **writer_kwargs)
+    else:
+        # Типы кусков совпадают (conform_dtypes) - приведение только выравнивает метаданные схемы
+        table = table.cast(writer.schema)
+
+    # Каждый кусок ложится в файл отдельной row group (или несколькими, если задан row_group_size)
+    writer.write_table(table, row_group_size=options['row_group_size'])
+    return writer
+
+
+def conform_dtypes(df: pd.DataFrame, dtypes: pd.Series) -> pd.DataFrame:
+
+    # convert_dtypes работает по куску: колонка без значений или с одними целыми числами
+    # получила бы другой тип, чем в первом куске, по которому заданы схемы файлов
+    mismatched = {col: dtype for col, dtype in dtypes.items() if col in df.columns and df[col].dtype != dtype}
+    return df.astype(mismatched) if mismatched else df
+
+
+def run_streaming_pipeline(
+    chunk_size: int,
+    credentials: Optional[Dict[str, str]] = None,
+    table_name: str = 'greskova',
+    max_rows: Optional[int] = None,
+    load_method: str = 'copy',
+    skip_csv: bool = False,
+    cache: Optional[SheetCache] = None,
+    dtype_backend: str = 'numpy_nullable',
+    parquet_settings: Optional[Dict] = None,
+    kmer_size: Optional[int] = None,
+    modification_codes: Optional[Dict[str, int]] = None,
+    raw_csv: bool = False,
+    snapshot_compression: str = SNAPSHOT_COMPRESSION,
+    source: str = 'csv',
+) -> Dict[str, int]:
+
+    print("\n" + "=" * 50)
+    print(f"ПОТОКОВЫЙ РЕЖИМ: куски по {chunk_size} строк")
+    print("=" * 50)
+
+    os.makedirs('data/raw', exist_ok=True)
+    os.makedirs('data/processed', exist_ok=True)
+    parquet_settings = parquet_settings or parquet_options()
+    remove_output(PARQUET_PATH)
+
+    stats = {'chunks': 0, 'raw_rows': 0, 'rows': 0, 'db_rows': 0, 'columns': 0}
+    parquet_writer = None
+    raw_snapshot = SnapshotWriter(RAW_SNAPSHOT_PATH, snapshot_compression)
+    processed_snapshot = SnapshotWriter(PROCESSED_SNAPSHOT_PATH, snapshot_compression)
+    conn = None
+    cursor = None
+    write_hashes = False
+    chunk_dtypes = None
+    chunks = None
+
+    try:
+        if credentials is not None:
+            validate_database_connection(credentials)
+            conn = acquire_connection(credentials)
+            cursor = conn.cursor()
+            print(" Соединение с PostgreSQL получено из пула")
+
+        chunks = iter_google_sheets_chunks(chunk_size, cache, dtype_backend, source)
+        for raw_chunk in chunks:
+            stats['chunks'] += 1
+
+            cleaned_chunk = clean_raw_data(raw_chunk, dtype_backend)
+            if cleaned_chunk.empty:
+                continue
+            # Типы всех кусков - как у первого
+            if chunk_dtypes is None:
+                chunk_dtypes = cleaned_chunk.dtypes
+            cleaned_chunk = conform_dtypes(cleaned_chunk, chunk_dtypes)
+            raw_snapshot.write(cleaned_chunk)
+            if raw_csv:
+                append_csv(cleaned_chunk, RAW_CSV_PATH, stats['raw_rows'] == 0)
+            stats['raw_rows'] += len(cleaned_chunk)
+
+            transformed_chunk = transform_data(cleaned_chunk)
+            if transformed_chunk.empty:
+                continue
+            # Словарь кодов модификаций общий для всех кусков
+            if modification_codes is not None:
+                transformed_chunk = add_modification_arrays(transformed_chunk, modification_codes)
+            first_chunk = stats['rows'] == 0
+
+            # Parquet, снимок Arrow IPC и CSV
+            parquet_chunk = transformed_chunk
+            if kmer_size is not None:
+                parquet_chunk = add_sequence_features(transformed_chunk, kmer_size)
+            parquet_writer = append_parquet(parquet_writer, parquet_chunk, PARQUET_PATH, parquet_settings, stats['chunks'])
+            processed_snapshot.write(transformed_chunk)
+            if not skip_csv:
+                append_csv(transformed_chunk, FINAL_CSV_PATH, first_chunk)
+
+            # База данных (с учетом общего лимита max_rows)
+            if cursor is not None:
+                if first_chunk:
+                    # Повторы id_ между кусками заранее неизвестны - уникальный индекс снимается
+                    write_hashes = prepare_table(cursor, transformed_chunk, table_name)
+                db_chunk = transformed_chunk
+                if max_rows is not None:
+                    db_chunk = transformed_chunk.head(max(max_rows - stats['db_rows'], 0))
+                if len(db_chunk) > 0:
+                    if write_hashes:
+                        db_chunk = db_chunk.assign(**{ROW_HASH_COLUMN: compute_row_hashes(db_chunk)})
+                    stats['db_rows'] += write_dataframe(cursor, db_chunk, table_name, load_method)
+
+            stats['rows'] += len(transformed_chunk)
+            stats['columns'] = len(transformed_chunk.columns)
+            print(f"✓ Обработано строк: {stats['rows']}")
+
+        if conn:
+            conn.commit()
+            print(f" Данные записаны в базу ({stats['db_rows']} строк)")
+
+        for snapshot in (raw_snapshot, processed_snapshot):
+            if snapshot.close():
+                print(f" Снимок Arrow IPC: {snapshot.path} ({snapshot.rows} строк)")
+
+    except psycopg2.Error:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        # Закрывает источник, если цикл прерван ошибкой (соединение HTTP-потока возвращается в пул)
+        if chunks is not None:
+            chunks.close()
+        raw_snapshot.discard()
+        processed_snapshot.discard()
+        if parquet_writer is not None:
+            parquet_writer.close()
+        if conn:
+            cursor.close()
+            release_connection(credentials, conn)
+            print(" Соединение с PostgreSQL возвращено в пул")
+
+    if stats['rows'] > 0:
+        # Путь в корне для обратной совместимости - ссылка на тот же файл
+        aliases = {}
+        if parquet_settings['partition_cols']:
+            remove_output(ROOT_PARQUET_PATH)
+        else:
+            aliases[ROOT_PARQUET_PATH] = link_or_copy(PARQUET_PATH, ROOT_PARQUET_PATH)
+        write_manifest(PARQUET_PATH, parquet_settings, stats['rows'], aliases)
+        print(f" Данные сохранены в {PARQUET_PATH}")
+
+    return stats
@@ -0,0 +1,141 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+
+# Доли "грязных" значений в синтетических данных
+MISSING_RATIO = 0.01
+DUPLICATE_ID_RATIO = 0.02
+SECOND_SHEET_COVERAGE = 0.98
+
+# Число различных последовательностей: в siRNAmod одна последовательность
+# встречается во многих экспериментах с разными модификациями
+SEQUENCE_POOL_SIZE = 20000
+
+NUCLEOTIDES = np.frombuffer(b"ACGU", dtype=np.uint8)
+
+# Значения категориальных колонок в формате siRNAmod
+EXPERIMENTS = ["Luciferase reporter assay", "Real-time PCR", "Western blot", "Northern blot", "Flow cytometry"]
+TARGET_GENES = ["EGFP gene", "SSB gene", "Luciferase gene", "PTEN gene", "ApoB gene", "Factor VII gene", "TTR gene", "HBV genome"]
+CELLS = ["HeLa cells", "HEK293 cells", "HepG2 cells", "A549 cells", "Mouse liver", "Huh7 cells"]
+TRANSFECTION_METHODS = ["Lipofectamine 2000", "Lipofectamine RNAiMAX", "Interfer (Polypus -Transfection)", "Oligofectamine", "Electroporation", "LNP"]
+MODIFICATIONS = [
+    "2-Methoxy", "2-Fluoro", "2-Deoxy", "Phosphorothioate", "Inverted abasic* 2-Methoxy",
+    "5-phosphate ribose* 2-Methoxy", "2-Fluoro* 2-Methoxy* Phosphorothioate", "Locked nucleic acid",
+]
+POSITIONS = ["1,21 * 20,21", "1 * 20,21", "1-3", "5", "2,4,6,8,10", "1-19", "20,21", "1,3-5 * 21"]
+
+# Строки с единицами измерения, включая нераспознаваемые ("5nM", "6h", "NA")
+CONCENTRATIONS = ["10 nM", "0.5 nM", "1 nM", "25 nM", "50 nM", "100 nM", "0.02 nM", "5 pM", "200 nM", "5nM", "NA"]
+CONCENTRATION_WEIGHTS = [0.2, 0.1, 0.1, 0.1, 0.15, 0.1, 0.05, 0.05, 0.05, 0.05, 0.05]
+DURATIONS = ["24 h", "48 h", "72 h", "48 hours", "96 h", "6h", "NA"]
+DURATION_WEIGHTS = [0.3, 0.3, 0.15, 0.1, 0.05, 0.05, 0.05]
+
+
+def _choice(rng: np.random.Generator, values, size: int, p=None) -> np.ndarray:
+    return rng.choice(np.asarray(values, dtype=object), size, p=p)
+
+
+def _with_missing(rng: np.random.Generator, values: np.ndarray, ratio: float) -> np.ndarray:
+
+    if ratio > 0:
+        values[rng.random(len(values)) < ratio] = None
+    return values
+
+
+def make_sequence_pool(rng: np.random.Generator, size: int = SEQUENCE_POOL_SIZE) -> np.ndarray:
+
+    # Последовательности 19-27 нуклеотидов, часть - с 3'-выступом dTdT
+    lengths = rng.integers(19, 28, size)
+    letters = NUCLEOTIDES[rng.integers(0, 4, (size, 27))]
+    overhang = rng.random(size) < 0.1
+    pool = np.empty(size, dtype=object)
+    for i in range(size):
+        sequence = letters[i, :lengths[i]].tobytes().decode("ascii")
+        pool[i] = sequence + "dTdT" if overhang[i] else sequence
+    return pool
+
+
+def make_sheets(
+    rows: int,
+    seed: int = 0,
+    missing_ratio: float = MISSING_RATIO,
+    duplicate_ratio: float = DUPLICATE_ID_RATIO,
+    coverage: float = SECOND_SHEET_COVERAGE,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Два DataFrame в формате выгрузок siRNAmod: основной лист и лист со ссылками (SMDBid)"""
+
+    rng = np.random.default_rng(seed)
+
+    # SMDB_id: "SM<номер>", часть номеров повторяется, как в исходных данных
+    numbers = np.arange(1, rows + 1)
+    repeated = rng.random(rows) < duplicate_ratio
+    numbers[repeated] = rng.integers(1, rows + 1, int(repeated.sum()))
+    smdb_ids = np.char.add("SM", numbers.astype(str)).astype(object)
+
+    sequences = make_sequence_pool(rng, min(SEQUENCE_POOL_SIZE, max(rows, 1)))
+    efficacy = np.char.mod("%.1f", np.round(np.linspace(0, 100, 1001), 1)).astype(object)
+
+    first = pd.DataFrame({
+        "SMDB_id": smdb_ids,
+        "Efficacy": _choice(rng, efficacy, rows),
+        "Experiment used to check activity": _with_missing(rng, _choice(rng, EXPERIMENTS, rows), missing_ratio),
+        "Target gene": _with_missing(rng, _choice(rng, TARGET_GENES, rows), missing_ratio),
+        "Cell or Organism used": _with_missing(rng, _choice(rng, CELLS, rows), missing_ratio),
+        "Transfection method": _with_missing(rng, _choice(rng, TRANSFECTION_METHODS, rows), missing_ratio),
+        "siRNA sense": _with_missing(rng, _choice(rng, sequences, rows), missing_ratio),
+        "siRNA antisense": _with_missing(rng, _choice(rng, sequences, rows), missing_ratio),
+        "Modification sense": _with_missing(rng, _choice(rng, MODIFICATIONS, rows), missing_ratio),
+        "Modification antisense": _with_missing(rng, _choice(rng, MODIFICATIONS, rows), missing_ratio),
+        "Position sense": _with_missing(rng, _choice(rng, POSITIONS, rows), missing_ratio),
+        "Position antisense": _with_missing(rng, _choice(rng, POSITIONS, rows), missing_ratio),
+        "siRNA concentration": _choice(rng, CONCENTRATIONS[:-2], rows),
+        "Concentration": _choice(rng, CONCENTRATIONS, rows, CONCENTRATION_WEIGHTS),
+        "Duration after transfection": _choice(rng, DURATIONS, rows, DURATION_WEIGHTS),
+    })
+
+    # Во втором листе каждый SMDBid один раз, часть идентификаторов отсутствует
+    second_ids = pd.unique(smdb_ids)
+    second_ids = second_ids[rng.random(len(second_ids)) < coverage]
+    size = len(second_ids)
+    second = pd.DataFrame({
+        "SMDBid": second_ids,
+        "Efficacy": _choice(rng, efficacy, size),
+        "Melting point (°C)": np.round(rng.uniform(50, 80, size), 1),
+        "Reference Link": np.char.add("https://pubmed.ncbi.nlm.nih.gov/", rng.integers(10**7, 4 * 10**7, size).astype(str)).astype(object),
+        "Field1_links": _choice(rng, ["Link", "PubMed"], size),
+        "Trust": _choice(rng, ["High", "Medium", "Low"], size),
+        "Field8_links": _choice(rng, ["NCBI", "Ensembl"], size),
+        "Reference": _choice(rng, ["Elbashir et al. 2001", "Jackson et al. 2006", "Allerson et al. 2005"], size),
+    })
+
+    return first, second
+
+
+def write_sheets(directory: str, rows: int, seed: int = 0) -> Tuple[str, str]:
+
+    os.makedirs(directory, exist_ok=True)
+    first, second = make_sheets(rows, seed)
+    first_path = os.path.join(directory, "first_sheet.csv")
+    second_path = os.path.join(directory, "second_sheet.csv")
+    first.to_csv(first_path, index=False)
+    second.to_csv(second_path, index=False)
+    return first_path, second_path
+
+
+def main(argv: Optional[list] = None):
+
+    parser = argparse.ArgumentParser(description='Генерация синтетических выгрузок в формате siRNAmod')
+    parser.add_argument('--rows', type=int, default=100000, help='Количество строк основного листа')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора')
+    parser.add_argument('--out', default='data/synthetic', help='Директория для CSV')
+    args = parser.parse_args(argv)
+
+    first_path, second_path = write_sheets(args.out, args.rows, args.seed)
+    print(f"✓ Синтетические листы: {first_path}, {second_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+import numpy as np
 import pandas as pd
 import os
 from typing import Tuple
+from .categories import enum_columns, enum_type_name
+from .modifications import array_columns
+from .parsers import parse_concentration, parse_duration, parse_smdb_id
 from .validate import validate_transformed_data
 
 
@@ -10,64 +14,36 @@ def transform_data(df: pd.DataFrame) -> pd.DataFrame:
     print("TRANSFORM: Преобразование данных")
     print("=" * 50)
     
-    # Создаем копию чтобы не менять оригинал
-    transformed_df = df.copy()
-    
     print("Исходные типы данных:")
-    for col, dtype in transformed_df.dtypes.items():
+    for col, dtype in df.dtypes.items():
         print(f"  - {col}: {dtype}")
     
-    # Создаем новую колонку Concentration new
-    print("\nСоздаем колонку Concentration new...")
-    transformed_df["Concentration new"] = (
-        transformed_df["Concentration"]
-        .str.split(" ")
-        .str[0]
-        .str.extract(r"^(\d+\.?\d*)$", expand=False)
-    )
-    print("Колонка Concentration new создана")
-    
-    # Создаем колонку id_ из SMDB_id
-    print("Создаем колонку id_...")
-    transformed_df["id_"] = (
-        transformed_df["SMDB_id"].str.split("SM").str[1].str.extract(r"^(\d+\.?\d*)$", expand=False)
-    )
-    print("Колонка id_ создана")
-    
-    # Создаем колонку Duration after transfection new
-    print("Создаем колонку Duration after transfection new...")
-    transformed_df["Duration after transfection new"] = (
-        transformed_df["Duration after transfection"].str.split(" ").str[0]
-    )
-    print("Колонка Duration after transfection new создана")
+    # Разбираем строковые колонки в типизированные массивы с маской пропусков:
+    # одна регулярка на поле, один проход по уникальным значениям
+    print("\nРазбираем Concentration, SMDB_id и Duration after transfection...")
+    concentration = parse_concentration(df["Concentration"])
+    ids = parse_smdb_id(df["SMDB_id"])
+    duration = parse_duration(df["Duration after transfection"])
+    print("Колонки Concentration new, id_ и Duration after transfection new разобраны")
     
     # Удаляем строки с пропусками в новых числовых колонках
-    before_count = len(transformed_df)
-    transformed_df = transformed_df.dropna(subset=["Concentration new", "Duration after transfection new"])
-    after_count = len(transformed_df)
-    print(f"Удалено строк с пропусками в числовых колонках: {before_count - after_count}")
-    
-    # Преобразуем типы данных
-    print("\nПреобразуем типы данных...")
+    keep = ~(pd.isna(concentration) | pd.isna(duration))
+    positions = np.flatnonzero(keep)
+    print(f"Удалено строк с пропусками в числовых колонках: {len(df) - len(positions)}")
     
-    # Concentration new -> float
-    transformed_df["Concentration new"] = transformed_df["Concentration new"].astype(float)
-    print("Concentration new преобразован в float")
+    if pd.isna(ids[positions]).any():
+        raise ValueError("Не удалось получить числовой id_ из SMDB_id для части строк")
     
-    # id_ -> int
-    transformed_df["id_"] = transformed_df["id_"].astype(int)
-    print("id_ преобразован в int")
-    
-    # Duration after transfection new -> int
-    transformed_df["Duration after transfection new"] = transformed_df[
-        "Duration after transfection new"
-    ].astype(int)
-    print("Duration after transfection new преобразован в int")
-    
-    # Удаляем старые колонки
+    # Удаляем старые колонки и собираем результат без лишних копий всего датасета
     columns_to_drop = ["SMDB_id", "Concentration", "Duration after transfection"]
-    existing_columns_to_drop = [col for col in columns_to_drop if col in transformed_df.columns]
-    transformed_df = transformed_df.drop(columns=existing_columns_to_drop)
+    existing_columns_to_drop = [col for col in columns_to_drop if col in df.columns]
+    kept_columns = [col for col in df.columns if col not in existing_columns_to_drop]
+    transformed_df = df[kept_columns].take(positions)
+    
+    transformed_df["Concentration new"] = concentration[positions].to_numpy(dtype=np.float64)
+    transformed_df["id_"] = ids[positions].to_numpy(dtype=np.int64)
+    transformed_df["Duration after transfection new"] = duration[positions].to_numpy(dtype=np.int64)
+    print("Concentration new -> float, id_ -> int, Duration after transfection new -> int")
     print(f"Удалены старые колонки: {existing_columns_to_drop}")
     
     print("\nТипы данных после преобразования:")
@@ -98,12 +74,43 @@ def prepare_for_database(df: pd.DataFrame, table_name: str) -> str:
         'float32': 'REAL',
         'bool': 'BOOLEAN',
         'datetime64[ns]': 'TIMESTAMP',
-        'object': 'TEXT'
+        'object': 'TEXT',
+        # nullable-типы после convert_dtypes
+        'Int64': 'INTEGER',
+        'Int32': 'INTEGER',
+        'Float64': 'DOUBLE PRECISION',
+        'boolean': 'BOOLEAN',
+        'string': 'TEXT',
+        # Arrow-типы (dtype_backend="pyarrow")
+        'int64[pyarrow]': 'INTEGER',
+        'int32[pyarrow]': 'INTEGER',
+        'double[pyarrow]': 'DOUBLE PRECISION',
+        'float[pyarrow]': 'REAL',
+        'bool[pyarrow]': 'BOOLEAN',
+        'string[pyarrow]': 'TEXT',
+        'large_string[pyarrow]': 'TEXT'
     }
     
+    # Элементы колонок-списков Arrow -> массивы PostgreSQL
+    array_type_mapping = {
+        'int16': 'SMALLINT[]',
+        'int32': 'INTEGER[]',
+        'int64': 'BIGINT[]',
+        'string': 'TEXT[]',
+    }
+    
+    # Категориальные колонки хранятся как ENUM (типы создает load.ensure_enum_types)
+    enum_column_set = set(enum_columns(df))
+    array_column_set = set(array_columns(df))
+    
     columns_sql = []
     for column, dtype in df.dtypes.items():
-        pg_type = type_mapping.get(str(dtype), 'TEXT')
+        if column in enum_column_set:
+            pg_type = enum_type_name(table_name, column)
+        elif column in array_column_set:
+            pg_type = array_type_mapping.get(str(dtype.pyarrow_dtype.value_type), 'TEXT[]')
+        else:
+            pg_type = type_mapping.get(str(dtype), 'TEXT')
         # Экранируем названия колонок если нужно
         safe_column = f'"{column}"' if ' ' in column or '-' in column else column
         columns_sql.append(f"{safe_column} {pg_type}")
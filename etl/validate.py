@@ -1,64 +1,227 @@
 # etl/validate.py
+import time
+import numpy as np
 import pandas as pd
-import psycopg2
-from typing import Dict
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, List, Optional
+from .db_pool import acquire_connection, release_connection
+from .parsers import CONCENTRATION_PATTERN, DURATION_PATTERN
 
 
-def validate_raw_data(df: pd.DataFrame) -> bool:
-    print("\n" + "=" * 30)
-    print("ВАЛИДАЦИЯ СЫРЫХ ДАННЫХ")
-    print("=" * 30)
-    
-    # Проверяем что DataFrame не пустой
+# Схемы данных по этапам: колонка -> правила.
+#   type      - string / integer / float или список допустимых типов
+#   nullable  - допускаются ли пропуски (по умолчанию да)
+#   pattern   - регулярка, которой должно соответствовать значение с начала строки
+#   alphabet  - допустимые символы строки
+#   min / max - допустимый диапазон чисел
+#   severity  - error (валидация падает) или warning (только в отчете), по умолчанию error
+#   required  - колонка обязана присутствовать (по умолчанию да)
+SEQUENCE_ALPHABET = "ACGUTacgutd"
+
+RAW_SCHEMA = {
+    "SMDB_id": {"type": "string", "nullable": False, "pattern": r"SM\d+$"},
+    # В части выгрузок Efficacy числовая, в части - текст вида "85" или "85 %"
+    "Efficacy_x": {"type": ["string", "float", "integer"], "pattern": r"\d+(?:\.\d+)?\b", "severity": "warning", "required": False},
+    "Target gene": {"type": "string", "nullable": False},
+    "Cell or Organism used": {"type": "string", "nullable": False},
+    "siRNA sense": {"type": "string", "nullable": False, "alphabet": SEQUENCE_ALPHABET, "severity": "warning"},
+    "siRNA antisense": {"type": "string", "nullable": False, "alphabet": SEQUENCE_ALPHABET, "severity": "warning"},
+    # Нераспознанные концентрации и длительности transform отбрасывает, поэтому это предупреждения
+    "Concentration": {"type": "string", "pattern": CONCENTRATION_PATTERN.pattern, "severity": "warning"},
+    "Duration after transfection": {"type": "string", "pattern": DURATION_PATTERN.pattern, "severity": "warning"},
+}
+
+TRANSFORMED_SCHEMA = {
+    "id_": {"type": "integer", "nullable": False, "min": 1},
+    "Concentration new": {"type": "float", "nullable": False, "min": 0},
+    "Duration after transfection new": {"type": "integer", "nullable": False, "min": 0},
+    "Target gene": {"type": "string", "nullable": False},
+    "Cell or Organism used": {"type": "string", "nullable": False},
+    "siRNA sense": {"type": "string", "nullable": False, "alphabet": SEQUENCE_ALPHABET, "severity": "warning"},
+    "siRNA antisense": {"type": "string", "nullable": False, "alphabet": SEQUENCE_ALPHABET, "severity": "warning"},
+}
+
+# Сколько номеров строк с нарушением сохранять в отчете
+SAMPLE_ROWS = 5
+
+# По стольким первым строкам решается, проверять ли колонку через словарь уникальных значений
+DICTIONARY_SAMPLE_ROWS = 10000
+
+TYPE_CHECKS = {
+    "string": lambda dtype: isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)
+    or pd.api.types.is_object_dtype(dtype),
+    "integer": pd.api.types.is_integer_dtype,
+    "float": pd.api.types.is_float_dtype,
+}
+
+
+def _arrow_strings(series: pd.Series) -> pa.Array:
+
+    # Для Arrow-колонок без копирования, для остальных - одно преобразование на колонку
+    try:
+        return pa.array(series, from_pandas=True, type=pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.astype("string"), from_pandas=True, type=pa.string())
+
+
+def _string_failures(series: pd.Series, spec: Dict) -> Dict[str, np.ndarray]:
+
+    rules = {}
+    if "pattern" in spec:
+        rules["pattern"] = f"^(?:{spec['pattern']})"
+    if "alphabet" in spec:
+        rules["alphabet"] = f"^[{spec['alphabet']}]+$"
+
+    failures = {}
+    nullable = spec.get("nullable", True)
+
+    # Регулярки считает Arrow (RE2) целиком по массиву; у category - только по категориям
+    codes = None
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        if not nullable:
+            failures["nullable"] = codes == -1
+        values = _arrow_strings(pd.Series(np.asarray(series.cat.categories, dtype=object), dtype=object))
+    elif rules:
+        values = _arrow_strings(series)
+        # Маска пропусков берется из уже преобразованного массива
+        if not nullable:
+            failures["nullable"] = values.is_null().to_numpy(zero_copy_only=False)
+    else:
+        if not nullable:
+            failures["nullable"] = series.isna().to_numpy(dtype=bool)
+        return failures
+
+    # Повторяющиеся значения (последовательности, единицы измерения) проверяются
+    # один раз через словарь Arrow; почти уникальные (SMDB_id) - напрямую
+    indices = None
+    if codes is None and len(values) > DICTIONARY_SAMPLE_ROWS:
+        sample = values.slice(0, DICTIONARY_SAMPLE_ROWS)
+        if pc.count_distinct(sample).as_py() < len(sample) / 2:
+            encoded = pc.dictionary_encode(values)
+            values, indices = encoded.dictionary, encoded.indices
+
+    for rule, regex in rules.items():
+        # Пропуски здесь не считаются нарушением - их проверяет nullable
+        bad = pc.invert(pc.match_substring_regex(values, regex))
+        if indices is not None:
+            bad = bad.take(indices)
+        bad = pc.fill_null(bad, False).to_numpy(zero_copy_only=False)
+        if codes is not None:
+            # Код -1 (пропуск) указывает на последний элемент
+            bad = np.append(bad, False)[codes]
+        failures[rule] = bad
+    return failures
+
+
+def _numeric_failures(series: pd.Series, spec: Dict) -> Dict[str, np.ndarray]:
+
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    failures = {}
+    if not spec.get("nullable", True):
+        failures["nullable"] = np.isnan(values)
+    if "min" in spec:
+        failures["min"] = values < spec["min"]
+    if "max" in spec:
+        failures["max"] = values > spec["max"]
+    return failures
+
+
+def _check(column: str, rule: str, severity: str, failed: np.ndarray, index: pd.Index) -> Dict:
+
+    positions = np.flatnonzero(failed)
+    return {
+        "column": column,
+        "rule": rule,
+        "severity": severity,
+        "failed": int(len(positions)),
+        "sample_rows": index[positions[:SAMPLE_ROWS]].tolist(),
+    }
+
+
+def validate_frame(df: pd.DataFrame, schema: Dict[str, Dict], stage: str) -> Dict:
+    """Проверяет DataFrame по схеме за один проход по колонкам; возвращает отчет со счетчиками нарушений"""
+
+    start_time = time.perf_counter()
+    checks: List[Dict] = []
+    index = df.index
+
     if df.empty:
-        raise ValueError("DataFrame пустой")
-    print("✓ DataFrame не пустой")
-    
-    # Проверяем наличие обязательных колонок
-    required_columns = ['Concentration new', 'Duration after transfection new']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    
-    if missing_columns:
-        raise ValueError(f"Отсутствуют обязательные колонки: {missing_columns}")
-    print(" Все обязательные колонки присутствуют")
-    
-    # Проверяем что есть данные
-    if len(df) == 0:
-        raise ValueError("Нет данных для обработки")
-    print(f" Количество строк: {len(df)}")
-    
-    print(" Валидация сырых данных пройдена")
-    return True
+        checks.append({"column": None, "rule": "not_empty", "severity": "error", "failed": 1, "sample_rows": []})
+
+    for column, spec in schema.items():
+        severity = spec.get("severity", "error")
+        if column not in df.columns:
+            if spec.get("required", True):
+                checks.append({"column": column, "rule": "required", "severity": "error", "failed": 1, "sample_rows": []})
+            continue
+
+        series = df[column]
+        expected_type = spec.get("type")
+        if isinstance(expected_type, list):
+            # Проверки значений - по тому из допустимых типов, который у колонки на самом деле
+            expected_type = next((name for name in expected_type if TYPE_CHECKS[name](series.dtype)), "/".join(expected_type))
+        if expected_type is not None and (expected_type not in TYPE_CHECKS or not TYPE_CHECKS[expected_type](series.dtype)):
+            # Значения неожиданного типа дальше не проверяются
+            checks.append({"column": column, "rule": f"type:{expected_type}", "severity": severity,
+                           "failed": len(df), "sample_rows": [], "dtype": str(series.dtype)})
+            continue
+
+        if expected_type == "string":
+            failures = _string_failures(series, spec)
+        else:
+            failures = _numeric_failures(series, spec)
+        for rule, failed in failures.items():
+            # Пропуск в обязательной колонке - всегда ошибка
+            checks.append(_check(column, rule, "error" if rule == "nullable" else severity, failed, index))
+
+    errors = sum(check["failed"] for check in checks if check["severity"] == "error")
+    warnings = sum(check["failed"] for check in checks if check["severity"] == "warning")
+    return {
+        "stage": stage,
+        "rows": len(df),
+        "passed": errors == 0,
+        "errors": errors,
+        "warnings": warnings,
+        "seconds": round(time.perf_counter() - start_time, 4),
+        "checks": checks,
+    }
+
+
+def print_validation_report(report: Dict) -> None:
 
+    print(f" Проверено строк: {report['rows']}, правил: {len(report['checks'])} ({report['seconds']:.3f} с)")
+    for check in report["checks"]:
+        if check["failed"] == 0:
+            continue
+        marker = "ОШИБКА" if check["severity"] == "error" else "предупреждение"
+        sample = f", например строки {check['sample_rows']}" if check["sample_rows"] else ""
+        print(f" {marker}: {check['column']} [{check['rule']}] - нарушений {check['failed']}{sample}")
 
-def validate_transformed_data(df: pd.DataFrame) -> bool:
+
+def _validate(df: pd.DataFrame, schema: Dict[str, Dict], stage: str, title: str) -> Dict:
 
     print("\n" + "=" * 30)
-    print("ВАЛИДАЦИЯ ПРЕОБРАЗОВАННЫХ ДАННЫХ")
+    print(title)
     print("=" * 30)
-    
-    # Проверяем типы данных числовых колонок
-    numeric_columns = ['Concentration new', 'Duration after transfection new']
-    
-    for col in numeric_columns:
-        if col in df.columns:
-            if not pd.api.types.is_numeric_dtype(df[col]):
-                print(f" Колонка {col} не числового типа: {df[col].dtype}")
-            else:
-                print(f" Колонка {col} числового типа: {df[col].dtype}")
-    
-    # Проверяем отсутствие NaN в ключевых колонках
-    key_columns = ['Target gene', 'Cell or Organism used']
-    for col in key_columns:
-        if col in df.columns:
-            nan_count = df[col].isna().sum()
-            if nan_count > 0:
-                print(f" В колонке {col} найдено {nan_count} NaN значений")
-            else:
-                print(f" В колонке {col} нет NaN значений")
-    
-    print(" Валидация преобразованных данных пройдена")
-    return True
+
+    report = validate_frame(df, schema, stage)
+    print_validation_report(report)
+    if not report["passed"]:
+        raise ValueError(f"Валидация ({stage}) не пройдена: нарушений {report['errors']}")
+    print(f" Валидация пройдена (предупреждений: {report['warnings']})")
+    return report
+
+
+def validate_raw_data(df: pd.DataFrame, schema: Optional[Dict[str, Dict]] = None) -> Dict:
+
+    return _validate(df, schema or RAW_SCHEMA, "raw", "ВАЛИДАЦИЯ СЫРЫХ ДАННЫХ")
+
+
+def validate_transformed_data(df: pd.DataFrame, schema: Optional[Dict[str, Dict]] = None) -> Dict:
+
+    return _validate(df, schema or TRANSFORMED_SCHEMA, "transformed", "ВАЛИДАЦИЯ ПРЕОБРАЗОВАННЫХ ДАННЫХ")
 
 
 def validate_database_connection(credentials: Dict[str, str]) -> bool:
@@ -69,7 +232,8 @@ def validate_database_connection(credentials: Dict[str, str]) -> bool:
     
     conn = None
     try:
-        conn = psycopg2.connect(**credentials)
+        # Соединение из общего пула, дальше его же используют DDL и загрузка
+        conn = acquire_connection(credentials)
         cursor = conn.cursor()
         
         # Проверяем версию PostgreSQL
@@ -83,7 +247,7 @@ def validate_database_connection(credentials: Dict[str, str]) -> bool:
         print(f"✓ Текущая база: {db_name}")
         
         cursor.close()
-        conn.close()
+        release_connection(credentials, conn)
         
         print(" Валидация подключения к БД пройдена")
         return True
@@ -91,5 +255,5 @@ def validate_database_connection(credentials: Dict[str, str]) -> bool:
     except Exception as e:
         print(f"Ошибка валидации подключения: {e}")
         if conn:
-            conn.close()
+            release_connection(credentials, conn)
         return False
\ No newline at end of file
@@ -1,40 +1,38 @@
+import os
+import sys
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import io
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.http_stream import read_csv_stream
 
 def parse_csv_from_google_sheets(sheet_id):
     """
-    Парсинг CSV данных из Google Sheets с использованием Beautiful Soup
+    Потоковый парсинг CSV из Google Sheets: тело ответа (gzip) разбирается
+    pd.read_csv по мере загрузки, соединения берутся из общего пула сессии
     """
     url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-    
-
-    response = requests.get(url)
-    response.encoding = 'utf-8'
-    
-    # Используем Beautiful Soup для обработки текстовых данных
-    soup = BeautifulSoup(response.text, 'html.parser')
 
-    csv_data = soup.get_text()
-    
-    df = pd.read_csv(io.StringIO(csv_data))
+    df = read_csv_stream(url)
     
     return df
 
-# Парсинг первого датасета
-print("Парсинг первого датасета...")
+# Парсинг обоих датасетов параллельно
+print("Парсинг первого и второго датасетов...")
 format = "csv"
 id = "1scmkeENxadknow2rZ6H9LiG9m_BJmkBH"
-df = parse_csv_from_google_sheets(id)
+id1 = "1G6m-QoLgdWbOV3rSUBOaxn1cDQKkKk1H"
+with ThreadPoolExecutor(max_workers=2) as executor:
+    future = executor.submit(parse_csv_from_google_sheets, id)
+    future1 = executor.submit(parse_csv_from_google_sheets, id1)
+    df = future.result()
+    df1 = future1.result().rename(columns={"SMDBid": "SMDB_id"})
+
 print("Первые 10 строк первого датасета:")
 print(df.head(10))
 
-# Парсинг второго датасета
-print("\nПарсинг второго датасета...")
-id1 = "1G6m-QoLgdWbOV3rSUBOaxn1cDQKkKk1H"
-df1 = parse_csv_from_google_sheets(id1).rename(columns={"SMDBid": "SMDB_id"})
-print("Первые 10 строк второго датасета:")
+print("\nПервые 10 строк второго датасета:")
 print(df1.head(10))
 
 # Объединение данных
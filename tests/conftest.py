@@ -0,0 +1,28 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+# Тесты импортируют модули как пакет etl из корня репозитория (как benchmarks/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_credentials():
+
+    # Нужен PostgreSQL из переменных среды, как у get_database_credentials
+    credentials = {
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME', 'homeworks'),
+    }
+    if not all(credentials.values()):
+        pytest.skip("PostgreSQL не настроен (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD)")
+    try:
+        psycopg2.connect(**credentials).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL недоступен: {e}")
+    return credentials
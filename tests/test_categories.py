@@ -0,0 +1,104 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pyarrow.parquet as pq
+import pytest
+
+from etl.categories import encode_low_cardinality, enum_type_name
+from etl.extract import clean_raw_data
+from etl.load import load_to_database
+from etl.parquet_writer import arrow_to_dataframe, parquet_options, write_parquet_dataset
+from etl.snapshot import read_snapshot, write_snapshot
+from etl.transform import prepare_for_database
+
+
+TABLE = "test_etl_categories"
+ROWS = 60
+
+
+def encoded(dtype_backend):
+
+    # Как в пакетном режиме: очистка с выбранным бэкендом, затем словарное кодирование
+    raw = pd.DataFrame({
+        "id_": np.arange(1, ROWS + 1),
+        "Target gene": [("EGFP", "PLK1", "TTR")[i % 3] for i in range(ROWS)],
+        "Duration after transfection": [None if i % 10 == 0 else ("24 часа", "48 h")[i % 2] for i in range(ROWS)],
+        "siRNA sense": [f"ACGUACGU{i}" for i in range(ROWS)],
+        "Efficacy": [None if i % 7 == 0 else i / 4 for i in range(ROWS)],
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        return encode_low_cardinality(clean_raw_data(raw, dtype_backend), 0.1)
+
+
+@pytest.fixture(params=["numpy_nullable", "pyarrow"])
+def df(request):
+
+    return encoded(request.param)
+
+
+def test_low_cardinality_columns_become_categories(df):
+
+    assert isinstance(df["Target gene"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["Duration after transfection"].dtype, pd.CategoricalDtype)
+    assert df["Duration after transfection"].isna().sum() == 6
+    assert pd.api.types.is_string_dtype(df["siRNA sense"].dtype)
+    assert df["Target gene"].cat.categories.tolist() == ["EGFP", "PLK1", "TTR"]
+
+
+def test_parquet_round_trip(df, tmp_path):
+
+    path = str(tmp_path / "encoded.parquet")
+    write_parquet_dataset(df, path, parquet_options(row_group_size=16))
+    pd.testing.assert_frame_equal(arrow_to_dataframe(pq.read_table(path)), df)
+
+
+def test_snapshot_round_trip(df, tmp_path):
+
+    path = write_snapshot(df, str(tmp_path / "encoded.arrow"))
+    pd.testing.assert_frame_equal(read_snapshot(path), df)
+
+
+def test_create_table_uses_enum_and_typed_columns(df):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_sql = prepare_for_database(df, TABLE)
+    assert f'"Target gene" {enum_type_name(TABLE, "Target gene")}' in create_sql
+    assert f'"Duration after transfection" {enum_type_name(TABLE, "Duration after transfection")}' in create_sql
+    assert "id_ INTEGER" in create_sql
+    assert '"siRNA sense" TEXT' in create_sql
+    assert "Efficacy DOUBLE PRECISION" in create_sql
+
+
+def test_postgres_enum_round_trip(df, db_credentials):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert load_to_database(df, db_credentials, TABLE)
+    type_name = enum_type_name(TABLE, "Duration after transfection")
+    conn = psycopg2.connect(**db_credentials)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT enumlabel FROM pg_enum JOIN pg_type ON pg_type.oid = enumtypid WHERE typname = %s ORDER BY enumsortorder",
+                (type_name,),
+            )
+            labels = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT column_name, udt_name FROM information_schema.columns WHERE table_name = %s", (TABLE,)
+            )
+            column_types = dict(cursor.fetchall())
+            cursor.execute(f'SELECT id_, "Target gene", "Duration after transfection", "siRNA sense", efficacy FROM {TABLE} ORDER BY id_')
+            rows = cursor.fetchall()
+            cursor.execute(f"DROP TABLE {TABLE}")
+            cursor.execute(f"DROP TYPE {enum_type_name(TABLE, 'Target gene')}, {type_name}")
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert labels == df["Duration after transfection"].cat.categories.tolist()
+    assert column_types["Target gene"] == enum_type_name(TABLE, "Target gene")
+    assert column_types["Duration after transfection"] == type_name
+    expected = df.astype(object).where(df.notna(), None)
+    assert rows == list(expected[["id_", "Target gene", "Duration after transfection", "siRNA sense", "Efficacy"]].itertuples(index=False, name=None))
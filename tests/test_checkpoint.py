@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from etl import main
+from etl.checkpoint import CheckpointStore, run_stages, stage_key
+from etl.extract import FIRST_SHEET_ID, SECOND_SHEET_ID, SOURCE_SCHEMAS, schema_read_options
+from etl.metrics import RunReport
+from etl.synthetic import write_sheets
+
+
+def counting_stage(calls, name, value):
+
+    def compute(df):
+        calls.append(name)
+        df = pd.DataFrame({"value": [0]}) if df is None else df
+        return df.assign(value=df["value"] + value)
+    return compute
+
+
+def chain(calls, source="v1"):
+
+    # Ключи по цепочке, как в main: ключ этапа зависит от ключа предыдущего
+    raw_key = stage_key("raw", source)
+    cleaned_key = stage_key("cleaned", raw_key)
+    transformed_key = stage_key("transformed", cleaned_key)
+    return [
+        ("raw", raw_key, counting_stage(calls, "raw", 1)),
+        ("cleaned", cleaned_key, counting_stage(calls, "cleaned", 10)),
+        ("transformed", transformed_key, counting_stage(calls, "transformed", 100)),
+    ]
+
+
+def run(store, stages, **options):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run_stages(store, stages, **options)
+
+
+def test_resume_reuses_last_checkpoint(tmp_path):
+
+    store = CheckpointStore(str(tmp_path))
+    calls = []
+    df, reused = run(store, chain(calls))
+    assert calls == ["raw", "cleaned", "transformed"] and reused == []
+
+    calls.clear()
+    resumed, reused = run(store, chain(calls), resume=True)
+    assert calls == [] and reused == ["raw", "cleaned", "transformed"]
+    pd.testing.assert_frame_equal(resumed, df)
+
+
+def test_changed_input_invalidates_following_keys(tmp_path):
+
+    store = CheckpointStore(str(tmp_path))
+    run(store, chain([]))
+    calls = []
+    _, reused = run(store, chain(calls, source="v2"), resume=True)
+    assert calls == ["raw", "cleaned", "transformed"] and reused == []
+
+
+@pytest.mark.parametrize("force_stage, expected", [
+    ("raw", ["raw", "cleaned", "transformed"]),
+    ("cleaned", ["cleaned", "transformed"]),
+    ("transformed", ["transformed"]),
+])
+def test_force_stage_recomputes_it_and_following(tmp_path, force_stage, expected):
+
+    store = CheckpointStore(str(tmp_path))
+    run(store, chain([]))
+    calls = []
+    run(store, chain(calls), resume=True, force_stage=force_stage)
+    assert calls == expected
+
+
+def test_force_stage_outside_chain_is_rejected(tmp_path):
+
+    store = CheckpointStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        run(store, chain([])[1:], resume=True, force_stage="raw")
+
+
+def test_checkpoint_round_trip_keeps_frame(tmp_path):
+
+    # После фильтрации строк индекс не RangeIndex; типы - как у результата transform
+    df = pd.DataFrame({
+        "id_": pd.array([1, 2, None, 4, 5], dtype="Int64"),
+        "gene": pd.Series(["A", "B", "A", None, "B"], dtype="string").astype("category"),
+        "name": ["x", None, "z", "w", "v"],
+        "value": np.linspace(0, 1, 5),
+        "modifications": pd.arrays.ArrowExtensionArray(pa.array([[1], [], None, [2, 3], [4]], pa.list_(pa.int16()))),
+    }).iloc[[0, 2, 4]]
+    store = CheckpointStore(str(tmp_path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.save("transformed", "key", df)
+        loaded = store.load("transformed", "key")
+    pd.testing.assert_frame_equal(loaded, df)
+
+
+def test_force_raw_without_cache_recomputes_all_stages(tmp_path, monkeypatch):
+
+    # Без HTTP кэша raw вне цепочки: --force-stage raw должен пересчитать и очистку, и transform
+    monkeypatch.chdir(tmp_path)
+    first_path, second_path = write_sheets(str(tmp_path), 2000)
+
+    def extract(cache, timeout, retries, dtype_backend, join, source):
+        first = pd.read_csv(first_path, **schema_read_options(FIRST_SHEET_ID, dtype_backend))
+        second = pd.read_csv(second_path, **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+        return pd.merge(first.rename(columns=SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"]),
+                        second.rename(columns=SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"]), on="SMDB_id")
+
+    calls = []
+    transform_frame = main.transform_frame
+    monkeypatch.setattr(main, "extract_data_from_google_sheets", extract)
+    monkeypatch.setattr(main, "transform_frame", lambda df, workers: calls.append("transformed") or transform_frame(df, workers))
+
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    args = argparse.Namespace(
+        fetch_timeout=1, fetch_retries=1, source="csv", raw_csv=False, snapshot_compression="uncompressed",
+        category_ratio=main.CATEGORY_MAX_RATIO, workers=1, resume=True, force_stage=None,
+    )
+
+    def run_pipeline(**options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main.run_checkpointed_stages(
+                argparse.Namespace(**{**vars(args), **options}), store, None, "numpy_nullable", None,
+                {"fanout": "warn"}, RunReport(),
+            )
+
+    computed = run_pipeline(resume=False)
+    resumed = run_pipeline()
+    assert calls == ["transformed"]
+    pd.testing.assert_frame_equal(resumed, computed)
+
+    run_pipeline(force_stage="raw")
+    assert calls == ["transformed", "transformed"]
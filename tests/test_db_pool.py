@@ -0,0 +1,89 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+import pytest
+
+from etl import db_pool
+from etl.db_pool import acquire_connection, close_all_pools, configure_pool, pool_stats, release_connection
+
+
+@pytest.fixture
+def credentials(db_credentials):
+
+    close_all_pools()
+    yield db_credentials
+    configure_pool()
+
+
+def test_exhausted_pool_waits_for_released_connection(credentials):
+
+    configure_pool(1, 2, acquire_timeout_seconds=5)
+    first = acquire_connection(credentials)
+    acquire_connection(credentials)
+    timer = threading.Timer(0.2, release_connection, (credentials, first))
+    timer.start()
+
+    start = time.monotonic()
+    third = acquire_connection(credentials)
+    assert third is first and time.monotonic() - start >= 0.15
+    timer.join()
+
+
+def test_exhausted_pool_raises_after_timeout(credentials):
+
+    configure_pool(1, 1, acquire_timeout_seconds=0.1)
+    acquire_connection(credentials)
+    with pytest.raises(psycopg2.pool.PoolError):
+        acquire_connection(credentials)
+
+
+def test_health_check_only_after_idle(credentials):
+
+    configure_pool(1, 1, health_check_idle_seconds=0.2)
+    before = pool_stats()
+    conn = acquire_connection(credentials)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        pid = cursor.fetchone()[0]
+    release_connection(credentials, conn)
+
+    # Сразу после возврата соединение выдается без проверки
+    assert acquire_connection(credentials) is conn
+    release_connection(credentials, conn)
+
+    # Сервер разорвал соединение, пока оно простаивало: проверка его отбрасывает
+    killer = psycopg2.connect(**credentials)
+    with killer, killer.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    killer.close()
+    time.sleep(0.3)
+    fresh = acquire_connection(credentials)
+    assert fresh is not conn and not fresh.closed
+    release_connection(credentials, fresh)
+
+    stats = pool_stats()
+    # Первое соединение при создании пула и одно взамен отброшенного
+    assert stats['connections'] - before['connections'] == 2
+
+
+def test_connections_are_opened_in_parallel(credentials, monkeypatch):
+
+    # Медленное подключение одного потока не задерживает другие (и возврат соединений в пул)
+    connect = db_pool.CountingConnectionPool._open
+
+    def slow_connect(self):
+        time.sleep(0.4)
+        return connect(self)
+
+    configure_pool(0, 3)
+    monkeypatch.setattr(db_pool.CountingConnectionPool, "_open", slow_connect)
+    connections = []
+    threads = [threading.Thread(target=lambda: connections.append(acquire_connection(credentials))) for _ in range(3)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(connections) == 3 and time.monotonic() - start < 1.0
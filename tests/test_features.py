@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from etl.features import NUCLEOTIDES, SEQUENCE_POSITIONS, add_sequence_features, strand_features
+
+
+def test_position_one_hot():
+
+    features = strand_features(["ACGU", "dTdT", None, "AXc"], "sense", positions=5)
+    one_hot = np.array([
+        [[features[f"sense_pos{position}_{letter}"][row] for letter in NUCLEOTIDES] for position in range(1, 6)]
+        for row in range(4)
+    ])
+    # Позиции после конца цепи и прочие символы - все нули, dT считается как T/U
+    assert one_hot[0].argmax(axis=1).tolist()[:4] == [0, 1, 2, 3] and not one_hot[0, 4].any()
+    assert one_hot[1, :2, 3].all() and one_hot[1].sum() == 2
+    assert not one_hot[2].any()
+    assert one_hot[3, 0, 0] and not one_hot[3, 1].any() and one_hot[3, 2, 1]
+    assert "sense_pos6_A" not in features
+
+
+def test_position_columns_do_not_depend_on_data():
+
+    # Одинаковые колонки для коротких и длинных цепей: куски потокового режима пишутся в одну схему
+    short = pd.DataFrame({"siRNA sense": ["ACG"], "siRNA antisense": ["U"]})
+    long = pd.DataFrame({"siRNA sense": ["A" * 30], "siRNA antisense": ["C" * 25]})
+    with contextlib.redirect_stdout(io.StringIO()):
+        short_columns = add_sequence_features(short).columns
+        long_columns = add_sequence_features(long).columns
+    assert list(short_columns) == list(long_columns)
+    assert f"antisense_pos{SEQUENCE_POSITIONS}_U" in short_columns
@@ -0,0 +1,43 @@
+import contextlib
+import io
+
+import pytest
+import requests
+
+from etl import fetch
+
+
+SOURCE = {'url': 'http://example.invalid/sheet.csv', 'key': 'sheet'}
+
+
+def test_fetch_source_requires_an_attempt():
+
+    with pytest.raises(ValueError):
+        fetch.fetch_source("лист", SOURCE, retries=0)
+
+
+def test_fetch_source_retries_until_success(monkeypatch):
+
+    attempts = []
+
+    def download_sheet(url, key, cache=None, timeout=None):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise requests.ConnectionError("нет соединения")
+        return io.BytesIO(b"a,b\n1,2\n")
+
+    monkeypatch.setattr(fetch, "download_sheet", download_sheet)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, timing = fetch.fetch_source("лист", {**SOURCE, 'timeout': 5}, retries=3, backoff=0)
+    assert timing['attempts'] == 3 and attempts == [5, 5, 5]
+    assert df.to_dict('list') == {'a': [1], 'b': [2]}
+
+
+def test_fetch_source_raises_after_last_attempt(monkeypatch):
+
+    def download_sheet(url, key, cache=None, timeout=None):
+        raise requests.Timeout("таймаут")
+
+    monkeypatch.setattr(fetch, "download_sheet", download_sheet)
+    with pytest.raises(requests.Timeout), contextlib.redirect_stdout(io.StringIO()):
+        fetch.fetch_source("лист", SOURCE, retries=2, backoff=0)
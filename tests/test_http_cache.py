@@ -0,0 +1,132 @@
+import contextlib
+import http.server
+import io
+import os
+import threading
+
+import pytest
+import requests
+
+from etl.http_cache import SheetCache
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    """Отдает тела из server.bodies с ETag/Last-Modified и отвечает 304 на условный запрос"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        if server.failing:
+            self.send_error(503)
+            return
+
+        body, etag = server.bodies[self.path]
+        if self.headers.get('If-None-Match') == etag or self.headers.get('If-Modified-Since') == server.last_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', server.last_modified)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SheetHandler)
+    server.bodies = {'/first': (b"a,b\n1,2\n", '"v1"'), '/second': (b"c\n" + b"3\n" * 50, '"s1"')}
+    server.last_modified = 'Mon, 01 Jan 2024 00:00:00 GMT'
+    server.requests = []
+    server.failing = False
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(cache, server, key, path):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return cache.fetch(key, server.url + path)
+
+
+def read(path):
+
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_fresh_entry_is_served_without_request(tmp_path, server):
+
+    cache = SheetCache(str(tmp_path), ttl=3600)
+    path = fetch(cache, server, 'first', '/first')
+    assert fetch(cache, server, 'first', '/first') == path
+    assert read(path) == b"a,b\n1,2\n"
+    assert len(server.requests) == 1
+    assert cache.stats() == {'hits': 1, 'revalidated': 0, 'misses': 1, 'stale': 0}
+
+
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_expired_entry_is_revalidated(tmp_path, server, validator):
+
+    cache = SheetCache(str(tmp_path), ttl=0)
+    fetch(cache, server, 'first', '/first')
+    if validator == "etag":
+        server.last_modified = 'Tue, 02 Jan 2024 00:00:00 GMT'
+    else:
+        server.bodies['/first'] = (b"a,b\n1,2\n", '"v2"')
+
+    # Устаревшая копия: условный запрос, 304 - тело не скачивается заново
+    path = fetch(cache, server, 'first', '/first')
+    headers = server.requests[-1][1]
+    assert headers.get('If-None-Match') == '"v1"'
+    assert headers.get('If-Modified-Since') == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    assert read(path) == b"a,b\n1,2\n"
+    assert cache.revalidated == 1 and cache.misses == 1
+
+    # Данные изменились - новое тело
+    server.bodies['/first'] = (b"a,b\n5,6\n", '"v3"')
+    server.last_modified = 'Wed, 03 Jan 2024 00:00:00 GMT'
+    assert read(fetch(cache, server, 'first', '/first')) == b"a,b\n5,6\n"
+    assert cache.misses == 2
+
+
+def test_stale_copy_is_used_when_server_fails(tmp_path, server):
+
+    cache = SheetCache(str(tmp_path), ttl=0)
+    fetch(cache, server, 'first', '/first')
+    server.failing = True
+    assert read(fetch(cache, server, 'first', '/first')) == b"a,b\n1,2\n"
+    assert cache.stale == 1
+
+    # Без сохраненной копии ошибка не скрывается
+    with pytest.raises(requests.HTTPError):
+        fetch(cache, server, 'second', '/second')
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, server):
+
+    server.bodies['/third'] = (b"d\n" * 20, '"t1"')
+    fetch(SheetCache(str(tmp_path)), server, 'first', '/first')
+    fetch(SheetCache(str(tmp_path)), server, 'second', '/second')
+    # first использован позже second - вытесняется second
+    fetch(SheetCache(str(tmp_path)), server, 'first', '/first')
+
+    cache = SheetCache(str(tmp_path), max_bytes=len(server.bodies['/first'][0]) + len(server.bodies['/third'][0]))
+    fetch(cache, server, 'third', '/third')
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.body')) == ['first.body', 'third.body']
+
+    # Записи, выданные в этом запуске, не вытесняются, даже если кэш переполнен
+    cache.max_bytes = 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert cache.evict() == 1
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.body')] == ['third.body']
@@ -0,0 +1,86 @@
+import gzip
+import http.server
+import threading
+
+import pandas as pd
+import pytest
+
+from etl import http_stream
+from etl.http_stream import iter_csv_stream, open_stream, read_csv_stream
+
+
+CSV = "id,name,value\n" + "".join(f"{i},имя{i % 13},{i / 7:.4f}\n" for i in range(20000))
+
+
+class GzipChunkedHandler(http.server.BaseHTTPRequestHandler):
+    """CSV со сжатием gzip (если клиент его принимает) и Transfer-Encoding: chunked"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = CSV.encode()
+        compressed = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compressed:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for start in range(0, len(body), 4096):
+                part = body[start:start + 4096]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), GzipChunkedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/sheet.csv"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_is_decompressed_while_parsed(url):
+
+    with open_stream(url) as body:
+        assert body.content_encoding == 'gzip'
+        df = pd.read_csv(body)
+        assert body.bytes_read == len(CSV.encode())
+    pd.testing.assert_frame_equal(df, pd.read_csv(pd.io.common.StringIO(CSV)))
+    pd.testing.assert_frame_equal(read_csv_stream(url, dtype={'name': 'string'}), df.astype({'name': 'string'}))
+
+
+def test_chunks_cover_whole_body(url):
+
+    chunks = list(iter_csv_stream(url, 3000))
+    assert [len(chunk) for chunk in chunks] == [3000] * 6 + [2000]
+    assert pd.concat(chunks, ignore_index=True)['id'].tolist() == list(range(20000))
+
+
+def test_closing_early_closes_response(url, monkeypatch):
+
+    opened = []
+
+    def open_and_record(url, timeout):
+        opened.append(open_stream(url, timeout))
+        return opened[-1]
+
+    monkeypatch.setattr(http_stream, "open_stream", open_and_record)
+    chunks = iter_csv_stream(url, 1000)
+    next(chunks)
+    assert not opened[0].closed
+
+    # Остановка на первом куске: close() закрывает поток ответа, соединение не ждет сборщика мусора
+    chunks.close()
+    assert opened[0].closed and opened[0].response.raw.closed
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl import join
+from etl.extract import FIRST_SHEET_ID, SECOND_SHEET_ID, SOURCE_SCHEMAS, schema_read_options
+from etl.join import join_frames
+from etl.synthetic import write_sheets
+
+
+def synthetic_sheets(directory, rows: int, dtype_backend: str):
+
+    first_path, second_path = write_sheets(str(directory), rows)
+    first = pd.read_csv(first_path, **schema_read_options(FIRST_SHEET_ID, dtype_backend))
+    second = pd.read_csv(second_path, **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+    return (first.rename(columns=SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"]),
+            second.rename(columns=SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"]))
+
+
+def fanout_frames():
+
+    # Повторы ключа с обеих сторон, пропуски в ключе и совпадающие имена колонок
+    rng = np.random.default_rng(0)
+    keys = pd.Series(rng.integers(0, 500, 5000)).map(lambda value: f"SM{value}").astype(object)
+    keys[::97] = np.nan
+    left = pd.DataFrame({"key": keys, "value": np.arange(5000), "name": keys.str.lower()})
+    right = pd.DataFrame({
+        "key": pd.Series(rng.integers(0, 600, 800)).map(lambda value: f"SM{value}").astype(object),
+        "value": rng.random(800),
+        "flag": pd.array(rng.integers(0, 2, 800), dtype="boolean"),
+    })
+    right.loc[::50, "key"] = np.nan
+    return left, right
+
+
+def run_join(left, right, key, algorithm, spill_dir, **options):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        merged, profile = join_frames(left, right, key, algorithm=algorithm, spill_dir=str(spill_dir), **options)
+    assert profile["algorithm"] == algorithm
+    return merged
+
+
+@pytest.mark.parametrize("algorithm", ["hash", "sorted", "spill"])
+@pytest.mark.parametrize("dtype_backend", ["numpy_nullable", "pyarrow"])
+def test_join_matches_merge_on_synthetic_sheets(tmp_path, algorithm, dtype_backend):
+
+    left, right = synthetic_sheets(tmp_path, 20000, dtype_backend)
+    expected = pd.merge(left, right, on="SMDB_id")
+    merged = run_join(left, right, "SMDB_id", algorithm, tmp_path / "spill")
+    pd.testing.assert_frame_equal(merged, expected)
+
+
+@pytest.mark.parametrize("algorithm", ["hash", "spill"])
+def test_join_matches_merge_with_fanout_and_null_keys(tmp_path, monkeypatch, algorithm):
+
+    # Блок слияния меньше левой таблицы: порядок собирается из нескольких блоков
+    monkeypatch.setattr(join, "JOIN_BLOCK_ROWS", 700)
+    left, right = fanout_frames()
+    expected = pd.merge(left, right, on="key")
+    merged = run_join(left, right, "key", algorithm, tmp_path / "spill", memory_budget=64 * 1024)
+    pd.testing.assert_frame_equal(merged, expected)
+
+
+def test_spill_join_releases_inputs_and_cleans_up(tmp_path):
+
+    left, right = fanout_frames()
+    expected = pd.merge(left, right, on="key")
+    inputs = [left, right]
+    del left, right
+    merged = join.spill_join(inputs, "key", 4, str(tmp_path))
+    assert inputs == []
+    assert os.listdir(tmp_path) == []
+    pd.testing.assert_frame_equal(merged, expected)
+
+
+def test_fanout_fail():
+
+    left, right = fanout_frames()
+    with pytest.raises(ValueError), contextlib.redirect_stdout(io.StringIO()):
+        join_frames(left, right, "key", fanout="fail")
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.kmer_index import build_index, load_index, query_index, save_index, update_index
+
+
+def frame(rows):
+
+    ids, sense, antisense, efficacy = zip(*rows)
+    return pd.DataFrame({
+        'id_': np.array(ids, dtype=np.int64),
+        'siRNA sense': pd.array(sense, dtype="string"),
+        'siRNA antisense': pd.array(antisense, dtype="string"),
+        'Target gene': pd.array(["EGFP"] * len(rows), dtype="string"),
+        'Efficacy_x': np.array(efficacy, dtype=np.float64),
+    })
+
+
+DF = frame([
+    (1, "ACGUACGUACGUACGUACGUA", "UUUUUGGGGGCCCCCAAAAAU", 50.0),
+    (2, "ACGUACGUACGUACGUAGGGG", "UACGUACGUACGUACGUACGU", 60.5),
+    (3, "ACGUACGUAAAAAAAAAAAAA", "GGGGGGGGGGGGGGGGGGGGG", np.nan),
+    (4, "CCCCCCCCCCCCCCCCCCCCC", None, 10.0),
+])
+
+
+def test_query_ranks_by_similarity():
+
+    index = build_index(DF, k=5)
+    result = query_index(index, "ACGUACGUACGUACGUACGUA", top_n=3)
+    assert result['id_'].tolist()[:2] == [1, 2]
+    assert result['similarity'].iloc[0] == 1.0
+    assert result['similarity'].is_monotonic_decreasing
+    assert len(result) == 3
+    # Пропуски в данных - пустые строки в записях индекса
+    assert set(result['Efficacy_x']) <= {"50.0", "60.5", "", "10.0"}
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_build_without_missing_values_does_not_warn():
+
+    # Числовая колонка без пропусков: fillna по object-колонке предупреждал о понижении типа
+    index = build_index(DF.dropna(subset=['Efficacy_x']), k=5)
+    assert sorted(set(index['entry_efficacy'])) == ["10.0", "50.0", "60.5"]
+
+
+def test_strand_filter():
+
+    index = build_index(DF, k=5)
+    sense = query_index(index, "ACGUACGUACGUACGUACGUA", strand="sense")
+    antisense = query_index(index, "ACGUACGUACGUACGUACGUA", strand="antisense")
+    assert set(sense['strand']) == {"sense"} and set(antisense['strand']) == {"antisense"}
+    assert antisense['id_'].tolist() == [2]
+
+
+def test_query_shorter_than_k_is_empty():
+
+    result = query_index(build_index(DF, k=5), "ACGU")
+    assert result.empty and 'similarity' in result.columns
+
+
+def test_incremental_update_matches_rebuild(tmp_path):
+
+    # Строка 1 удалена, строка 3 изменилась, строка 5 добавлена
+    changed = pd.concat([DF.iloc[1:], frame([(5, "ACGUACGUACGUACGUACGUU", "AAAAAAAAAAAAAAAAAAAAA", 70.0)])], ignore_index=True)
+    changed.loc[changed['id_'] == 3, 'siRNA sense'] = "ACGUACGUACGUAAAAAAAAA"
+
+    path = str(tmp_path / "index.npz")
+    save_index(build_index(DF, k=5), path)
+    updated, added = update_index(load_index(path), changed, prune=True)
+    rebuilt = build_index(changed, k=5)
+    assert added == 3
+
+    for sequence in ("ACGUACGUACGUACGUACGUA", "AAAAAAAAAAAAAAAAAAAAA", "CCCCCCCCCCCC"):
+        incremental = query_index(updated, sequence, top_n=20)
+        full = query_index(rebuilt, sequence, top_n=20)
+        assert 1 not in incremental['id_'].tolist()
+        pd.testing.assert_frame_equal(
+            incremental.sort_values(['similarity', 'id_', 'strand'], ascending=[False, True, True], ignore_index=True),
+            full.sort_values(['similarity', 'id_', 'strand'], ascending=[False, True, True], ignore_index=True),
+        )
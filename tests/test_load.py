@@ -0,0 +1,222 @@
+import contextlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from etl.db_pool import acquire_connection, close_all_pools, configure_pool, release_connection
+from etl.load import (
+    compute_row_hashes, load_to_database, parallel_load_to_database, save_parquet, table_grants, table_indexes,
+    upsert_to_database,
+)
+from etl.parquet_writer import MANIFEST_PATH, parquet_options
+
+
+TABLE = "test_etl_parallel_load"
+
+
+@pytest.fixture
+def credentials(db_credentials):
+
+    yield db_credentials
+    execute(db_credentials, f"DROP TABLE IF EXISTS {TABLE}", f"DROP TABLE IF EXISTS {TABLE}_staging")
+    close_all_pools()
+    configure_pool()
+
+
+def execute(credentials, *statements):
+
+    conn = acquire_connection(credentials)
+    try:
+        with conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            result = cursor.fetchall() if cursor.description else None
+        conn.commit()
+        return result
+    finally:
+        release_connection(credentials, conn)
+
+
+def frame(rows: int, duplicate_ids: bool = False) -> pd.DataFrame:
+
+    ids = np.arange(1, rows + 1)
+    if duplicate_ids:
+        ids[-1] = ids[0]
+    return pd.DataFrame({'id_': ids, 'name': [f"si{i % 7}" for i in range(rows)], 'value': np.linspace(0, 1, rows)})
+
+
+def load(credentials, df, workers):
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        success = parallel_load_to_database(df, credentials, TABLE, workers=workers)
+    return success, output.getvalue()
+
+
+def catalog(credentials):
+
+    conn = acquire_connection(credentials)
+    try:
+        with conn.cursor() as cursor:
+            return table_indexes(cursor, TABLE), table_grants(cursor, TABLE)
+    finally:
+        release_connection(credentials, conn)
+
+
+def test_parallel_load_keeps_indexes_and_grants(credentials):
+
+    configure_pool(1, 2)
+    assert load(credentials, frame(500), workers=2)[0]
+    execute(
+        credentials,
+        f"CREATE UNIQUE INDEX {TABLE}_id__key ON {TABLE} (id_)",
+        f"CREATE INDEX {TABLE}_name_idx ON {TABLE} (name)",
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_value_key UNIQUE (value)",
+        f"GRANT SELECT ON {TABLE} TO PUBLIC",
+    )
+    before = catalog(credentials)
+
+    # Потоков больше, чем соединений в пуле: загрузка ограничивает их, а не падает на PoolError
+    success, output = load(credentials, frame(800), workers=4)
+    assert success, output
+    assert "партиции пишутся в 2 потоков" in output
+    assert catalog(credentials) == before
+    assert execute(credentials, f"SELECT COUNT(*) FROM {TABLE}") == [(800,)]
+
+
+def test_parallel_load_skips_unique_index_on_duplicate_ids(credentials):
+
+    assert load(credentials, frame(100), workers=2)[0]
+    execute(credentials, f"CREATE UNIQUE INDEX {TABLE}_id__key ON {TABLE} (id_)")
+
+    success, output = load(credentials, frame(100, duplicate_ids=True), workers=2)
+    assert success, output
+    assert f"индекс {TABLE}_id__key не перенесен" in output
+    assert catalog(credentials)[0] == []
+    assert execute(credentials, f"SELECT COUNT(*) FROM {TABLE}") == [(100,)]
+
+
+def test_row_hashes_do_not_depend_on_dtypes():
+
+    # Одни и те же значения в numpy-, nullable- и Arrow-типах, строки как object, string и category
+    nullable = pd.DataFrame({
+        'id_': pd.array([1, 2, 3], dtype="Int64"),
+        'gene': pd.array(["A", None, "B"], dtype="string"),
+        'value': pd.array([0.5, None, 1.0], dtype="Float64"),
+    })
+    arrow = nullable.astype({'id_': "int64[pyarrow]", 'gene': "string[pyarrow]", 'value': "double[pyarrow]"})
+    plain = pd.DataFrame({'id_': [1, 2, 3], 'gene': ["A", None, "B"], 'value': [0.5, np.nan, 1.0]})
+    category = plain.astype({'gene': "category"})
+    expected = compute_row_hashes(nullable)
+    for df in (arrow, plain, category):
+        assert (compute_row_hashes(df) == expected).all()
+    assert len(set(expected)) == 3
+    assert (compute_row_hashes(plain.assign(value=[0.5, np.nan, 2.0])) != expected).tolist() == [False, False, True]
+
+
+def upsert(credentials, df):
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        success = upsert_to_database(df, credentials, TABLE)
+    return success, output.getvalue()
+
+
+def test_incremental_after_full_reload_keeps_rows(credentials):
+
+    # Таблица после обычной загрузки: строк без хэша не удаляют, а обновляют на месте
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert load_to_database(frame(200), credentials, TABLE)
+    success, output = upsert(credentials, frame(200))
+    assert success, output
+    assert "Строк без хэша: 200" in output and "удаленных: 0" in output
+    assert execute(credentials, f"SELECT COUNT(*), COUNT(row_hash) FROM {TABLE}") == [(200, 200)]
+
+    # Перезаливка сохраняет уникальный индекс и пишет хэши; смена типов не меняет хэши
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert load_to_database(frame(200), credentials, TABLE)
+    assert [name for name, _, _ in catalog(credentials)[0]] == [f"{TABLE}_id__key"]
+    arrow = frame(200).astype({'id_': "int64[pyarrow]", 'name': "category", 'value': "double[pyarrow]"})
+    success, output = upsert(credentials, arrow)
+    assert success, output
+    assert "Новых строк: 0, измененных: 0, удаленных: 0, без изменений: 200" in output
+
+
+def test_full_reload_with_duplicate_ids_drops_unique_index(credentials):
+
+    assert upsert(credentials, frame(50))[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert load_to_database(frame(50, duplicate_ids=True), credentials, TABLE)
+    assert catalog(credentials)[0] == []
+
+    # Следующая инкрементальная загрузка убирает повтор и создает индекс снова
+    success, output = upsert(credentials, frame(50))
+    assert success, output
+    assert execute(credentials, f"SELECT COUNT(*) FROM {TABLE}") == [(50,)]
+    assert [name for name, _, _ in catalog(credentials)[0]] == [f"{TABLE}_id__key"]
+
+
+def parquet_frame(rows: int) -> pd.DataFrame:
+
+    return pd.DataFrame({
+        'id_': np.arange(1, rows + 1),
+        'Target gene': [("EGFP", "PLK1", "TTR")[i % 3] for i in range(rows)],
+        'Efficacy_x': pd.array([None if i % 5 == 0 else i / 8 for i in range(rows)], dtype="Float64"),
+        'Duration after transfection new': pd.array([24 * (1 + i % 2) for i in range(rows)], dtype="Int64"),
+        'siRNA sense': [f"ACGU{i}" for i in range(rows)],
+    })
+
+
+def save(df, options):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = save_parquet(df, options)
+    with open(MANIFEST_PATH) as f:
+        return path, json.load(f)
+
+
+def test_save_parquet_with_compression_options(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    df = parquet_frame(100)
+    path, manifest = save(df, parquet_options(compression='zstd', compression_level=7, row_group_size=30))
+
+    metadata = pq.ParquetFile(path).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [30, 30, 30, 10]
+    assert metadata.row_group(0).column(0).compression == 'ZSTD'
+    assert manifest['rows'] == 100 and manifest['files'] == []
+    assert (manifest['compression'], manifest['compression_level'], manifest['row_group_size']) == ('zstd', 7, 30)
+
+    # new_data.parquet - тот же файл, а не вторая сериализация
+    assert manifest['aliases'] == {'new_data.parquet': 'hardlink'}
+    assert os.path.samefile('new_data.parquet', path)
+    pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+
+
+def test_save_parquet_partitioned(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    df = parquet_frame(90)
+    # Файл от предыдущего непартиционированного запуска удаляется
+    save(df, parquet_options())
+    path, manifest = save(df, parquet_options(partition_cols=['Target gene'], compression='gzip'))
+
+    files = sorted(
+        os.path.relpath(os.path.join(root, name), path) for root, _, names in os.walk(path) for name in names
+    )
+    assert manifest['files'] == files
+    assert sorted({os.path.dirname(name) for name in files}) == ["Target gene=EGFP", "Target gene=PLK1", "Target gene=TTR"]
+    assert manifest['partition_cols'] == ['Target gene'] and manifest['aliases'] == {}
+    assert not os.path.exists('new_data.parquet')
+    assert all(
+        pq.ParquetFile(os.path.join(path, name)).metadata.row_group(0).column(0).compression == 'GZIP' for name in files
+    )
+
+    # Колонка партиционирования читается последней и как category: сравниваем в исходном порядке и типе
+    restored = pd.read_parquet(path).sort_values('id_', ignore_index=True)
+    restored['Target gene'] = restored['Target gene'].astype(object)
+    pd.testing.assert_frame_equal(restored[df.columns], df)
+    assert manifest['rows'] == len(restored)
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("command", [
+    [sys.executable, os.path.join(ROOT, "etl", "main.py"), "--help"],
+    [sys.executable, "-m", "etl.main", "--help"],
+])
+def test_cli_help(command):
+    # Оба способа запуска импортируют модули как пакет etl
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    for flag in ("--source", "--workers", "--load-workers", "--join-algorithm", "--sink-workers", "--resume"):
+        assert flag in result.stdout
@@ -0,0 +1,139 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.load import load_to_database
+from etl.modifications import (
+    add_modification_arrays, codes_column, has_modification, parse_modification_columns, positions_column,
+    with_array_literals, with_array_lists,
+)
+from etl.parquet_writer import arrow_to_dataframe, parquet_options, write_parquet_dataset
+from etl.snapshot import SnapshotWriter, read_snapshot
+
+
+TABLE = "test_etl_modification_arrays"
+
+
+def strands(rows):
+
+    modifications, positions = zip(*rows)
+    return pd.DataFrame({
+        "id_": np.arange(1, len(rows) + 1),
+        "Modification sense": pd.array(modifications, dtype="string"),
+        "Position sense": pd.array(positions, dtype="string"),
+    })
+
+
+def parsed(df, codes):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return add_modification_arrays(df, codes)
+
+
+DF = strands([
+    ("Inverted abasic* 2-Methoxy", "1,21 * 20,21"),
+    ("2-Methoxy", "1-3"),
+    (None, None),
+    ("2-Fluoro", "x, 5, 3-a,,7"),
+    ("2-Methoxy* 2-Fluoro", "2"),
+])
+
+
+def test_parse_positions_and_codes():
+
+    codes = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = parse_modification_columns(DF, codes)
+    assert codes == {"Inverted abasic": 0, "2-Methoxy": 1, "2-Fluoro": 2}
+    positions, modification_codes = result[positions_column("sense")], result[codes_column("sense")]
+    assert positions.dtype == pd.ArrowDtype(pa.list_(pa.int16()))
+    assert modification_codes.dtype == pd.ArrowDtype(pa.list_(pa.int16()))
+
+    # Пары отсортированы по позиции; пропуски - пустые списки; нечисловые токены пропускаются;
+    # лишняя группа модификаций без позиций ничего не добавляет
+    assert positions.tolist() == [[1, 20, 21, 21], [1, 2, 3], [], [5, 7], [2]]
+    assert modification_codes.tolist() == [[0, 1, 0, 1], [1, 1, 1], [], [2, 2], [1]]
+    assert "Modification antisense positions" not in result
+
+
+def test_existing_codes_are_kept():
+
+    codes = {"2-Fluoro": 7}
+    parsed(DF, codes)
+    assert codes["2-Fluoro"] == 7 and codes["Inverted abasic"] == 1
+
+
+def test_has_modification_at_position():
+
+    codes = {}
+    df = parsed(DF, codes)
+    assert has_modification(df, "sense", "2-Methoxy", 2, codes).tolist() == [False, True, False, False, True]
+    assert has_modification(df, "sense", "Inverted abasic", 21, codes).tolist() == [True, False, False, False, False]
+    assert not has_modification(df, "sense", "Неизвестная", 2, codes).any()
+
+    # Фильтр по срезу - маска по строкам среза
+    assert has_modification(df.iloc[3:], "sense", "2-Fluoro", 7, codes).tolist() == [True, False]
+
+
+def test_array_literals():
+
+    df = parsed(DF, {})
+    literals = with_array_literals(df.iloc[1:])
+    assert literals[positions_column("sense")].tolist() == ["{1,2,3}", "{}", "{5,7}", "{2}"]
+    assert with_array_lists(df)[codes_column("sense")].tolist()[0] == [0, 1, 0, 1]
+
+
+def test_multi_chunk_snapshot_round_trip(tmp_path):
+
+    # Потоковый режим пишет снимок по куску: колонки-списки читаются как ChunkedArray
+    codes = {}
+    df = parsed(DF, codes)
+    path = str(tmp_path / "snapshot.arrow")
+    writer = SnapshotWriter(path)
+    writer.write(df.iloc[:2])
+    writer.write(df.iloc[2:])
+    writer.close()
+
+    restored = read_snapshot(path)
+    assert pa.array(restored[positions_column("sense")]).num_chunks == 2
+    pd.testing.assert_frame_equal(with_array_literals(restored), with_array_literals(df))
+    assert has_modification(restored, "sense", "2-Methoxy", 2, codes).tolist() == [False, True, False, False, True]
+
+
+def test_parquet_round_trip(tmp_path):
+
+    # Как save_parquet: несколько row group дают ChunkedArray при чтении
+    df = parsed(DF, {})
+    path = str(tmp_path / "modifications.parquet")
+    write_parquet_dataset(df, path, parquet_options(row_group_size=2))
+    restored = arrow_to_dataframe(pq.read_table(path))
+    pd.testing.assert_frame_equal(restored, df)
+    pd.testing.assert_frame_equal(with_array_literals(restored), with_array_literals(df))
+
+
+def test_postgres_array_round_trip(db_credentials, tmp_path):
+
+    df = parsed(DF, {})
+    path = str(tmp_path / "snapshot.arrow")
+    writer = SnapshotWriter(path)
+    writer.write(df.iloc[:3])
+    writer.write(df.iloc[3:])
+    writer.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert load_to_database(read_snapshot(path), db_credentials, TABLE)
+    conn = psycopg2.connect(**db_credentials)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'SELECT "{positions_column("sense")}", "{codes_column("sense")}" FROM {TABLE} ORDER BY id_')
+            rows = cursor.fetchall()
+            cursor.execute(f"DROP TABLE {TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+    assert rows == list(zip(df[positions_column("sense")].tolist(), df[codes_column("sense")].tolist()))
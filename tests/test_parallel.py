@@ -0,0 +1,63 @@
+import contextlib
+import glob
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from etl import extract, fetch
+from etl.categories import encode_low_cardinality
+from etl.extract import clean_raw_data, extract_data_from_google_sheets
+from etl.parallel import SHARED_MEMORY_DIR, transform_frame
+from etl.parsers import parse_concentration, parse_duration
+from etl.synthetic import write_sheets
+from etl.transform import transform_data
+
+
+@pytest.fixture(scope="module")
+def encoded(tmp_path_factory):
+
+    # Вход этапа transform, как в пакетном режиме: синтетические выгрузки -> очистка -> category
+    first_path, second_path = write_sheets(str(tmp_path_factory.mktemp("sheets")), 2000)
+    paths = {extract.FIRST_SHEET_ID: first_path, extract.SECOND_SHEET_ID: second_path}
+    with pytest.MonkeyPatch.context() as monkeypatch, contextlib.redirect_stdout(io.StringIO()):
+        # Выгрузки читаются из файлов: URL листа - путь к CSV, скачивание - тот же путь
+        monkeypatch.setattr(extract, "sheet_export_url", lambda sheet_id, format="csv": paths[sheet_id])
+        monkeypatch.setattr(fetch, "download_sheet", lambda url, key, cache=None, timeout=None: url)
+        return encode_low_cardinality(clean_raw_data(extract_data_from_google_sheets()))
+
+
+def segments():
+
+    return set(glob.glob(os.path.join(SHARED_MEMORY_DIR, "etl-*.arrow")))
+
+
+def test_parallel_matches_sequential(encoded):
+
+    before = segments()
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = transform_data(encoded)
+        result = transform_frame(encoded, workers=2)
+
+    # Тот же порядок строк, индекс и типы, включая category и nullable-колонки
+    pd.testing.assert_frame_equal(result, expected)
+    assert any(isinstance(dtype, pd.CategoricalDtype) for dtype in result.dtypes)
+    assert segments() == before
+
+
+def test_segments_are_released_when_worker_fails(encoded):
+
+    # Строка первой партиции с разобранными концентрацией и длительностью, но без числового id_:
+    # transform_data в процессе пула падает, остальные партиции завершаются успешно
+    df = encoded.copy()
+    parsed = pd.notna(parse_concentration(df["Concentration"])) & pd.notna(parse_duration(df["Duration after transfection"]))
+    row = int(parsed.argmax())
+    assert row < len(df) // 4
+    df["SMDB_id"] = df["SMDB_id"].astype(object)
+    df.iloc[row, df.columns.get_loc("SMDB_id")] = "без номера"
+
+    before = segments()
+    with pytest.raises(ValueError, match="id_"), contextlib.redirect_stdout(io.StringIO()):
+        transform_frame(df, workers=2)
+    assert segments() == before
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.parsers import parse_concentration, parse_duration, parse_smdb_id
+
+
+CONCENTRATIONS = [
+    "0.02 nM", "10 nM", "5nM", "5. nM", "007 uM", "12", "1e-3 nM", " 5 nM", "NA", "", "nM 5",
+    "0.5\tnM", "3.2.1 nM", "10 nM", None, np.nan,
+]
+SMDB_IDS = [
+    "SM5329", "SM12", "SM12SM3", "XSM42", "SMSM12", "SM", "SM-5", "SM 7", "sm8", "SM0012", "",
+    "5329", "SM9x", "SM5329", None, np.nan,
+]
+DURATIONS = [
+    "24 h", "48", "6h", "72 hours", "1.5 h", " 24 h", "", "NA", "h 24", "024 h", "24 h", "-24 h",
+    "12\th", "96 h", None, np.nan,
+]
+
+
+def legacy_parse(concentration, smdb_id, duration):
+    """Старые цепочки из transform_data; Duration - с extract, как в benchmarks/bench_parsers.py"""
+
+    return (
+        concentration.str.split(" ").str[0].str.extract(r"^(\d+\.?\d*)$", expand=False).astype("Float64"),
+        smdb_id.str.split("SM").str[1].str.extract(r"^(\d+\.?\d*)$", expand=False).astype("Int64"),
+        duration.str.split(" ").str[0].str.extract(r"^(\d+)$", expand=False).astype("Int64"),
+    )
+
+
+@pytest.mark.parametrize("dtype", [object, "string", "string[pyarrow]"])
+def test_parity_with_legacy_chain(dtype):
+
+    concentration, smdb_id, duration = (pd.Series(values, dtype=dtype) for values in (CONCENTRATIONS, SMDB_IDS, DURATIONS))
+    expected = legacy_parse(concentration, smdb_id, duration)
+    parsed = (parse_concentration(concentration), parse_smdb_id(smdb_id), parse_duration(duration))
+
+    for result, legacy, dtype_name in zip(parsed, expected, ("Float64", "Int64", "Int64")):
+        # Тот же тип с маской пропусков и те же значения, включая маску
+        assert isinstance(result, pd.api.extensions.ExtensionArray) and result.dtype == dtype_name
+        pd.testing.assert_series_equal(pd.Series(result), legacy.reset_index(drop=True), check_names=False)
+
+
+def test_masks_on_messy_values():
+
+    concentration = parse_concentration(pd.Series(CONCENTRATIONS, dtype=object))
+    assert concentration[:5].tolist() == [0.02, 10.0, pd.NA, 5.0, 7.0]
+    assert pd.isna(concentration[6:13]).all() and concentration[13] == 10.0 and pd.isna(concentration[-2:]).all()
+
+    ids = parse_smdb_id(pd.Series(SMDB_IDS, dtype=object))
+    assert ids[:5].tolist() == [5329, 12, 12, 42, pd.NA]
+    assert ids[9] == 12 and pd.isna(ids[-3:]).tolist() == [False, True, True]
+
+    duration = parse_duration(pd.Series(DURATIONS, dtype=object))
+    assert duration[:5].tolist() == [24, 48, pd.NA, 72, pd.NA]
+    assert duration[9] == 24 and pd.isna(duration[-4:]).tolist() == [True, False, True, True]
+
+
+def test_empty_and_all_missing():
+
+    assert len(parse_concentration(pd.Series([], dtype=object))) == 0
+    assert pd.isna(parse_duration(pd.Series([None, np.nan], dtype=object))).all()
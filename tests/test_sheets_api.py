@@ -0,0 +1,106 @@
+import re
+
+import pandas as pd
+import pytest
+
+from etl.extract import FIRST_SHEET_ID, SOURCE_SCHEMAS, schema_read_options
+from etl.sheets_api import iter_sheet_chunks, read_sheet
+from etl.synthetic import write_sheets
+
+
+SHEET = "Лист1"
+
+
+class FakeRequest:
+
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeSheets:
+    """Sheets API v4 поверх списка строк: spreadsheets().get и values().batchGet по колонкам"""
+
+    def __init__(self, rows, extra_rows=0):
+        # Как у настоящей таблицы, сетка может быть больше данных
+        self.rows = rows
+        self.row_count = len(rows) + extra_rows
+        self.ranges = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, fields=None):
+        return FakeRequest({'sheets': [{'properties': {'title': SHEET, 'gridProperties': {'rowCount': self.row_count}}}]})
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension, valueRenderOption):
+        value_ranges = []
+        for cell_range in ranges:
+            self.ranges.append(cell_range)
+            start, end = map(int, re.fullmatch(rf"'{SHEET}'!(\d+):(\d+)", cell_range).groups())
+            part = self.rows[start - 1:end]
+            columns = [[row[c] if c < len(row) else '' for row in part] for c in range(max(map(len, part), default=0))]
+            # API отбрасывает пустые ячейки в конце каждой колонки и пустые колонки в конце
+            for column in columns:
+                while column and column[-1] == '':
+                    column.pop()
+            while columns and not columns[-1]:
+                columns.pop()
+            value_ranges.append({'range': cell_range, 'values': columns} if columns else {'range': cell_range})
+        return FakeRequest({'valueRanges': value_ranges})
+
+
+def source(columns):
+
+    return {'spreadsheet_id': 'test', 'sheet': SHEET, 'columns': columns}
+
+
+def test_header_maps_schema_columns_by_name():
+
+    rows = [["extra", "b", "a"], ["x", "1", "q"], ["y", "2", "w"]]
+    df = read_sheet(source({"a": "string", "b": None}), service=FakeSheets(rows))
+    assert list(df.columns) == ["a", "b"]
+    assert df["a"].tolist() == ["q", "w"] and df["b"].tolist() == [1, 2]
+
+    with pytest.raises(ValueError, match="нет колонок"):
+        read_sheet(source({"a": "string", "missing": None}), service=FakeSheets(rows))
+
+
+def test_trailing_empty_cells_and_na_values():
+
+    # Пустые ячейки в конце колонки API не возвращает; NA-строки - пропуски, как у read_csv
+    rows = [["a", "b", "c"], ["1", "NA", "x"], ["", "n/a", "y"], ["3.5", "", ""], ["4", "", ""]]
+    df = read_sheet(source({"a": None, "b": "string", "c": "string"}), service=FakeSheets(rows))
+    assert len(df) == 4
+    assert df["a"].dtype == "float64" and df["a"].isna().tolist() == [False, True, False, False]
+    assert df["b"].isna().all()
+    assert df["c"].tolist()[:2] == ["x", "y"] and df["c"].isna().tolist()[2:] == [True, True]
+
+
+def test_empty_page_does_not_end_sheet():
+
+    # Вторая страница целиком пустая, за ней снова данные; сетка длиннее данных
+    rows = [["a", "b"]] + [[str(i), "x"] for i in range(1, 10)] + [[]] * 10 + [[str(i), "y"] for i in range(10, 15)]
+    service = FakeSheets(rows, extra_rows=25)
+    chunks = list(iter_sheet_chunks(source({"a": None, "b": "string"}), service=service, page_rows=10))
+    assert [len(chunk) for chunk in chunks] == [9, 5]
+    assert chunks[1]["a"].tolist() == list(range(10, 15))
+    assert service.ranges[-1] == f"'{SHEET}'!41:50"
+
+
+@pytest.mark.parametrize("dtype_backend", ["numpy_nullable", "pyarrow"])
+def test_read_sheet_matches_csv_export(tmp_path, dtype_backend):
+
+    first_path, _ = write_sheets(str(tmp_path), 300)
+    grid = pd.read_csv(first_path, dtype=str, keep_default_na=False)
+    rows = [list(grid.columns)] + grid.values.tolist()
+    columns = SOURCE_SCHEMAS[FIRST_SHEET_ID]["columns"]
+
+    df = read_sheet(source(columns), dtype_backend, service=FakeSheets(rows, extra_rows=100), page_rows=64, ranges_per_request=2)
+    expected = pd.read_csv(first_path, **schema_read_options(FIRST_SHEET_ID, dtype_backend))
+    pd.testing.assert_frame_equal(df, expected[list(columns)])
@@ -0,0 +1,76 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from etl.sinks import run_sinks, sink
+
+
+DF = pd.DataFrame({"id_": range(10), "value": [float(i) for i in range(10)]})
+
+
+def slow(seconds, name):
+
+    def write(df):
+        time.sleep(seconds)
+        print(f"{name}: {len(df)} строк")
+        return name
+
+    return write
+
+
+def failing(df):
+
+    print("перед ошибкой")
+    raise ValueError("нет места на диске")
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failing_sink_does_not_stop_others(capsys, workers):
+
+    # Самый медленный приемник первый: результаты все равно в порядке sinks, а не завершения
+    sinks = [sink("slow", slow(0.2, "slow")), sink("failing", failing), sink("fast", slow(0, "fast"), rows=4, df=DF.head(4))]
+    results = run_sinks(DF, sinks, workers=workers)
+
+    assert [result['name'] for result in results] == ["slow", "failing", "fast"]
+    assert [result['status'] for result in results] == ["ok", "failed", "ok"]
+    assert [result['value'] for result in results] == ["slow", None, "fast"]
+    assert [result['rows_in'] for result in results] == [10, 10, 4]
+    assert [result['rows_out'] for result in results] == [10, None, 4]
+    assert results[1]['error'] == "ValueError: нет места на диске"
+    assert results[0]['wall_seconds'] >= 0.2
+    assert all(result['wall_seconds'] >= 0 and result['cpu_seconds'] >= 0 for result in results)
+
+    out = capsys.readouterr().out
+    assert "slow: 10 строк" in out and "fast: 4 строк" in out and "ValueError" in out
+    if workers > 1:
+        assert "перед ошибкой" in results[1]['log'] and "Traceback" in results[1]['log']
+
+
+def test_threads_started_by_sink_log_into_its_buffer(capsys):
+
+    # Как параллельная загрузка в БД: приемник сам запускает пул и передает в него свой контекст
+    def parallel(name):
+
+        def write(df):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, print, f"{name}: партиция {part}")
+                    for part in range(2)
+                ]
+                for future in futures:
+                    future.result()
+
+        return write
+
+    results = run_sinks(DF, [sink("db", parallel("db")), sink("csv", parallel("csv"))], workers=2)
+    for result in results:
+        assert sorted(result['log'].splitlines()) == [f"{result['name']}: партиция 0", f"{result['name']}: партиция 1"]
+
+    # Лог каждого приемника печатается одним блоком
+    out = capsys.readouterr().out
+    for name in ("db", "csv"):
+        start = out.index(f"{name}: партиция")
+        assert out[start:].startswith(results[0 if name == "db" else 1]['log'])
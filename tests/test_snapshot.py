@@ -0,0 +1,95 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from etl.load import save_snapshot
+from etl.snapshot import PROCESSED_SNAPSHOT_PATH, SnapshotWriter, read_snapshot, read_snapshot_table, write_snapshot
+
+
+ROWS = 20000
+
+
+def frame(rows: int = ROWS) -> pd.DataFrame:
+
+    return pd.DataFrame({
+        'id_': np.arange(rows, dtype=np.int64),
+        'Efficacy_x': np.linspace(0, 100, rows),
+        'Duration after transfection new': pd.array([None if i % 9 == 0 else 24 for i in range(rows)], dtype="Int64"),
+        'Concentration new': pd.array([None if i % 4 == 0 else i / 10 for i in range(rows)], dtype="Float64"),
+        'Target gene': pd.Categorical([("EGFP", "PLK1", None)[i % 3] for i in range(rows)], categories=["EGFP", "PLK1"]),
+        'siRNA sense': pd.array([f"ACGUACGU{i}" if i % 11 else None for i in range(rows)], dtype=pd.ArrowDtype(pa.string())),
+        'siRNA antisense': pd.array([f"UGCAUGCA{i}" for i in range(rows)], dtype="string"),
+        'Modification sense positions': pd.array(
+            [list(range(i % 4)) for i in range(rows)], dtype=pd.ArrowDtype(pa.list_(pa.int16()))
+        ),
+    })
+
+
+def test_round_trip_keeps_dtypes(tmp_path):
+
+    df = frame()
+    path = write_snapshot(df, str(tmp_path / "processed.arrow"))
+    restored = read_snapshot(path)
+    pd.testing.assert_frame_equal(restored, df)
+    assert restored['Target gene'].cat.categories.tolist() == ["EGFP", "PLK1"]
+
+    # Чтение выборочных колонок - в исходном порядке запроса
+    subset = read_snapshot(path, columns=['siRNA sense', 'id_'])
+    pd.testing.assert_frame_equal(subset, df[['siRNA sense', 'id_']])
+
+
+def test_save_snapshot_writes_processed_path(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    df = frame(100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = save_snapshot(df, compression='zstd')
+    assert path == PROCESSED_SNAPSHOT_PATH
+    pd.testing.assert_frame_equal(read_snapshot(path), df)
+
+
+def test_uncompressed_snapshot_is_memory_mapped(tmp_path):
+
+    df = frame()
+    path = write_snapshot(df, str(tmp_path / "processed.arrow"))
+    compressed_path = write_snapshot(df, str(tmp_path / "processed.zstd.arrow"), compression='zstd')
+
+    # Буферы таблицы ссылаются на отображенный файл: пул памяти Arrow почти не растет
+    before = pa.total_allocated_bytes()
+    table = read_snapshot_table(path)
+    mapped = pa.total_allocated_bytes() - before
+    assert table.num_rows == ROWS and mapped < 64 * 1024
+
+    # Сжатые буферы распаковываются в память
+    before = pa.total_allocated_bytes()
+    compressed = read_snapshot_table(compressed_path)
+    assert pa.total_allocated_bytes() - before > table.nbytes // 2
+    assert compressed.equals(table)
+
+    # С dtype_backend="pyarrow" DataFrame тоже не копирует данные файла
+    before = pa.total_allocated_bytes()
+    arrow_df = read_snapshot(path, dtype_backend="pyarrow")
+    assert pa.total_allocated_bytes() - before < 64 * 1024
+    assert arrow_df['id_'].tolist() == df['id_'].tolist()
+
+
+@pytest.mark.parametrize("compression", ["uncompressed", "lz4"])
+def test_writer_appends_chunks(tmp_path, compression):
+
+    df = frame(1000)
+    path = str(tmp_path / "stream.arrow")
+    writer = SnapshotWriter(path, compression)
+    for start in range(0, len(df), 300):
+        writer.write(df.iloc[start:start + 300])
+    assert writer.close() == path and writer.rows == len(df)
+    pd.testing.assert_frame_equal(read_snapshot(path), df)
+
+    # Незавершенный снимок не подменяет готовый
+    writer = SnapshotWriter(path, compression)
+    writer.write(df.iloc[:10])
+    writer.discard()
+    assert len(read_snapshot(path)) == len(df)
@@ -0,0 +1,57 @@
+import contextlib
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from etl import extract, stream
+from etl.snapshot import PROCESSED_SNAPSHOT_PATH, read_snapshot
+from etl.stream import PARQUET_PATH, run_streaming_pipeline
+from etl.synthetic import write_sheets
+
+
+@pytest.mark.parametrize("dtype_backend", ["numpy_nullable", "pyarrow"])
+def test_chunks_with_different_inferred_types_share_schema(tmp_path, monkeypatch, dtype_backend):
+
+    # В первом куске Efficacy - числа, дальше текст: вывод типа по куску дал бы разные схемы
+    monkeypatch.chdir(tmp_path)
+    first_path, second_path = write_sheets(str(tmp_path / "sheets"), 600)
+    first = pd.read_csv(first_path, dtype=str)
+    first.loc[200:, "Efficacy"] = first.loc[200:, "Efficacy"] + " percent target mRNA inhibition"
+    first.to_csv(first_path, index=False)
+    paths = {extract.FIRST_SHEET_ID: first_path, extract.SECOND_SHEET_ID: second_path}
+    monkeypatch.setattr(extract, "sheet_source", lambda sheet_id, cache=None: paths[sheet_id])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = run_streaming_pipeline(100, skip_csv=True, dtype_backend=dtype_backend)
+
+    assert stats['chunks'] == 6
+    parquet = pq.read_table(PARQUET_PATH)
+    snapshot = read_snapshot(PROCESSED_SNAPSHOT_PATH)
+    assert parquet.num_rows == len(snapshot) == stats['rows']
+    assert pd.api.types.is_string_dtype(snapshot["Efficacy_x"])
+    assert snapshot["Efficacy_x"].str.endswith("inhibition").sum() > 0
+
+
+def test_error_in_chunk_closes_source(tmp_path, monkeypatch):
+
+    # Источник (поток HTTP-ответа) закрывается сразу, а не когда соберут traceback с генератором
+    monkeypatch.chdir(tmp_path)
+    closed = []
+
+    def chunks(chunk_size, cache, dtype_backend, source):
+        try:
+            yield pd.DataFrame({"SMDB_id": ["SM1"]})
+            yield pd.DataFrame({"SMDB_id": ["SM2"]})
+        finally:
+            closed.append(source)
+
+    def clean_raw_data(df, dtype_backend):
+        raise RuntimeError("ошибка очистки")
+
+    monkeypatch.setattr(stream, "iter_google_sheets_chunks", chunks)
+    monkeypatch.setattr(stream, "clean_raw_data", clean_raw_data)
+    with pytest.raises(RuntimeError), contextlib.redirect_stdout(io.StringIO()):
+        run_streaming_pipeline(1, skip_csv=True, source="http")
+    assert closed == ["http"]
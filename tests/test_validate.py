@@ -0,0 +1,56 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from etl.extract import FIRST_SHEET_ID, SECOND_SHEET_ID, SOURCE_SCHEMAS, clean_raw_data, schema_read_options
+from etl.synthetic import write_sheets
+from etl.validate import RAW_SCHEMA, validate_frame, validate_raw_data
+
+
+def read_raw(directory, rows: int, dtype_backend: str) -> pd.DataFrame:
+
+    # Синтетические выгрузки читаются так же, как листы в extract: по схеме источников
+    first_path, second_path = write_sheets(str(directory), rows)
+    first = pd.read_csv(first_path, **schema_read_options(FIRST_SHEET_ID, dtype_backend))
+    second = pd.read_csv(second_path, **schema_read_options(SECOND_SHEET_ID, dtype_backend))
+    merged = pd.merge(
+        first.rename(columns=SOURCE_SCHEMAS[FIRST_SHEET_ID]["rename"]),
+        second.rename(columns=SOURCE_SCHEMAS[SECOND_SHEET_ID]["rename"]),
+        on="SMDB_id",
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        return clean_raw_data(merged, dtype_backend)
+
+
+@pytest.mark.parametrize("dtype_backend", ["numpy_nullable", "pyarrow"])
+def test_raw_validation_passes_on_synthetic_data(tmp_path, dtype_backend):
+
+    raw = read_raw(tmp_path, 20000, dtype_backend)
+    assert pd.api.types.is_numeric_dtype(raw["Efficacy_x"])
+
+    report = validate_frame(raw, RAW_SCHEMA, "raw")
+    assert report["passed"], [check for check in report["checks"] if check["severity"] == "error" and check["failed"]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        validate_raw_data(raw)
+
+
+def test_type_mismatch_uses_spec_severity():
+
+    df = pd.DataFrame({"value": [1.0, 2.0]})
+    report = validate_frame(df, {"value": {"type": "string", "severity": "warning"}}, "raw")
+    assert report["passed"]
+    assert report["checks"][0]["rule"] == "type:string"
+    assert report["checks"][0]["severity"] == "warning"
+
+    report = validate_frame(df, {"value": {"type": "string"}}, "raw")
+    assert not report["passed"]
+
+
+def test_numeric_or_string_column():
+
+    schema = {"value": {"type": ["string", "float"], "pattern": r"\d+"}}
+    assert validate_frame(pd.DataFrame({"value": [1.5, None]}), schema, "raw")["checks"] == []
+    report = validate_frame(pd.DataFrame({"value": ["85", "n/a"]}), schema, "raw")
+    assert [(check["rule"], check["failed"]) for check in report["checks"]] == [("pattern", 1)]
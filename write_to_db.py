@@ -4,6 +4,10 @@ import psycopg2
 import pandas as pd
 from typing import Dict
 from dotenv import load_dotenv
+from etl.load import copy_dataframe
+from etl.modifications import with_array_literals
+from etl.snapshot import read_snapshot, PROCESSED_SNAPSHOT_PATH
+from etl.db_pool import acquire_connection, close_all_pools, pool_stats, release_connection
 
 
 def extract_credentials_from_sqlite() -> Dict[str, str]:
@@ -131,16 +135,22 @@ def load_and_prepare_dataset(file_path: str) -> pd.DataFrame:
     print("ЗАГРУЗКА И ПОДГОТОВКА ДАТАСЕТА")
     print("=" * 50)
 
-    # Загружаем данные
-    df = pd.read_csv(file_path)
-    print(f"Загружено {len(df)} строк")
+    # Снимок Arrow IPC отображается в память и уже хранит типы колонок,
+    # CSV приходится разбирать и приводить числовые колонки заново
+    is_snapshot = file_path.endswith((".arrow", ".feather"))
+    if is_snapshot:
+        # Колонки-массивы - тем же текстом "{1,21}", что и в CSV
+        df = with_array_literals(read_snapshot(file_path))
+    else:
+        df = pd.read_csv(file_path)
+    print(f"Загружено {len(df)} строк ({'Arrow IPC' if is_snapshot else 'CSV'})")
     print(f"Исходные колонки: {list(df.columns)}")
 
     # Обрабатываем числовые колонки - убираем единицы измерения
     numeric_columns = ["Concentration new", "Duration after transfection new"]
 
     for col in numeric_columns:
-        if col in df.columns:
+        if col in df.columns and not is_snapshot:
             print(f"\nОбрабатываем колонку '{col}':")
 
             # Показываем примеры значений до обработки
@@ -218,10 +228,10 @@ def write_to_postgres(
 
     conn = None
     try:
-        # Подключаемся к PostgreSQL
-        conn = psycopg2.connect(**credentials)
+        # Берем соединение из пула (его же потом переиспользует проверка таблицы)
+        conn = acquire_connection(credentials)
         cursor = conn.cursor()
-        print(" Подключение к PostgreSQL установлено")
+        print(" Соединение с PostgreSQL получено из пула")
 
         # Создаем таблицу
         create_sql = create_table_sql(df, table_name)
@@ -236,16 +246,8 @@ def write_to_postgres(
         data_to_insert = df.head(100)
         print(f" Записываем {len(data_to_insert)} строк...")
 
-        # Подготавливаем SQL для вставки
-        columns = ", ".join(
-            [f'"{col}"' if " " in col or "-" in col else col for col in df.columns]
-        )
-        placeholders = ", ".join(["%s"] * len(df.columns))
-        insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-
-        # Вставляем данные построчно
-        for index, row in data_to_insert.iterrows():
-            cursor.execute(insert_sql, tuple(row))
+        # Вставляем данные одним COPY FROM STDIN вместо построчных INSERT
+        copy_dataframe(cursor, data_to_insert, table_name)
 
         # Подтверждаем изменения
         conn.commit()
@@ -279,8 +281,8 @@ def write_to_postgres(
     finally:
         if conn:
             cursor.close()
-            conn.close()
-            print(" Соединение с PostgreSQL закрыто")
+            release_connection(credentials, conn)
+            print(" Соединение с PostgreSQL возвращено в пул")
 
 
 def verify_table_creation(credentials: Dict[str, str], table_name: str) -> bool:
@@ -292,7 +294,7 @@ def verify_table_creation(credentials: Dict[str, str], table_name: str) -> bool:
 
     conn = None
     try:
-        conn = psycopg2.connect(**credentials)
+        conn = acquire_connection(credentials)
         cursor = conn.cursor()
 
         # Проверяем структуру созданной таблицы
@@ -330,7 +332,7 @@ def verify_table_creation(credentials: Dict[str, str], table_name: str) -> bool:
     finally:
         if conn:
             cursor.close()
-            conn.close()
+            release_connection(credentials, conn)
 
 
 def main():
@@ -343,7 +345,7 @@ def main():
 
         credentials = get_credentials()
 
-        dataset_path = "new_data.csv"
+        dataset_path = PROCESSED_SNAPSHOT_PATH if os.path.exists(PROCESSED_SNAPSHOT_PATH) else "new_data.csv"
         df = load_and_prepare_dataset(dataset_path)
 
         table_name = "greskova"
@@ -368,6 +370,10 @@ def main():
 
     except Exception as e:
         print(f" Ошибка: {e}")
+    finally:
+        stats = pool_stats()
+        print(f" Соединений с PostgreSQL открыто: {stats['connections']}, выдано из пула: {stats['checkouts']}")
+        close_all_pools()
 
 
 if __name__ == "__main__":